@@ -3,16 +3,27 @@ from .config import get_config
 from .extensions import cors, init_oauth
 from .api import create_api_blueprint
 from .api.errors import register_error_handlers
+from .cli import register_cli
+from .metrics import init_metrics
+from .utils.compression import init_compression
+from .utils.json_provider import FastJSONProvider
+from .utils.pagination import CURSOR_HEADER
+from .utils.unit_of_work import init_unit_of_work
 
 def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(get_config(config_name))
+    app.json = FastJSONProvider(app)
 
-    cors.init_app(app, supports_credentials=True)
+    cors.init_app(app, supports_credentials=True, expose_headers=[CURSOR_HEADER, "ETag"])
     init_oauth(app)
+    init_compression(app)
+    init_metrics(app)
+    init_unit_of_work(app)
 
     app.register_blueprint(create_api_blueprint(), url_prefix="/api")
     register_error_handlers(app)
+    register_cli(app)
 
     # root health
     @app.get("/")
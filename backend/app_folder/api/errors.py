@@ -1,10 +1,20 @@
 from flask import jsonify
+from ..repositories.projects_repo import VersionConflict
+from ..utils.versioning import PreconditionFailed
 
 def register_error_handlers(app):
     @app.errorhandler(404)
     def not_found(e):
         return jsonify({"error": "Not found"}), 404
 
+    @app.errorhandler(VersionConflict)
+    def version_conflict(e):
+        return jsonify({"error": "Project was changed by someone else; reload and try again"}), 409
+
+    @app.errorhandler(PreconditionFailed)
+    def precondition_failed(e):
+        return jsonify({"error": "If-Match must be an ETag returned for this project"}), 412
+
     @app.errorhandler(Exception)
     def generic(e):
         app.logger.exception(e)
@@ -1,14 +1,24 @@
-from flask import Blueprint, jsonify, request, session
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request, session
 from ..utils.auth import require_auth
 from ..services import files as fsvc
-from ..repositories import projects_repo
+from ..repositories import projects_repo, files_repo
 
 bp = Blueprint("files", __name__)
 
+def _owned_project(user_id, project_id):
+    # existence/ownership check; `directory` is only present on not-yet-migrated projects
+    project = projects_repo.get_project(user_id, project_id, ["userId", "projectId", "directory"])
+    if project:
+        fsvc.migrate_directory(project)
+    return project
+
 @bp.post("/<project_id>/files/presign")
 @require_auth
 def presign_put(project_id, current_user):
     data = request.get_json() or {}
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
     url, key = fsvc.presign_put(project_id, data.get("fileName"), data.get("fileType"))
     return jsonify({"uploadUrl": url, "key": key})
 
@@ -18,127 +28,193 @@ def presign_get(project_id, current_user):
     key = (request.get_json() or {}).get("key")
     if not key:
         return jsonify({"error": "Missing file key"}), 400
+    if not fsvc.in_project(project_id, key):
+        return jsonify({"error": "Invalid file key"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
     return jsonify({"url": fsvc.presign_get(key)})
 
+@bp.post("/<project_id>/files/presign-batch")
+@require_auth
+def presign_batch(project_id, current_user):
+    items = (request.get_json() or {}).get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing items"}), 400
+    if len(items) > current_app.config["PRESIGN_BATCH_MAX"]:
+        return jsonify({"error": f"At most {current_app.config['PRESIGN_BATCH_MAX']} items per request"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify({"urls": fsvc.presign_batch(project_id, items)}), 200
+
+def _record_file(user_id, project_id, data, key):
+    # adds the uploaded file's node to the project tree (shared by single-part and multipart uploads)
+    path = data.get("path", [])
+    file = {
+        "name": data.get("name"),
+        "size": data.get("size"),
+        "uploadedAt": data.get("uploadedAt"),
+        "key": key,
+    }
+    try:
+        files_repo.put_file(project_id, path, file)
+    except files_repo.FolderNotFound:
+        return jsonify({"error": f"Folder '{path[-1]}' not found"}), 404
+    projects_repo.touch(user_id, project_id)
+    return jsonify({"success": True, "file": file}), 200
+
 @bp.post("/<project_id>/files/metadata")
 @require_auth
 def save_file_metadata(project_id, current_user):
     data = request.get_json() or {}
-    user_id = current_user["sub"]
-    project = projects_repo.get_project(user_id, project_id)
-    if not project:
+    if not _owned_project(current_user["sub"], project_id):
         return jsonify({"error": "Project not found"}), 404
+    if not data.get("key"):
+        return jsonify({"error": "File key required"}), 400
+    return _record_file(current_user["sub"], project_id, data, data["key"])
 
-    if "directory" not in project:
-        project["directory"] = {"name": "root", "createdAt": __import__("datetime").datetime.utcnow().isoformat(), "folders": [], "files": []}
+def _upload_ref(project_id, data):
+    # (key, upload_id) of a multipart upload that belongs to this project, or None
+    key, upload_id = data.get("key"), data.get("uploadId")
+    if not upload_id or not fsvc.in_project(project_id, key):
+        return None
+    return key, upload_id
 
-    current_dir = project["directory"]
-    for folder in data.get("path", []):
-        current_dir = next((f for f in current_dir["folders"] if f["name"] == folder), None)
-        if current_dir is None:
-            return jsonify({"error": f"Folder '{folder}' not found"}), 404
+@bp.post("/<project_id>/files/multipart")
+@require_auth
+def create_multipart_upload(project_id, current_user):
+    data = request.get_json() or {}
+    if not data.get("fileName"):
+        return jsonify({"error": "Missing fileName"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    upload_id, key = fsvc.create_multipart(project_id, data["fileName"], data.get("fileType"))
+    return jsonify({"uploadId": upload_id, "key": key}), 200
 
-    current_dir["files"].append({
-        "name": data.get("name"),
-        "size": data.get("size"),
-        "uploadedAt": data.get("uploadedAt"),
-        "key": data.get("key"),
-    })
+@bp.post("/<project_id>/files/multipart/parts")
+@require_auth
+def presign_multipart_parts(project_id, current_user):
+    data = request.get_json() or {}
+    ref = _upload_ref(project_id, data)
+    numbers = data.get("partNumbers")
+    if not ref:
+        return jsonify({"error": "Missing or invalid key/uploadId"}), 400
+    if not isinstance(numbers, list) or not numbers or not all(isinstance(n, int) and 1 <= n <= fsvc.MAX_PARTS for n in numbers):
+        return jsonify({"error": f"partNumbers must be integers between 1 and {fsvc.MAX_PARTS}"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify({"parts": fsvc.presign_parts(*ref, numbers)}), 200
+
+@bp.get("/<project_id>/files/multipart/parts")
+@require_auth
+def list_multipart_parts(project_id, current_user):
+    # lets a client resume: parts already stored in S3 need not be uploaded again
+    ref = _upload_ref(project_id, request.args)
+    if not ref:
+        return jsonify({"error": "Missing or invalid key/uploadId"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    try:
+        return jsonify({"parts": fsvc.list_parts(*ref)}), 200
+    except fsvc.UploadNotFound:
+        return jsonify({"error": "Upload not found"}), 404
 
-    # full replace of directory
-    projects_repo.update_project_fields(user_id, project_id, "SET directory = :d", None, {":d": project["directory"]})
-    return jsonify({"success": True, "file": current_dir["files"][-1]}), 200
+@bp.post("/<project_id>/files/multipart/complete")
+@require_auth
+def complete_multipart_upload(project_id, current_user):
+    data = request.get_json() or {}
+    ref = _upload_ref(project_id, data)
+    if not ref:
+        return jsonify({"error": "Missing or invalid key/uploadId"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    try:
+        fsvc.complete_multipart(*ref, data.get("parts"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except fsvc.UploadNotFound:
+        return jsonify({"error": "Upload not found"}), 404
+    return _record_file(current_user["sub"], project_id, {"name": ref[0].rsplit("/", 1)[-1], **data}, ref[0])
+
+@bp.delete("/<project_id>/files/multipart")
+@require_auth
+def abort_multipart_upload(project_id, current_user):
+    ref = _upload_ref(project_id, request.get_json() or {})
+    if not ref:
+        return jsonify({"error": "Missing or invalid key/uploadId"}), 400
+    if not _owned_project(current_user["sub"], project_id):
+        return jsonify({"error": "Project not found"}), 404
+    try:
+        fsvc.abort_multipart(*ref)
+    except fsvc.UploadNotFound:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify({"success": True}), 200
 
 @bp.delete("/<project_id>/files")
 @require_auth
 def delete_file(project_id, current_user):
-    user_id = current_user["sub"]
     data = request.get_json() or {}
     key = data.get("key")
     path = data.get("path", [])
     if not key:
         return jsonify({"error": "File key required"}), 400
 
-    project = projects_repo.get_project(user_id, project_id)
-    if not project or "directory" not in project:
+    if not _owned_project(current_user["sub"], project_id):
         return jsonify({"error": "Project or directory not found"}), 404
 
     # delete from S3
     fsvc.delete_s3_object(key)
 
-    # remove from directory
-    dir_ref = project["directory"]
-    for folder in path:
-        dir_ref = next((f for f in dir_ref.get("folders", []) if f["name"] == folder), None)
-        if not dir_ref:
+    if not files_repo.delete_file(project_id, path, key):
+        if not files_repo.folder_exists(project_id, path):
             return jsonify({"error": "Invalid folder path"}), 400
-
-    before = len(dir_ref.get("files", []))
-    dir_ref["files"] = [f for f in dir_ref.get("files", []) if f["key"] != key]
-    if len(dir_ref["files"]) == before:
         return jsonify({"warning": "File not found in metadata, but deleted from S3"}), 200
-
-    projects_repo.update_project_fields(user_id, project_id, "SET directory = :d", None, {":d": project["directory"]})
+    projects_repo.touch(current_user["sub"], project_id)
     return jsonify({"success": True}), 200
 
 @bp.delete("/<project_id>/files/folder")
 @require_auth
 def delete_folder(project_id, current_user):
-    user_id = current_user["sub"]
     data = request.get_json() or {}
     path = data.get("path", [])
     folder_name = data.get("folderName")
     if not folder_name:
         return jsonify({"error": "Folder name required"}), 400
 
-    project = projects_repo.get_project(user_id, project_id)
-    if not project or "directory" not in project:
+    if not _owned_project(current_user["sub"], project_id):
         return jsonify({"error": "Project or directory not found"}), 404
 
-    dir_ref = project["directory"]
-    for folder in path:
-        dir_ref = next((f for f in dir_ref.get("folders", []) if f["name"] == folder), None)
-        if not dir_ref:
+    if not files_repo.folder_exists(project_id, path + [folder_name]):
+        if not files_repo.folder_exists(project_id, path):
             return jsonify({"error": "Invalid folder path"}), 400
-
-    folder_to_delete = next((f for f in dir_ref.get("folders", []) if f["name"] == folder_name), None)
-    if not folder_to_delete:
         return jsonify({"error": "Folder not found"}), 404
 
-    for file in fsvc.collect_files(folder_to_delete):
-        fsvc.delete_s3_object(file["key"])
-
-    dir_ref["folders"] = [f for f in dir_ref.get("folders", []) if f["name"] != folder_name]
-    projects_repo.update_project_fields(user_id, project_id, "SET directory = :d", None, {":d": project["directory"]})
+    removed = files_repo.delete_folder(project_id, path + [folder_name])
+    projects_repo.touch(current_user["sub"], project_id)
+    failed = fsvc.delete_s3_objects(f["key"] for f in removed)
+    if failed:
+        return jsonify({"success": True, "failed": failed}), 200
     return jsonify({"success": True}), 200
 
 @bp.post("/<project_id>/files/folder")
 @require_auth
 def create_folder(project_id, current_user):
-    user_id = current_user["sub"]
     data = request.get_json() or {}
     folder_name = data.get("folderName")
     path = data.get("path", [])
     if not folder_name:
         return jsonify({"error": "Missing folderName"}), 400
+    if not fsvc.valid_folder_name(folder_name):
+        return jsonify({"error": "Invalid folderName"}), 400
 
-    project = projects_repo.get_project(user_id, project_id)
-    if not project:
+    if not _owned_project(current_user["sub"], project_id):
         return jsonify({"error": "Project not found"}), 404
 
-    if "directory" not in project:
-        project["directory"] = {"name": "root", "createdAt": __import__("datetime").datetime.utcnow().isoformat(), "folders": [], "files": []}
-
-    current_dir = project["directory"]
-    for folder in path:
-        current_dir = next((f for f in current_dir["folders"] if f["name"] == folder), None)
-        if current_dir is None:
-            return jsonify({"error": f"Folder '{folder}' not found"}), 404
-
-    if any(f["name"] == folder_name for f in current_dir["folders"]):
+    new_folder = {"name": folder_name, "createdAt": datetime.utcnow().isoformat(), "folders": [], "files": []}
+    try:
+        files_repo.put_folder(project_id, path, folder_name, new_folder["createdAt"])
+    except files_repo.FolderNotFound:
+        return jsonify({"error": f"Folder '{path[-1]}' not found"}), 404
+    except files_repo.FolderExists:
         return jsonify({"error": "Folder already exists"}), 400
-
-    new_folder = {"name": folder_name, "createdAt": __import__("datetime").datetime.utcnow().isoformat(), "folders": [], "files": []}
-    current_dir["folders"].append(new_folder)
-    projects_repo.update_project_fields(user_id, project_id, "SET directory = :d", None, {":d": project["directory"]})
+    projects_repo.touch(current_user["sub"], project_id)
     return jsonify({"success": True, "folder": new_folder}), 200
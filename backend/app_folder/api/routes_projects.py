@@ -1,48 +1,104 @@
+import re
 from flask import Blueprint, jsonify, request
 from ..utils.auth import require_auth
 from ..services import projects as svc
+from ..services import files as fsvc
+from ..services import updates as usvc
+from ..services import tasks as tsvc
 from ..repositories import projects_repo, teams_repo
+from ..utils import aio
+from ..utils.fanout import fan_out
+from ..utils.pagination import CURSOR_HEADER, limit_arg, page_args, paged_response
+from ..utils.versioning import if_match_version, is_not_modified, not_modified, project_etag, with_validators
 
 bp = Blueprint("projects", __name__)
 
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# what a conditional read needs besides the fields it serves
+_VALIDATOR_FIELDS = ["userId", "projectId", projects_repo.VERSION_FIELD, projects_repo.UPDATED_FIELD, "createdAt"]
+
+def _conditional(item, role, respond):
+    # 304 when the client's validators match `item`; otherwise respond() builds the full response.
+    # The item is read either way, so a 304 saves the body's bandwidth and serialization (and
+    # respond()'s own reads), not the project read.
+    etag = project_etag(item.get(projects_repo.VERSION_FIELD, 0), role)
+    modified = item.get(projects_repo.UPDATED_FIELD) or item.get("createdAt")
+    if is_not_modified(etag, modified):
+        return not_modified(etag, modified)
+    return with_validators(respond(), etag, modified)
+
+def _requested_fields():
+    # ?view=summary or ?fields=a,b -> attribute names to project; None means the full item
+    if request.args.get("fields"):
+        fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+        bad = [f for f in fields if not _FIELD_NAME.match(f)]
+        if bad:
+            raise ValueError(f"Invalid field name(s): {', '.join(bad)}")
+        return list(dict.fromkeys(projects_repo.KEY_FIELDS + tuple(fields)))
+    view = request.args.get("view", "full")
+    if view == "summary":
+        return list(projects_repo.SUMMARY_FIELDS)
+    if view != "full":
+        raise ValueError("'view' must be 'summary' or 'full'")
+    return None
+
 @bp.get("")
 @require_auth
 def list_projects(current_user):
     user_id = current_user["sub"]
-    owned = projects_repo.query_owned_by(user_id)
-    memberships = teams_repo.list_by_user(user_id)
-
-    member_pids = {m["projectId"] for m in memberships} - {p["projectId"] for p in owned}
-    # If you only have (userId, projectId) PK, you’ll need ownerId to fetch. Keeping this simple: just return owned + ids of member projects.
-    role_by_pid = {m["projectId"]: m.get("role", "member") for m in memberships}
-    out = [{**p, "currentUserRole": "owner"} for p in owned]
-    # (Optional) enrich member projects similarly if you add a GSI on projectId or store ownerId on teams table
-    return jsonify(out), 200
+    try:
+        limit, cursor = page_args()
+        fields = _requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if limit:
+        projects, next_cursor = svc.list_projects_page(user_id, limit, cursor, fields)
+        return paged_response(projects, next_cursor), 200
+    if aio.enabled():
+        return jsonify(aio.run(svc.list_projects_async(user_id, fields))), 200
+    return jsonify(svc.list_projects(user_id, fields)), 200
 
 @bp.post("")
 @require_auth
 def create_project(current_user):
     project_id, now_iso = svc.create_project(current_user["sub"], request.get_json() or {})
     # add owner to team
-    teams_repo.put_member(project_id, current_user["sub"], "owner", now_iso)
+    teams_repo.put_member(project_id, current_user["sub"], "owner", now_iso, owner_id=current_user["sub"])
     return jsonify({"message": "Project created", "projectId": project_id}), 201
 
 @bp.get("/<project_id>")
 @require_auth
 def get_project(project_id, current_user):
     user_id = current_user["sub"]
-    # First try as owner
-    item = projects_repo.get_project(user_id, project_id)
+    # the owner read and the membership read together; a member then reads the owner's item
+    item, membership = fan_out(
+        lambda: projects_repo.get_project(user_id, project_id), lambda: teams_repo.get_membership(project_id, user_id)
+    )
     if not item:
-        # If not owner, ensure membership and then fetch by ownerId if you add a projectId GSI (left as TODO).
-        membership = teams_repo.get_membership(project_id, user_id)
         if not membership:
             return jsonify({"error": "Forbidden"}), 403
-        # Without a projectId-index, we can't fetch the project unless you store ownerId on the membership.
-        return jsonify({"error": "Project lookup requires projectId-index or ownerId on membership"}), 500
-
-    item["currentUserRole"] = "owner"
-    return jsonify(item), 200
+        owner_id = svc.resolve_owner_id(membership)
+        item = projects_repo.get_project(owner_id, project_id) if owner_id else None
+        if not item:
+            return jsonify({"error": "Project not found"}), 404
+        item["currentUserRole"] = membership.get("role", "member")
+    else:
+        item["currentUserRole"] = "owner"
+
+    def respond():
+        item["directory"] = fsvc.directory_tree(item)
+        return jsonify(item)
+    return _conditional(item, item["currentUserRole"], respond)
+
+@bp.delete("/<project_id>")
+@require_auth
+def delete_project(project_id, current_user):
+    if not projects_repo.get_project(current_user["sub"], project_id, ["projectId"]):
+        return jsonify({"error": "Project not found"}), 404
+    failed = svc.delete_project(current_user["sub"], project_id)
+    if failed:
+        return jsonify({"message": "Project deleted", "failed": failed}), 200
+    return jsonify({"message": "Project deleted"}), 200
 
 @bp.patch("/<project_id>/update-field")
 @require_auth
@@ -51,66 +107,124 @@ def update_field(project_id, current_user):
     field, value = data.get("field"), data.get("value")
     if not field:
         return jsonify({"error": "Missing 'field'"}), 400
-    resp = svc.update_single_field(current_user["sub"], project_id, field, value)
+    try:
+        resp = svc.update_single_field(current_user["sub"], project_id, field, value, if_match_version())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"message": "Field updated successfully", "updated": resp.get("Attributes", {})}), 200
 
 @bp.post("/<project_id>/update")
 @require_auth
 def update_project_bulk(project_id, current_user):
-    fields = request.get_json() or {}
-    svc.update_fields(current_user["sub"], project_id, fields)
+    fields = request.get_json()
+    if not isinstance(fields, dict):
+        return jsonify({"error": "Invalid data format"}), 400
+    try:
+        svc.update_fields(current_user["sub"], project_id, fields, if_match_version())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"message": "Project updated successfully"}), 200
 
 @bp.post("/<project_id>/update-milestone")
 @require_auth
 def update_milestone(project_id, current_user):
     data = request.get_json() or {}
-    idx, field, value = data.get("index"), data.get("field"), data.get("value")
-    if idx is None or field is None:
+    if data.get("index") is None or data.get("field") is None:
         return jsonify({"error": "Missing 'index' or 'field'"}), 400
-    expr = f"SET milestones[{idx}].{field} = :val"
-    projects_repo.update_project_fields(current_user["sub"], project_id, expr, None, {":val": value}, "UPDATED_NEW")
-    return jsonify({"message": "Milestone updated successfully"}), 200
+    return _update_milestones(project_id, current_user["sub"], [data], "Milestone updated successfully")
+
+@bp.patch("/<project_id>/milestones")
+@require_auth
+def update_milestones(project_id, current_user):
+    # {"edits": [{"index", "field", "value"}, ...]} applied in one write
+    return _update_milestones(project_id, current_user["sub"], (request.get_json() or {}).get("edits"),
+                              "Milestones updated successfully")
+
+def _update_milestones(project_id, user_id, edits, message):
+    try:
+        resp = svc.update_milestones(user_id, project_id, svc.milestone_edits(edits), if_match_version())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IndexError:
+        return jsonify({"error": "Milestone index out of range"}), 400
+    if resp is None:
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify({"message": message}), 200
 
 @bp.post("/<project_id>/timeline")
 @require_auth
 def update_timeline(project_id, current_user):
     tl = (request.get_json() or {}).get("timeline", [])
-    resp = projects_repo.update_project_fields(current_user["sub"], project_id, "SET timeline = :t", None, {":t": tl}, "UPDATED_NEW")
+    resp = projects_repo.update_project_fields(
+        current_user["sub"], project_id, "SET timeline = :t", None, {":t": tl}, "UPDATED_NEW", if_match_version()
+    )
     return jsonify({"timeline": resp.get("Attributes", {}).get("timeline", tl)}), 200
 
 @bp.get("/<project_id>/tasks")
 @require_auth
 def get_tasks(project_id, current_user):
-    item = projects_repo.get_project(current_user["sub"], project_id)
+    item = projects_repo.get_project(current_user["sub"], project_id, _VALIDATOR_FIELDS + ["tasks"])
     if not item:
         return jsonify({"error": "Project not found"}), 404
-    return jsonify(item.get("tasks", [])), 200
+    return _conditional(item, "owner", lambda: jsonify(tsvc.ensure_task_ids(item)))
+
+@bp.patch("/<project_id>/tasks")
+@require_auth
+def patch_tasks(project_id, current_user):
+    # one op or {"ops": [...]}: add / update / delete / move, addressed by taskId; only changed tasks are written
+    data = request.get_json()
+    try:
+        ops = tsvc.validate_ops(data.get("ops") if isinstance(data, dict) and "ops" in data else data)
+        tasks = tsvc.update_tasks(current_user["sub"], project_id, ops)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except tsvc.TaskNotFound as e:
+        return jsonify({"error": f"Task not found: {e.args[0]}"}), 404
+    if tasks is None:
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify(tasks), 200
 
 @bp.post("/<project_id>/tasks")
 @require_auth
 def update_tasks(project_id, current_user):
     tasks = request.get_json()
-    projects_repo.update_project_fields(current_user["sub"], project_id, "SET tasks = :t", None, {":t": tasks})
+    projects_repo.update_project_fields(current_user["sub"], project_id, "SET tasks = :t", None, {":t": tasks},
+                                        expected_version=if_match_version())
     return jsonify({"message": "Tasks updated"}), 200
 
 @bp.post("/<project_id>/updates")
 @require_auth
 def add_update(project_id, current_user):
     update = request.get_json()
-    expr = "SET updates = list_append(:new, if_not_exists(updates, :empty))"
-    projects_repo.update_project_fields(
-        current_user["sub"], project_id, expr, None, {":new": [update], ":empty": []}, "UPDATED_NEW"
-    )
-    return jsonify(update), 200
+    if not isinstance(update, dict):
+        return jsonify({"error": "Invalid data format"}), 400
+    entry = usvc.add_update(current_user["sub"], project_id, update)
+    if entry is None:
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify(entry), 200
 
 @bp.get("/<project_id>/updates")
 @require_auth
 def get_updates(project_id, current_user):
-    item = projects_repo.get_project(current_user["sub"], project_id)
+    # newest first; ?limit=&before=<updateKey> pages back through history
+    try:
+        limit = limit_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    item = projects_repo.get_project(current_user["sub"], project_id, _VALIDATOR_FIELDS + ["updates"])
     if not item:
         return jsonify({"error": "Project not found"}), 404
-    return jsonify(item.get("updates", [])), 200
+    if item.get("updates") is not None:
+        usvc.migrate_updates(item)
+        item = projects_repo.get_project(current_user["sub"], project_id, _VALIDATOR_FIELDS)
+
+    def respond():
+        updates, next_before = usvc.list_updates(project_id, limit, request.args.get("before"))
+        resp = jsonify(updates)
+        if next_before:
+            resp.headers[CURSOR_HEADER] = next_before
+        return resp
+    return _conditional(item, "owner", respond)
 
 @bp.patch("/<project_id>/inspections")
 @require_auth
@@ -118,12 +232,18 @@ def update_inspections(project_id, current_user):
     data = request.get_json()
     if not isinstance(data, list):
         return jsonify({"error": "Invalid data format"}), 400
-    projects_repo.update_project_fields(current_user["sub"], project_id, "SET inspections = :v", None, {":v": data})
+    projects_repo.update_project_fields(current_user["sub"], project_id, "SET inspections = :v", None, {":v": data},
+                                        expected_version=if_match_version())
     return jsonify({"message": "Inspections updated"}), 200
 
 @bp.patch("/<project_id>/directory")
 @require_auth
 def update_directory(project_id, current_user):
     data = request.get_json()
-    projects_repo.update_project_fields(current_user["sub"], project_id, "SET directory = :v", None, {":v": data})
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data format"}), 400
+    project = projects_repo.get_project(current_user["sub"], project_id, ["userId", "projectId", "directory"])
+    if not project:
+        return jsonify({"error": "Project not found"}), 404
+    fsvc.replace_directory(project, data)
     return jsonify({"message": "Directory updated"}), 200
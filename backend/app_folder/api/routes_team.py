@@ -1,13 +1,25 @@
 from flask import Blueprint, jsonify, request, current_app
 from ..utils.auth import require_auth
 from ..services import teams as tsvc
+from ..services import projects as psvc
 from ..repositories import teams_repo
+from ..utils import aio
+from ..utils.pagination import page_args, paged_response
 
 bp = Blueprint("team", __name__)
 
 @bp.get("/<project_id>/team")
 @require_auth
 def get_users(project_id, current_user):
+    try:
+        limit, cursor = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if limit:
+        members, next_cursor = tsvc.list_team_page(project_id, limit, cursor)
+        return paged_response(members, next_cursor), 200
+    if aio.enabled():
+        return jsonify(aio.run(tsvc.list_team_async(project_id))), 200
     return jsonify(tsvc.list_team(project_id)), 200
 
 @bp.post("/<project_id>/add-user")
@@ -16,17 +28,40 @@ def add_user_to_project(project_id, current_user):
     data = request.get_json() or {}
     email = data.get("email")
     role = data.get("role", "member")
-    uid = tsvc.add_member_by_email(project_id, email, role, current_app.config["COGNITO_USER_POOL_ID"])
+    if not psvc.can_manage_team(psvc.team_role(project_id, current_user["sub"]), role):
+        return jsonify({"error": "Only the project owner or an admin can add members"}), 403
+    owner_id = psvc.owner_id_for(project_id, current_user["sub"])
+    uid = tsvc.add_member_by_email(project_id, email, role, current_app.config["COGNITO_USER_POOL_ID"], owner_id)
     if not uid:
         return jsonify({"error": "User not found"}), 404
     return jsonify({"message": "User added"}), 200
 
+@bp.post("/<project_id>/add-users")
+@require_auth
+def add_users_to_project(project_id, current_user):
+    data = request.get_json() or {}
+    emails = data.get("emails")
+    if not isinstance(emails, list) or not emails or not all(isinstance(e, str) and e.strip() for e in emails):
+        return jsonify({"error": "'emails' must be a non-empty list of email addresses"}), 400
+    if len(emails) > current_app.config["ADD_MEMBERS_MAX"]:
+        return jsonify({"error": f"At most {current_app.config['ADD_MEMBERS_MAX']} emails per request"}), 400
+    role = data.get("role", "member")
+    if not psvc.can_manage_team(psvc.team_role(project_id, current_user["sub"]), role):
+        return jsonify({"error": "Only the project owner or an admin can add members"}), 403
+    owner_id = psvc.owner_id_for(project_id, current_user["sub"])
+    result = tsvc.add_members_by_email(
+        project_id, [e.strip() for e in emails], role, current_app.config["COGNITO_USER_POOL_ID"], owner_id
+    )
+    return jsonify(result), 200
+
 @bp.delete("/<project_id>/remove-user")
 @require_auth
 def remove_user_from_project(project_id, current_user):
     uid = (request.get_json() or {}).get("userId")
     if not uid:
         return jsonify({"error": "Missing user ID"}), 400
+    if not psvc.can_manage_team(psvc.team_role(project_id, current_user["sub"])):
+        return jsonify({"error": "Only the project owner or an admin can remove members"}), 403
     if not teams_repo.get_membership(project_id, uid):
         return jsonify({"error": "User not found in project team"}), 404
     tsvc.remove_member(project_id, uid)
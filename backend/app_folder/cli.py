@@ -0,0 +1,10 @@
+import click
+from .services import files as fsvc
+
+def register_cli(app):
+    @app.cli.command("sweep-uploads")
+    @click.option("--max-age-hours", type=float, default=None, help="Abort uploads started longer ago than this.")
+    def sweep_uploads(max_age_hours):
+        """Abort stale incomplete multipart uploads."""
+        hours = max_age_hours if max_age_hours is not None else app.config["MULTIPART_STALE_HOURS"]
+        click.echo(f"Aborted {fsvc.sweep_stale_uploads(hours)} stale multipart upload(s)")
@@ -8,12 +8,63 @@ class BaseConfig:
     DDB_PROJECTS = os.getenv("DDB_PROJECTS", "BuildManagerProjects")
     DDB_TEAMS = os.getenv("DDB_TEAMS", "BuildManagerProjectTeams")
     DDB_USERS = os.getenv("DDB_USERS", "BuildManagerUsers")
+    DDB_FILES = os.getenv("DDB_FILES", "BuildManagerProjectFiles")
+    DDB_UPDATES = os.getenv("DDB_UPDATES", "BuildManagerProjectUpdates")
+    # where the tables live: "dynamodb", "memory" (per process) or "sqlite" (SQLITE_PATH)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "dynamodb")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "buildmngr.sqlite3")
+    UPDATES_SUMMARY_SIZE = int(os.getenv("UPDATES_SUMMARY_SIZE", "5"))
     OIDC_CLIENT_ID = os.getenv("CLIENT_ID", "")
     OIDC_CLIENT_SECRET = os.getenv("CLIENT_SECRET", "")
     OIDC_METADATA_URL = os.getenv("SERVER_METADATA_URL", "")
     COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID", "")
     COGNITO_DOMAIN = os.getenv("COGNITO_DOMAIN", "")  # e.g. https://xxx.auth.us-east-1.amazoncognito.com
     POST_LOGOUT_REDIRECT_URI = os.getenv("POST_LOGOUT_REDIRECT_URI", "http://localhost:3000")
+    # boto3 connection pooling / timeouts, shared by every client in a worker process
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+    AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+    AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "10"))
+    AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "1") == "1"
+    AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+    AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+    # parallel Scan used while a GSI is backfilling
+    SCAN_TOTAL_SEGMENTS = int(os.getenv("SCAN_TOTAL_SEGMENTS", "8"))
+    SCAN_MAX_WORKERS = int(os.getenv("SCAN_MAX_WORKERS", "8"))
+    PRESIGN_EXPIRES = int(os.getenv("PRESIGN_EXPIRES", "300"))
+    PRESIGN_MIN_REMAINING = int(os.getenv("PRESIGN_MIN_REMAINING", "60"))
+    PRESIGN_CACHE_MAXSIZE = int(os.getenv("PRESIGN_CACHE_MAXSIZE", "20000"))
+    PRESIGN_BATCH_MAX = int(os.getenv("PRESIGN_BATCH_MAX", "1000"))
+    MULTIPART_PART_EXPIRES = int(os.getenv("MULTIPART_PART_EXPIRES", "3600"))
+    MULTIPART_STALE_HOURS = float(os.getenv("MULTIPART_STALE_HOURS", "24"))
+    S3_DELETE_WORKERS = int(os.getenv("S3_DELETE_WORKERS", "8"))
+    # independent repository reads of one request run side by side on a pool of this size (0: one by one)
+    FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "16"))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+    # response compression; bodies under COMPRESS_MIN_SIZE bytes go out as-is
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1") == "1"
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", "4"))
+    # /metrics; with several workers set METRICS_DIR to a directory they share (e.g. under /tmp)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+    # async mode: list/team handlers run as coroutines on a per-process event loop and fan out
+    # independent AWS calls, at most ASYNC_MAX_CONCURRENCY in flight per process
+    ASYNC_MODE = os.getenv("ASYNC_MODE", "0") == "1"
+    ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "32"))
+    # per-request identity map + write batching in front of the projects/teams/users repositories
+    UNIT_OF_WORK_ENABLED = os.getenv("UNIT_OF_WORK_ENABLED", "1") == "1"
+    # read-through caches; CACHE_BACKEND is the shared (cross-worker) tier: "local" or "none"
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+    SHARED_CACHE_MAXSIZE = int(os.getenv("SHARED_CACHE_MAXSIZE", "100000"))
+    USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+    # email -> user id for adding members; "no such user" is kept for EMAIL_NOT_FOUND_TTL only
+    EMAIL_CACHE_MAXSIZE = int(os.getenv("EMAIL_CACHE_MAXSIZE", "10000"))
+    EMAIL_CACHE_TTL = float(os.getenv("EMAIL_CACHE_TTL", "3600"))
+    EMAIL_NOT_FOUND_TTL = float(os.getenv("EMAIL_NOT_FOUND_TTL", "60"))
+    ADD_MEMBERS_MAX = int(os.getenv("ADD_MEMBERS_MAX", "100"))
 
 class DevConfig(BaseConfig):
     DEBUG = True
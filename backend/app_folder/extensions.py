@@ -1,8 +1,15 @@
+import asyncio
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
 from flask_cors import CORS
 from authlib.integrations.flask_client import OAuth
 from flask import current_app
+from .metrics import instrument_client
+from .storage import local_resource
+from .utils.cache import LocalSharedCache, TTLCache
 
 cors = CORS()
 oauth = OAuth()
@@ -18,14 +25,127 @@ def init_oauth(app):
     )
     return oauth
 
+# Process-wide registry of boto3 sessions, clients, resources and tables.
+# boto3 clients are thread-safe and expensive to build (credential chain, endpoint
+# data, connection pool), so each process builds them once and reuses them.
+_lock = threading.RLock()
+_registry = {}
+_pid = os.getpid()
+
+def _reset_registry():
+    # A forked child must not reuse the parent's sockets or lock state.
+    global _lock, _pid
+    _lock = threading.RLock()
+    _registry.clear()
+    _pid = os.getpid()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_registry)
+
+def reset_aws_clients():
+    with _lock:
+        _registry.clear()
+
+def _get_or_create(key, factory):
+    if _pid != os.getpid():
+        _reset_registry()
+    try:
+        return _registry[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _registry:
+            _registry[key] = factory()
+        return _registry[key]
+
+def _aws_settings(cfg):
+    return (
+        cfg["AWS_REGION"],
+        cfg["AWS_MAX_POOL_CONNECTIONS"],
+        cfg["AWS_CONNECT_TIMEOUT"],
+        cfg["AWS_READ_TIMEOUT"],
+        cfg["AWS_TCP_KEEPALIVE"],
+        cfg["AWS_RETRY_MODE"],
+        cfg["AWS_MAX_ATTEMPTS"],
+    )
+
+def _botocore_config(settings):
+    region, pool, connect_timeout, read_timeout, keepalive, retry_mode, max_attempts = settings
+    return Config(
+        region_name=region,
+        max_pool_connections=pool,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        tcp_keepalive=keepalive,
+        retries={"mode": retry_mode, "max_attempts": max_attempts},
+    )
+
+def aws_config():
+    # the botocore Config shared by every client of this app (also used by the aioboto3 ones)
+    return _botocore_config(_aws_settings(current_app.config))
+
+def _session(settings):
+    return _get_or_create(("session", settings[0]), lambda: boto3.session.Session(region_name=settings[0]))
+
+def _client(service):
+    settings = _aws_settings(current_app.config)
+    return _get_or_create(
+        ("client", service, settings),
+        lambda: instrument_client(_session(settings).client(service, config=_botocore_config(settings))),
+    )
+
 def dynamo_resource():
-    return boto3.resource("dynamodb", region_name=current_app.config["AWS_REGION"])
+    cfg = current_app.config
+    if cfg["STORAGE_BACKEND"] != "dynamodb":
+        key = (cfg["STORAGE_BACKEND"], cfg["SQLITE_PATH"] if cfg["STORAGE_BACKEND"] == "sqlite" else None)
+        return _get_or_create(("resource", *key), lambda: local_resource(cfg))
+    settings = _aws_settings(cfg)
+    return _get_or_create(
+        ("resource", "dynamodb", settings),
+        lambda: _instrumented_resource(_session(settings).resource("dynamodb", config=_botocore_config(settings))),
+    )
+
+def _instrumented_resource(resource):
+    instrument_client(resource.meta.client)
+    return resource
 
 def dynamo_table(name):
-    return dynamo_resource().Table(name)
+    cfg = current_app.config
+    settings = (cfg["STORAGE_BACKEND"], cfg["SQLITE_PATH"], *_aws_settings(cfg))
+    return _get_or_create(("table", name, settings), lambda: dynamo_resource().Table(name))
 
 def s3_client():
-    return boto3.client("s3", region_name=current_app.config["AWS_REGION"])
+    return _client("s3")
 
 def cognito_idp():
-    return boto3.client("cognito-idp", region_name=current_app.config["AWS_REGION"])
+    return _client("cognito-idp")
+
+def thread_pool(name, max_workers):
+    # bounded, per-process executor; forked children get a fresh one
+    return _get_or_create(
+        ("pool", name, max_workers),
+        lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-"),
+    )
+
+def _start_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="event-loop", daemon=True).start()
+    return loop
+
+def event_loop():
+    # one asyncio loop per process, running in a background thread (async mode)
+    return _get_or_create(("event-loop",), _start_event_loop)
+
+def _make_cache_backend(name):
+    if name == "local":
+        return LocalSharedCache(current_app.config["SHARED_CACHE_MAXSIZE"])
+    if name in ("", "none"):
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND '{name}'")
+
+def shared_cache():
+    name = current_app.config["CACHE_BACKEND"]
+    return _get_or_create(("cache-backend", name), lambda: _make_cache_backend(name))
+
+def local_cache(name, maxsize, ttl):
+    return _get_or_create(("cache", name, maxsize, ttl), lambda: TTLCache(maxsize, ttl, shared_cache(), name))
@@ -0,0 +1,220 @@
+# In-process Prometheus-style metrics: request latency/status per endpoint, in-flight requests,
+# and every boto3 call (DynamoDB, S3, Cognito) per operation. Each worker keeps its own counters
+# and, when METRICS_DIR is set, periodically writes them to <dir>/metrics-<pid>.json so that
+# /metrics on any worker can add up the whole server.
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, has_app_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_HELP = {
+    "http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "http_request_duration_seconds": ("histogram", "Request latency, by endpoint and method."),
+    "http_requests_in_flight": ("gauge", "Requests being handled right now."),
+    "http_request_aws_calls": ("histogram", "AWS API calls made while handling one request, by endpoint."),
+    "aws_calls_total": ("counter", "AWS API calls, by service, operation and outcome."),
+    "aws_call_duration_seconds": ("histogram", "AWS API call latency including retries, by service and operation."),
+    "dynamo_scan_fallback_total": ("counter", "Parallel Scans run because a GSI was unavailable, by table."),
+    "dynamo_scan_fallback_seconds_total": ("counter", "Time spent in those Scans, by table."),
+    "cache_requests_total": ("counter", "Read-through cache lookups, by cache and result (hit/miss)."),
+    "cache_evictions_total": ("counter", "Entries dropped to stay within a cache's size, by cache."),
+    "cache_entries": ("gauge", "Entries held in a cache's in-process tier, by cache."),
+}
+
+_lock = threading.Lock()
+_state = {"counters": {}, "gauges": {}, "histograms": {}}
+_last_flush = [0.0]
+
+def _reset():
+    # a forked worker starts from zero instead of re-reporting its parent's counts
+    global _lock
+    _lock = threading.Lock()
+    _state.update(counters={}, gauges={}, histograms={})
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset)
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+def inc(name: str, labels: dict, value: float = 1):
+    key = _labels(labels)
+    with _lock:
+        series = _state["counters"].setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+def gauge_add(name: str, labels: dict, delta: float):
+    key = _labels(labels)
+    with _lock:
+        series = _state["gauges"].setdefault(name, {})
+        series[key] = series.get(key, 0) + delta
+
+def observe(name: str, labels: dict, value: float, buckets=LATENCY_BUCKETS):
+    # per-bucket (non-cumulative) counts with a trailing +Inf slot; cumulated when rendered
+    key = _labels(labels)
+    with _lock:
+        series = _state["histograms"].setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            h = series[key] = {"le": list(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0}
+        i = 0
+        while i < len(buckets) and value > buckets[i]:
+            i += 1
+        h["counts"][i] += 1
+        h["sum"] += value
+
+def snapshot() -> dict:
+    with _lock:
+        return json.loads(json.dumps(_state))
+
+# ---- boto3 ----
+
+def _before_call(model, context, **_):
+    # after-call-error isn't given the model, so the operation name travels in the context
+    context["metrics_call"] = (model.name, time.perf_counter())
+
+def _after_call(service):
+    def hook(context, http_response=None, **_):
+        call = context.pop("metrics_call", None)
+        if call is None:
+            return
+        operation, started = call
+        status = http_response.status_code if http_response is not None else None
+        outcome = "ok" if status is not None and status < 400 else "error"
+        record_call(service, operation, outcome, time.perf_counter() - started)
+    return hook
+
+def record_call(service: str, operation: str, outcome: str, elapsed: float):
+    # also used by the local storage backends, so their calls are counted like AWS ones
+    inc("aws_calls_total", {"service": service, "operation": operation, "outcome": outcome})
+    observe("aws_call_duration_seconds", {"service": service, "operation": operation}, elapsed)
+    if has_app_context() and "aws_calls" in g:
+        with _lock:  # fanned-out calls of one request share g
+            g.aws_calls += 1
+
+def instrument_client(client):
+    # before-call/after-call fire once per API call, around all of botocore's retries
+    service = client.meta.service_model.service_name
+    hook = _after_call(service)
+    client.meta.events.register("before-call", _before_call)
+    client.meta.events.register("after-call", hook)
+    client.meta.events.register("after-call-error", hook)
+    return client
+
+# ---- aggregation / exposition ----
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def flush(directory: str):
+    path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+def _merge(into: dict, snap: dict, with_gauges: bool):
+    for kind in ("counters", "gauges") if with_gauges else ("counters",):
+        for name, series in snap[kind].items():
+            merged = into[kind].setdefault(name, {})
+            for key, value in series.items():
+                merged[key] = merged.get(key, 0) + value
+    for name, series in snap["histograms"].items():
+        merged = into["histograms"].setdefault(name, {})
+        for key, h in series.items():
+            m = merged.get(key)
+            if m is None:
+                merged[key] = {"le": h["le"], "counts": list(h["counts"]), "sum": h["sum"]}
+            else:
+                m["counts"] = [a + b for a, b in zip(m["counts"], h["counts"])]
+                m["sum"] += h["sum"]
+
+def collect(directory=None) -> dict:
+    # this worker's live numbers plus every other worker's last flush; counters of workers that
+    # have exited are kept (so totals don't go backwards), their gauges are not
+    total = {"counters": {}, "gauges": {}, "histograms": {}}
+    _merge(total, snapshot(), True)
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")) if directory else []:
+        pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+        if pid == os.getpid():
+            continue
+        try:
+            with open(path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now; next scrape picks it up
+        _merge(total, snap, _alive(pid))
+    return total
+
+def _header(name: str):
+    kind, help_text = _HELP.get(name, ("untyped", name))
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+def render(state: dict) -> str:
+    lines = []
+    for kind in ("counters", "gauges"):
+        for name, series in sorted(state[kind].items()):
+            lines += _header(name)
+            lines += [f"{name}{{{key}}} {value}" if key else f"{name} {value}" for key, value in sorted(series.items())]
+    for name, series in sorted(state["histograms"].items()):
+        lines += _header(name)
+        for key, h in sorted(series.items()):
+            prefix, labels = (f"{key},", f"{{{key}}}") if key else ("", "")
+            running = 0
+            for le, count in zip(list(h["le"]) + ["+Inf"], h["counts"]):
+                running += count
+                lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {running}')
+            lines.append(f"{name}_sum{labels} {h['sum']}")
+            lines.append(f"{name}_count{labels} {running}")
+    return "\n".join(lines) + "\n"
+
+# ---- Flask ----
+
+def init_metrics(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+    directory = app.config["METRICS_DIR"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.aws_calls = 0
+        gauge_add("http_requests_in_flight", {}, 1)
+
+    @app.after_request
+    def record_status(resp):
+        g.metrics_status = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def record_request(exc):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        endpoint = request.endpoint or "unmatched"
+        labels = {"endpoint": endpoint, "method": request.method}
+        gauge_add("http_requests_in_flight", {}, -1)
+        inc("http_requests_total", {**labels, "status": g.pop("metrics_status", 500)})
+        observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+        observe("http_request_aws_calls", {"endpoint": endpoint}, g.pop("aws_calls", 0), COUNT_BUCKETS)
+        now = time.monotonic()
+        if directory and now - _last_flush[0] >= app.config["METRICS_FLUSH_INTERVAL"]:
+            _last_flush[0] = now
+            flush(directory)
+
+    @app.get("/metrics")
+    def metrics():
+        return app.response_class(render(collect(directory)), mimetype="text/plain; version=0.0.4")
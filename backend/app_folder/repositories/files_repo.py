@@ -0,0 +1,154 @@
+import time
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from ..extensions import dynamo_table
+from ..utils.dynamo import cancellation_codes, iter_items, transact_write
+from flask import current_app
+
+# Adjacency-list layout of a project's file tree: one item per folder or file,
+# keyed by (projectId, nodeKey). A folder's nodeKey is its path ("/", "/Site/", "/Site/Photos/");
+# a file's is its folder's path + "#" + its S3 key, so a folder's whole subtree shares its prefix.
+
+class FolderNotFound(Exception):
+    pass
+
+class FolderExists(Exception):
+    pass
+
+def table():
+    return dynamo_table(current_app.config["DDB_FILES"])
+
+def folder_key(path: list) -> str:
+    return "/" + "".join(f"{name}/" for name in path)
+
+def file_key(path: list, s3_key: str) -> str:
+    return f"{folder_key(path)}#{s3_key}"
+
+def _seq():
+    return time.time_ns()
+
+def _parent_check(project_id: str, path: list):
+    return {"ConditionCheck": {
+        "TableName": current_app.config["DDB_FILES"],
+        "Key": {"projectId": project_id, "nodeKey": folder_key(path)},
+        "ConditionExpression": "attribute_exists(nodeKey)",
+    }}
+
+def _put_under(project_id: str, path: list, item: dict, must_be_new: bool):
+    put = {"TableName": current_app.config["DDB_FILES"], "Item": item}
+    if must_be_new:
+        put["ConditionExpression"] = "attribute_not_exists(nodeKey)"
+    if not path:
+        # root always exists
+        try:
+            table().put_item(**{k: v for k, v in put.items() if k != "TableName"})
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise FolderExists()
+            raise
+        return
+    try:
+        transact_write([_parent_check(project_id, path), {"Put": put}])
+    except ClientError as e:
+        codes = cancellation_codes(e)
+        if codes and codes[0] == "ConditionalCheckFailed":
+            raise FolderNotFound("/".join(path))
+        if len(codes) > 1 and codes[1] == "ConditionalCheckFailed":
+            raise FolderExists()
+        raise
+
+def put_root(project_id: str, created_at: str):
+    table().put_item(Item={
+        "projectId": project_id, "nodeKey": "/", "type": "folder", "name": "root", "createdAt": created_at, "seq": _seq(),
+    })
+
+def put_folder(project_id: str, path: list, name: str, created_at: str):
+    _put_under(project_id, path, {
+        "projectId": project_id, "nodeKey": folder_key(path + [name]), "parent": folder_key(path),
+        "type": "folder", "name": name, "createdAt": created_at, "seq": _seq(),
+    }, must_be_new=True)
+
+def put_file(project_id: str, path: list, file: dict):
+    _put_under(project_id, path, {
+        "projectId": project_id, "nodeKey": file_key(path, file["key"]), "parent": folder_key(path),
+        "type": "file", **file, "seq": _seq(),
+    }, must_be_new=False)
+
+def folder_exists(project_id: str, path: list) -> bool:
+    if not path:
+        return True
+    return "Item" in table().get_item(Key={"projectId": project_id, "nodeKey": folder_key(path)}, ProjectionExpression="nodeKey")
+
+def delete_file(project_id: str, path: list, s3_key: str) -> bool:
+    resp = table().delete_item(Key={"projectId": project_id, "nodeKey": file_key(path, s3_key)}, ReturnValues="ALL_OLD")
+    return "Attributes" in resp
+
+def subtree(project_id: str, prefix: str = "/"):
+    return iter_items(table().query, KeyConditionExpression=Key("projectId").eq(project_id) & Key("nodeKey").begins_with(prefix))
+
+def delete_nodes(project_id: str, nodes):
+    with table().batch_writer() as batch:
+        for n in nodes:
+            batch.delete_item(Key={"projectId": project_id, "nodeKey": n["nodeKey"]})
+
+def delete_folder(project_id: str, path: list):
+    # removes the folder and everything under it; returns the file nodes that were removed
+    nodes = list(subtree(project_id, folder_key(path)))
+    delete_nodes(project_id, nodes)
+    return [n for n in nodes if n.get("type") == "file"]
+
+def delete_tree(project_id: str):
+    delete_nodes(project_id, subtree(project_id))
+
+def _flatten(project_id: str, directory: dict):
+    seq = _seq()
+    nodes = [{"projectId": project_id, "nodeKey": "/", "type": "folder", "name": "root",
+              "createdAt": directory.get("createdAt", ""), "seq": seq}]
+    def walk(folder, path):
+        for f in folder.get("files", []):
+            nodes.append({
+                "projectId": project_id, "nodeKey": file_key(path, f["key"]), "parent": folder_key(path), "type": "file",
+                "name": f.get("name"), "size": f.get("size"), "uploadedAt": f.get("uploadedAt"), "key": f["key"],
+                "seq": seq + len(nodes),
+            })
+        for sub in folder.get("folders", []):
+            nodes.append({
+                "projectId": project_id, "nodeKey": folder_key(path + [sub["name"]]), "parent": folder_key(path),
+                "type": "folder", "name": sub["name"], "createdAt": sub.get("createdAt", ""), "seq": seq + len(nodes),
+            })
+            walk(sub, path + [sub["name"]])
+    walk(directory, [])
+    return nodes
+
+def import_tree(project_id: str, directory: dict):
+    with table().batch_writer(overwrite_by_pkeys=["projectId", "nodeKey"]) as batch:
+        for n in _flatten(project_id, directory):
+            batch.put_item(Item=n)
+
+def replace_tree(project_id: str, directory: dict):
+    delete_tree(project_id)
+    import_tree(project_id, directory)
+
+def build_tree(nodes) -> dict:
+    # nested {"name", "createdAt", "folders", "files"} dicts, children in insertion order
+    nodes = sorted(nodes, key=lambda n: n.get("seq", 0))
+    root = {"name": "root", "createdAt": "", "folders": [], "files": []}
+    folders = {"/": root}
+    for n in sorted((n for n in nodes if n.get("type") == "folder"), key=lambda n: n["nodeKey"].count("/")):
+        if n["nodeKey"] == "/":
+            root["createdAt"] = n.get("createdAt", "")
+            continue
+        parent = folders.get(n.get("parent"))
+        if parent is not None:
+            folder = {"name": n["name"], "createdAt": n.get("createdAt", ""), "folders": [], "files": []}
+            parent["folders"].append(folder)
+            folders[n["nodeKey"]] = folder
+    for n in nodes:
+        if n.get("type") == "file" and n.get("parent") in folders:
+            folders[n["parent"]]["files"].append(
+                {"name": n.get("name"), "size": n.get("size"), "uploadedAt": n.get("uploadedAt"), "key": n["key"]}
+            )
+    return root
+
+def get_tree(project_id: str) -> dict:
+    return build_tree(subtree(project_id))
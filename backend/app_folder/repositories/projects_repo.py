@@ -1,34 +1,144 @@
+import re
 from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from datetime import datetime
 from ..extensions import dynamo_table
+from ..utils import aio
+from ..utils import unit_of_work as uow
+from ..utils.dynamo import batch_get as _batch_get, is_backfilling, iter_items, iter_with_fallback, parallel_scan, projection, read_page
 from flask import current_app
 
+KEY_FIELDS = ("userId", "projectId", "ownerId")
+# what the dashboard renders for each project
+SUMMARY_FIELDS = KEY_FIELDS + (
+    "name", "description", "client", "status", "progress", "startDate", "endDate", "createdAt", "latestUpdates",
+)
+
+# incremented by every write; callers may make a write conditional on it
+VERSION_FIELD = "version"
+# set by every write, alongside the version bump
+UPDATED_FIELD = "updatedAt"
+
+class VersionConflict(Exception):
+    pass
+
 def table():
     return dynamo_table(current_app.config["DDB_PROJECTS"])
 
-def get_project(user_id: str, project_id: str):
-    return table().get_item(Key={"userId": user_id, "projectId": project_id}).get("Item")
+def _key(user_id: str, project_id: str) -> dict:
+    return {"userId": user_id, "projectId": project_id}
+
+def get_project(user_id: str, project_id: str, fields=None):
+    key = _key(user_id, project_id)
+    return uow.get(table().name, key, fields, lambda: table().get_item(Key=key, **projection(fields)).get("Item"))
+
+def batch_get(keys: list, fields=None):
+    # keys are (owner_id, project_id) pairs; returns items in the same order (None if missing)
+    if fields:
+        fields = list(dict.fromkeys(KEY_FIELDS + tuple(fields)))
+    name = current_app.config["DDB_PROJECTS"]
+    return uow.get_many(name, [_key(o, p) for o, p in keys], fields, lambda missing: _batch_get(name, missing, fields))
+
+async def batch_get_async(keys: list, fields=None):
+    if fields:
+        fields = list(dict.fromkeys(KEY_FIELDS + tuple(fields)))
+    name = current_app.config["DDB_PROJECTS"]
+    return await uow.aget_many(name, [_key(o, p) for o, p in keys], fields, lambda missing: aio.batch_get(name, missing, fields))
+
+def owner_id_of(project_id: str):
+    # projectId-index lookup, for memberships written before ownerId was stored on them
+    uow.flush_pending()
+    items = table().query(
+        IndexName="projectId-index", KeyConditionExpression=Key("projectId").eq(project_id),
+        ProjectionExpression="userId", Limit=1,
+    )["Items"]
+    return items[0]["userId"] if items else None
 
 def put_project(item: dict):
-    table().put_item(Item=item)
+    uow.write(table().name, _key(item["userId"], item["projectId"]), "Put", item)
 
 def delete_project(user_id: str, project_id: str):
-    table().delete_item(Key={"userId": user_id, "projectId": project_id})
-
-def update_project_fields(user_id: str, project_id: str, update_expr, expr_attr_names, expr_attr_values, return_values=None):
-    return table().update_item(
-        Key={"userId": user_id, "projectId": project_id},
-        UpdateExpression=update_expr,
-        ExpressionAttributeNames=expr_attr_names or None,
-        ExpressionAttributeValues=expr_attr_values or None,
-        ReturnValues=return_values or "NONE",
+    uow.write(table().name, _key(user_id, project_id), "Delete")
+
+def _with_version_bump(update_expr: str) -> str:
+    bump = "#__v = if_not_exists(#__v, :__zero) + :__one, #__u = :__now"
+    m = re.search(r"\bSET\s", update_expr)
+    if m:
+        return f"{update_expr[:m.end()]}{bump}, {update_expr[m.end():]}"
+    return f"SET {bump} {update_expr}"
+
+def update_project_fields(user_id: str, project_id: str, update_expr, expr_attr_names, expr_attr_values, return_values=None,
+                          expected_version=None):
+    # every write bumps `version`; with expected_version the write only applies if nobody wrote in between
+    names = {**(expr_attr_names or {}), "#__v": VERSION_FIELD, "#__u": UPDATED_FIELD}
+    values = {**(expr_attr_values or {}), ":__zero": 0, ":__one": 1, ":__now": datetime.utcnow().isoformat()}
+    kwargs = {}
+    if expected_version is not None:
+        values[":__expected"] = expected_version
+        # items written before versioning have no attribute and count as version 0
+        kwargs["ConditionExpression"] = "#__v = :__expected" if expected_version else "attribute_not_exists(#__v) OR #__v = :__expected"
+    key = _key(user_id, project_id)
+    try:
+        return uow.immediate(table().name, key, lambda: table().update_item(
+            Key=key,
+            UpdateExpression=_with_version_bump(update_expr),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues=return_values or "NONE",
+            **kwargs,
+        ))
+    except ClientError as e:
+        if expected_version is not None and e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            raise VersionConflict()
+        raise
+
+def touch(user_id: str, project_id: str):
+    # bumps version/updatedAt for changes stored outside the item (file tree) that its ETag must cover
+    update_project_fields(user_id, project_id, "", None, None)
+
+def iter_owned_by(owner_id: str, fields=None):
+    # prefers GSI ownerId-index; falls back to scan while it is backfilling
+    uow.flush_pending()
+    return iter_with_fallback(
+        lambda: iter_items(
+            table().query, IndexName="ownerId-index", KeyConditionExpression=Key("ownerId").eq(owner_id), **projection(fields)
+        ),
+        lambda: parallel_scan(table(), FilterExpression=Attr("ownerId").eq(owner_id), **projection(fields))[0],
+        is_backfilling,
     )
 
-def query_owned_by(owner_id: str):
-    # prefers GSI ownerId-index; falls back to scan
+def query_owned_by(owner_id: str, fields=None):
+    return list(iter_owned_by(owner_id, fields))
+
+async def query_owned_by_async(owner_id: str, fields=None):
+    await uow.aflush_pending()
     try:
-        return table().query(IndexName="ownerId-index", KeyConditionExpression=Key("ownerId").eq(owner_id))["Items"]
+        return await aio.query_all(
+            current_app.config["DDB_PROJECTS"], IndexName="ownerId-index",
+            KeyConditionExpression=Key("ownerId").eq(owner_id), **projection(fields),
+        )
     except Exception as e:
-        msg = str(getattr(getattr(e, "response", {}), "get", lambda *_: {})("Error", {}).get("Message", ""))
-        if "backfilling" in msg.lower():
-            return table().scan(FilterExpression=Attr("ownerId").eq(owner_id))["Items"]
-        raise
+        if not is_backfilling(e):
+            raise
+    items, _ = await aio.to_thread(parallel_scan, table(), FilterExpression=Attr("ownerId").eq(owner_id), **projection(fields))
+    return items
+
+def page_owned_by(owner_id: str, limit: int, cursor=None, fields=None):
+    # returns (items, next_cursor); the cursor records which access path produced it
+    uow.flush_pending()
+    cursor = cursor or {}
+    if not cursor.get("scan"):
+        try:
+            items, last_key = read_page(
+                table().query, limit, cursor.get("key"),
+                IndexName="ownerId-index", KeyConditionExpression=Key("ownerId").eq(owner_id), **projection(fields),
+            )
+            return items, last_key and {"key": last_key}
+        except Exception as e:
+            if not is_backfilling(e):
+                raise
+            cursor = {}
+    items, scan_state = parallel_scan(
+        table(), limit, cursor.get("scan"), FilterExpression=Attr("ownerId").eq(owner_id), **projection(fields)
+    )
+    return items, scan_state and {"scan": scan_state}
@@ -1,30 +1,100 @@
 from boto3.dynamodb.conditions import Key, Attr
 from ..extensions import dynamo_table
+from ..utils import aio
+from ..utils import unit_of_work as uow
+from ..utils.dynamo import is_backfilling, iter_items, iter_with_fallback, parallel_scan, read_page
 from flask import current_app
 
 def table():
     return dynamo_table(current_app.config["DDB_TEAMS"])
 
+def iter_by_project(project_id: str):
+    # the table's own key: no index to wait for
+    uow.flush_pending()
+    return iter_items(table().query, KeyConditionExpression=Key("projectId").eq(project_id))
+
 def list_by_project(project_id: str):
-    try:
-        return table().query(KeyConditionExpression=Key("projectId").eq(project_id))["Items"]
-    except Exception:
-        return table().scan(FilterExpression=Attr("projectId").eq(project_id))["Items"]
+    return list(iter_by_project(project_id))
+
+async def list_by_project_async(project_id: str):
+    await uow.aflush_pending()
+    return await aio.query_all(current_app.config["DDB_TEAMS"], KeyConditionExpression=Key("projectId").eq(project_id))
+
+def page_by_project(project_id: str, limit: int, cursor=None):
+    uow.flush_pending()
+    items, last_key = read_page(
+        table().query, limit, (cursor or {}).get("key"), KeyConditionExpression=Key("projectId").eq(project_id)
+    )
+    return items, last_key and {"key": last_key}
+
+def iter_by_user(user_id: str):
+    # prefers GSI userId-index; falls back to scan while it is backfilling
+    uow.flush_pending()
+    return iter_with_fallback(
+        lambda: iter_items(table().query, IndexName="userId-index", KeyConditionExpression=Key("userId").eq(user_id)),
+        lambda: parallel_scan(table(), FilterExpression=Attr("userId").eq(user_id))[0],
+        is_backfilling,
+    )
 
 def list_by_user(user_id: str):
+    return list(iter_by_user(user_id))
+
+async def list_by_user_async(user_id: str):
+    await uow.aflush_pending()
     try:
-        return table().query(IndexName="userId-index", KeyConditionExpression=Key("userId").eq(user_id))["Items"]
-    except Exception:
-        return table().scan(FilterExpression=Attr("userId").eq(user_id))["Items"]
+        return await aio.query_all(
+            current_app.config["DDB_TEAMS"], IndexName="userId-index", KeyConditionExpression=Key("userId").eq(user_id)
+        )
+    except Exception as e:
+        if not is_backfilling(e):
+            raise
+    items, _ = await aio.to_thread(parallel_scan, table(), FilterExpression=Attr("userId").eq(user_id))
+    return items
+
+def page_by_user(user_id: str, limit: int, cursor=None):
+    uow.flush_pending()
+    cursor = cursor or {}
+    if not cursor.get("scan"):
+        try:
+            items, last_key = read_page(
+                table().query, limit, cursor.get("key"),
+                IndexName="userId-index", KeyConditionExpression=Key("userId").eq(user_id),
+            )
+            return items, last_key and {"key": last_key}
+        except Exception as e:
+            if not is_backfilling(e):
+                raise
+            cursor = {}
+    items, scan_state = parallel_scan(table(), limit, cursor.get("scan"), FilterExpression=Attr("userId").eq(user_id))
+    return items, scan_state and {"scan": scan_state}
 
 def get_membership(project_id: str, user_id: str):
-    return table().get_item(Key={"projectId": project_id, "userId": user_id}).get("Item")
+    key = {"projectId": project_id, "userId": user_id}
+    return uow.get(table().name, key, None, lambda: table().get_item(Key=key).get("Item"))
 
-def put_member(project_id: str, user_id: str, role: str, added_at: str):
-    table().put_item(
-        Item={"projectId": project_id, "userId": user_id, "role": role, "addedAt": added_at},
+def put_member(project_id: str, user_id: str, role: str, added_at: str, owner_id: str = None):
+    item = {"projectId": project_id, "userId": user_id, "role": role, "addedAt": added_at}
+    if owner_id:
+        item["ownerId"] = owner_id  # lets members resolve the project key without a projectId lookup
+    uow.immediate(table().name, {"projectId": project_id, "userId": user_id}, lambda: table().put_item(
+        Item=item,
         ConditionExpression="attribute_not_exists(projectId) AND attribute_not_exists(userId)"
-    )
+    ))
+
+def set_owner(project_id: str, user_id: str, owner_id: str):
+    uow.write(table().name, {"projectId": project_id, "userId": user_id}, "Update", {
+        "UpdateExpression": "SET ownerId = :o",
+        "ExpressionAttributeValues": {":o": owner_id},
+    })
 
 def delete_member(project_id: str, user_id: str):
-    table().delete_item(Key={"projectId": project_id, "userId": user_id})
+    uow.write(table().name, {"projectId": project_id, "userId": user_id}, "Delete")
+
+def delete_members(project_id: str, user_ids):
+    if uow.current() is None:
+        with table().batch_writer() as batch:
+            for uid in user_ids:
+                batch.delete_item(Key={"projectId": project_id, "userId": uid})
+        return
+    for uid in user_ids:
+        uow.write(table().name, {"projectId": project_id, "userId": uid}, "Delete")
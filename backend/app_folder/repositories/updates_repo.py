@@ -0,0 +1,54 @@
+import uuid
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+from ..extensions import dynamo_table
+from ..utils.dynamo import iter_items
+from flask import current_app
+
+# Project updates feed: one item per update, keyed by (projectId, updateKey) where
+# updateKey = "<ISO timestamp>#<random>", so a descending Query reads newest first.
+# Updates imported from the old embedded list sort before every real timestamp.
+
+def table():
+    return dynamo_table(current_app.config["DDB_UPDATES"])
+
+def new_entry(project_id: str, update: dict) -> dict:
+    now = datetime.utcnow().isoformat()
+    return {**update, "projectId": project_id, "updateKey": f"{now}#{uuid.uuid4().hex[:8]}", "postedAt": now}
+
+def put(entry: dict):
+    table().put_item(Item=entry)
+
+def delete(entry: dict):
+    table().delete_item(Key={"projectId": entry["projectId"], "updateKey": entry["updateKey"]})
+
+def legacy_entries(project_id: str, updates: list) -> list:
+    # the embedded list is newest first; keys are deterministic so re-importing is harmless
+    n = len(updates)
+    return [{**u, "projectId": project_id, "updateKey": f"0000#{n - 1 - i:06d}"} for i, u in enumerate(updates)]
+
+def put_many(entries: list):
+    with table().batch_writer(overwrite_by_pkeys=["projectId", "updateKey"]) as batch:
+        for e in entries:
+            batch.put_item(Item=e)
+
+def _query(project_id: str, before=None):
+    cond = Key("projectId").eq(project_id)
+    if before:
+        cond = cond & Key("updateKey").lt(before)
+    return {"KeyConditionExpression": cond, "ScanIndexForward": False}
+
+def iter_newest_first(project_id: str, before=None):
+    return iter_items(table().query, **_query(project_id, before))
+
+def page(project_id: str, limit: int, before=None):
+    # newest-first page older than `before`; the second value is the next `before`, or None
+    resp = table().query(Limit=limit, **_query(project_id, before))
+    items = resp.get("Items", [])
+    return items, items[-1]["updateKey"] if items and resp.get("LastEvaluatedKey") else None
+
+def delete_all(project_id: str):
+    with table().batch_writer() as batch:
+        for item in iter_items(table().query, KeyConditionExpression=Key("projectId").eq(project_id),
+                               ProjectionExpression="projectId, updateKey"):
+            batch.delete_item(Key={"projectId": item["projectId"], "updateKey": item["updateKey"]})
@@ -1,11 +1,104 @@
-from ..extensions import dynamo_table
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from ..extensions import dynamo_table, local_cache
+from ..utils import aio
+from ..utils import unit_of_work as uow
+from ..utils.cache import MISSING
+from ..utils.dynamo import batch_get as _batch_get
 from flask import current_app
 
+# fields the team page needs from a user profile
+PROFILE_FIELDS = ("userId", "given_name", "family_name", "email")
+
 def table():
     return dynamo_table(current_app.config["DDB_USERS"])
 
+def cache():
+    cfg = current_app.config
+    return local_cache("users", cfg["USER_CACHE_MAXSIZE"], cfg["USER_CACHE_TTL"])
+
+def email_cache():
+    # email_key(email) -> userId, or None for an email no user has
+    cfg = current_app.config
+    return local_cache("emails", cfg["EMAIL_CACHE_MAXSIZE"], cfg["EMAIL_CACHE_TTL"])
+
+def email_key(email: str):
+    # as looked up: the email-index (and Cognito's filter) match case, so "Bob@x.com" and
+    # "bob@x.com" may well have different answers
+    return email.strip()
+
+def id_for_email(email: str):
+    # email-index lookup; None when no profile has this email or the index isn't there yet
+    uow.flush_pending()
+    try:
+        items = table().query(
+            IndexName="email-index", KeyConditionExpression=Key("email").eq(email),
+            ProjectionExpression="userId", Limit=1,
+        )["Items"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("ValidationException", "ResourceNotFoundException"):
+            raise
+        current_app.logger.warning("email-index lookup failed on %s: %s", table().name, e)
+        return None
+    return items[0]["userId"] if items else None
+
+def _cache_key(user_id: str, fields=None):
+    return f"{user_id}|{','.join(fields)}" if fields else user_id
+
 def get(user_id: str):
-    return table().get_item(Key={"userId": user_id}).get("Item")
+    key = {"userId": user_id}
+    return cache().get_or_load(
+        _cache_key(user_id),
+        lambda: uow.get(table().name, key, None, lambda: table().get_item(Key=key).get("Item")),
+        cache_none=False,
+    )
+
+def _cached(user_ids: list, fields):
+    # ({user_id: profile} from the cache, ids still to read)
+    c = cache()
+    found, missing = {}, []
+    for uid in dict.fromkeys(user_ids):
+        value = c.get(_cache_key(uid, fields))
+        if value is MISSING:
+            missing.append(uid)
+        else:
+            found[uid] = value
+    return found, missing
+
+def _store(found: dict, items: list, fields):
+    c = cache()
+    for u in filter(None, items):
+        found[u["userId"]] = u
+        c.set(_cache_key(u["userId"], fields), u)
+
+def batch_get(user_ids: list, fields=PROFILE_FIELDS):
+    # returns one entry per input id, in input order (None when the user doesn't exist)
+    found, missing = _cached(user_ids, fields)
+    if missing:
+        name = current_app.config["DDB_USERS"]
+        _store(found, uow.get_many(name, [{"userId": uid} for uid in missing], fields,
+                                   lambda keys: _batch_get(name, keys, fields)), fields)
+    return [found.get(uid) for uid in user_ids]
+
+async def batch_get_async(user_ids: list, fields=PROFILE_FIELDS):
+    found, missing = _cached(user_ids, fields)
+    if missing:
+        name = current_app.config["DDB_USERS"]
+        _store(found, await uow.aget_many(name, [{"userId": uid} for uid in missing], fields,
+                                          lambda keys: aio.batch_get(name, keys, fields)), fields)
+    return [found.get(uid) for uid in user_ids]
+
+def invalidate(user_id: str):
+    cache().delete(_cache_key(user_id), _cache_key(user_id, PROFILE_FIELDS))
+
+def _forget(user: dict):
+    invalidate(user["userId"])
+    if user.get("email"):
+        email_cache().delete(email_key(user["email"]))  # may hold "not found" from before sign-up
 
 def put(user: dict):
-    table().put_item(Item=user)
+    uow.write(table().name, {"userId": user["userId"]}, "Put", user)
+    # now for this request's reads, and again once written: a read from another request in
+    # between would cache the old profile
+    _forget(user)
+    uow.after_flush(lambda: _forget(user))
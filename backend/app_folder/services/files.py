@@ -1,28 +1,200 @@
-from ..extensions import s3_client
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+from ..extensions import local_cache, s3_client, thread_pool
+from ..repositories import files_repo, projects_repo
 from flask import current_app
 
-def presign_put(project_id: str, file_name: str, file_type: str):
-    key = f"projects/{project_id}/{file_name}"
-    url = s3_client().generate_presigned_url(
-        "put_object",
-        Params={"Bucket": current_app.config["S3_BUCKET"], "Key": key, "ContentType": file_type},
-        ExpiresIn=300,
+def _presign_cache():
+    # a signed URL is reused until PRESIGN_MIN_REMAINING seconds before it expires
+    cfg = current_app.config
+    return local_cache("presign", cfg["PRESIGN_CACHE_MAXSIZE"], cfg["PRESIGN_EXPIRES"] - cfg["PRESIGN_MIN_REMAINING"])
+
+def _presign(operation: str, key: str, content_type: str = None):
+    params = {"Bucket": current_app.config["S3_BUCKET"], "Key": key}
+    if content_type:
+        params["ContentType"] = content_type
+    return _presign_cache().get_or_load(
+        f"{operation}|{key}|{content_type or ''}",
+        lambda: s3_client().generate_presigned_url(operation, Params=params, ExpiresIn=current_app.config["PRESIGN_EXPIRES"]),
     )
-    return url, key
+
+def upload_key(project_id: str, file_name: str):
+    return f"projects/{project_id}/{file_name}"
+
+def in_project(project_id: str, key) -> bool:
+    return isinstance(key, str) and key.startswith(upload_key(project_id, ""))
+
+def presign_put(project_id: str, file_name: str, file_type: str):
+    key = upload_key(project_id, file_name)
+    return _presign("put_object", key, file_type), key
 
 def presign_get(key: str):
-    url = s3_client().generate_presigned_url(
-        "get_object",
-        Params={"Bucket": current_app.config["S3_BUCKET"], "Key": key},
-        ExpiresIn=300,
+    return _presign("get_object", key)
+
+def presign_batch(project_id: str, requests: list):
+    # one result per request, in order: {"operation", "key", "url"} or {"error"}
+    out = []
+    for r in requests:
+        r = r if isinstance(r, dict) else {}
+        op = r.get("operation", "get")
+        if op == "get" and r.get("key"):
+            if not in_project(project_id, r["key"]):
+                out.append({"error": "Key is not in this project"})
+                continue
+            out.append({"operation": op, "key": r["key"], "url": presign_get(r["key"])})
+        elif op == "put" and r.get("fileName"):
+            url, key = presign_put(project_id, r["fileName"], r.get("fileType"))
+            out.append({"operation": op, "key": key, "url": url})
+        else:
+            out.append({"error": "Each item needs operation 'get' with a key or 'put' with a fileName"})
+    return out
+
+MAX_PARTS = 10000  # S3 multipart limit
+
+class UploadNotFound(Exception):
+    pass
+
+@contextmanager
+def _upload_calls():
+    # an unknown, completed or aborted upload id
+    try:
+        yield
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchUpload":
+            raise UploadNotFound() from e
+        raise
+
+def parse_parts(parts) -> list:
+    # client part list [{partNumber, etag}] -> S3's, sorted; raises ValueError when malformed
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("'parts' must be a non-empty list")
+    out = {}
+    for p in parts:
+        number = p.get("partNumber") if isinstance(p, dict) else None
+        etag = p.get("etag") if isinstance(p, dict) else None
+        if not isinstance(number, int) or isinstance(number, bool) or not 1 <= number <= MAX_PARTS:
+            raise ValueError(f"Each part needs a partNumber between 1 and {MAX_PARTS}")
+        if not isinstance(etag, str) or not etag:
+            raise ValueError("Each part needs an etag")
+        out[number] = etag
+    return [{"PartNumber": n, "ETag": out[n]} for n in sorted(out)]
+
+def create_multipart(project_id: str, file_name: str, file_type: str = None):
+    key = upload_key(project_id, file_name)
+    params = {"Bucket": current_app.config["S3_BUCKET"], "Key": key}
+    if file_type:
+        params["ContentType"] = file_type
+    return s3_client().create_multipart_upload(**params)["UploadId"], key
+
+def presign_parts(key: str, upload_id: str, part_numbers: list):
+    client, bucket = s3_client(), current_app.config["S3_BUCKET"]
+    return [{
+        "partNumber": n,
+        "url": client.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": n},
+            ExpiresIn=current_app.config["MULTIPART_PART_EXPIRES"],
+        ),
+    } for n in part_numbers]
+
+def list_parts(key: str, upload_id: str):
+    # raises UploadNotFound
+    pages = s3_client().get_paginator("list_parts").paginate(
+        Bucket=current_app.config["S3_BUCKET"], Key=key, UploadId=upload_id
     )
-    return url
+    with _upload_calls():
+        return [
+            {"partNumber": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]}
+            for page in pages for p in page.get("Parts", [])
+        ]
+
+def complete_multipart(key: str, upload_id: str, parts=None):
+    # without an explicit part list, completes with whatever parts S3 already holds.
+    # Raises ValueError for a malformed part list (or none uploaded) and UploadNotFound
+    parts = parse_parts(parts or list_parts(key, upload_id))
+    with _upload_calls():
+        s3_client().complete_multipart_upload(
+            Bucket=current_app.config["S3_BUCKET"], Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+        )
+
+def abort_multipart(key: str, upload_id: str):
+    with _upload_calls():
+        s3_client().abort_multipart_upload(Bucket=current_app.config["S3_BUCKET"], Key=key, UploadId=upload_id)
+
+def sweep_stale_uploads(max_age_hours: float, prefix: str = "projects/"):
+    # aborts incomplete multipart uploads older than max_age_hours; returns how many were aborted
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    client, bucket = s3_client(), current_app.config["S3_BUCKET"]
+    aborted = 0
+    for page in client.get_paginator("list_multipart_uploads").paginate(Bucket=bucket, Prefix=prefix):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] < cutoff:
+                client.abort_multipart_upload(Bucket=bucket, Key=upload["Key"], UploadId=upload["UploadId"])
+                aborted += 1
+    return aborted
 
 def delete_s3_object(key: str):
     s3_client().delete_object(Bucket=current_app.config["S3_BUCKET"], Key=key)
 
+S3_DELETE_BATCH = 1000  # DeleteObjects limit
+
+def _delete_batch(client, bucket: str, keys: list):
+    # returns the keys S3 could not delete as {"key", "code", "message"}
+    try:
+        resp = client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True})
+    except ClientError as e:
+        err = e.response.get("Error", {})
+        return [{"key": k, "code": err.get("Code"), "message": err.get("Message")} for k in keys]
+    return [{"key": e["Key"], "code": e.get("Code"), "message": e.get("Message")} for e in resp.get("Errors", [])]
+
+def _delete_batches(batches):
+    # DeleteObjects calls run concurrently on the bounded S3 pool
+    client, bucket = s3_client(), current_app.config["S3_BUCKET"]
+    pool = thread_pool("s3-delete", current_app.config["S3_DELETE_WORKERS"])
+    futures = [pool.submit(_delete_batch, client, bucket, batch) for batch in batches if batch]
+    failed = []
+    for fut in futures:
+        failed.extend(fut.result())
+    return failed
+
+def delete_s3_objects(keys) -> list:
+    keys = list(dict.fromkeys(keys))
+    return _delete_batches(keys[i:i + S3_DELETE_BATCH] for i in range(0, len(keys), S3_DELETE_BATCH))
+
+def delete_s3_prefix(prefix: str) -> list:
+    # list_objects_v2 pages hold at most 1000 keys, so each page is one DeleteObjects batch
+    pages = s3_client().get_paginator("list_objects_v2").paginate(Bucket=current_app.config["S3_BUCKET"], Prefix=prefix)
+    return _delete_batches([o["Key"] for o in page.get("Contents", [])] for page in pages)
+
 def collect_files(folder: dict):
     files = list(folder.get("files", []))
     for sub in folder.get("folders", []):
         files.extend(collect_files(sub))
     return files
+
+def valid_folder_name(name: str) -> bool:
+    # "/" would split the path and a leading "#" would collide with file node keys
+    return bool(name) and "/" not in name and not name.startswith("#")
+
+def _drop_embedded_directory(project: dict):
+    directory = project.pop("directory", None)
+    if directory is not None:
+        projects_repo.update_project_fields(project["userId"], project["projectId"], "REMOVE directory", None, None)
+    return directory
+
+def migrate_directory(project: dict):
+    # moves a legacy embedded `directory` document into per-node items, once
+    directory = project.get("directory")
+    if directory is not None:
+        files_repo.import_tree(project["projectId"], directory)
+        _drop_embedded_directory(project)
+
+def replace_directory(project: dict, directory: dict):
+    _drop_embedded_directory(project)
+    files_repo.replace_tree(project["projectId"], directory)
+    projects_repo.touch(project["userId"], project["projectId"])
+
+def directory_tree(project: dict) -> dict:
+    migrate_directory(project)
+    return files_repo.get_tree(project["projectId"])
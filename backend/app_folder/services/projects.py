@@ -1,5 +1,9 @@
+import re
 from datetime import datetime
-from ..repositories import projects_repo as repo
+from ..repositories import projects_repo as repo, teams_repo, files_repo, updates_repo
+from ..utils import aio
+from ..utils.fanout import fan_out
+from . import files as fsvc
 
 def create_project(owner_id: str, data: dict):
     import uuid
@@ -13,6 +17,7 @@ def create_project(owner_id: str, data: dict):
         "startDate": data.get("startDate"),
         "endDate": data.get("endDate"),
         "createdAt": now,
+        "updatedAt": now,
         "s3Folder": f"{owner_id}/{project_id}/",
         "client": data.get("client", ""),
         "location": data.get("location", ""),
@@ -23,27 +28,200 @@ def create_project(owner_id: str, data: dict):
         "budget": 0,
         "expenses": [],
         "timeline": [],
-        "updates": [],
+        "latestUpdates": [],
         "notes": [],
         "inspections": [],
         "tasks": [],
-        "directory": {"name": "root", "folders": [], "files": []},
         "userId": owner_id,  # ensure PK consistency
+        "version": 1,
     }
     repo.put_project(item)
+    files_repo.put_root(project_id, now)
     return project_id, now
 
+def delete_project(owner_id: str, project_id: str):
+    # removes stored files, the file tree, updates, memberships and the project item; returns S3 keys that failed
+    failed = fsvc.delete_s3_prefix(f"projects/{project_id}/")
+    files_repo.delete_tree(project_id)
+    updates_repo.delete_all(project_id)
+    teams_repo.delete_members(project_id, [m["userId"] for m in teams_repo.iter_by_project(project_id)])
+    repo.delete_project(owner_id, project_id)
+    return failed
+
 def get_project_for_user(user_id: str, project_id: str):
     item = repo.get_project(user_id, project_id)
     return item
 
-def update_fields(user_id: str, project_id: str, fields: dict):
+def resolve_owner_id(membership: dict):
+    if membership.get("ownerId"):
+        return membership["ownerId"]
+    if membership.get("role") == "owner":
+        return membership["userId"]
+    owner_id = repo.owner_id_of(membership["projectId"])
+    if owner_id:
+        # backfill so the next lookup for this membership is a plain key read
+        teams_repo.set_owner(membership["projectId"], membership["userId"], owner_id)
+    return owner_id
+
+def owner_id_for(project_id: str, user_id: str):
+    membership = teams_repo.get_membership(project_id, user_id)
+    return resolve_owner_id(membership) if membership else None
+
+def team_role(project_id: str, user_id: str):
+    # the caller's role on the project, or None; owners without a team row still own the item
+    membership = teams_repo.get_membership(project_id, user_id)
+    if membership:
+        return membership.get("role", "member")
+    return "owner" if repo.get_project(user_id, project_id, ["projectId"]) else None
+
+def can_manage_team(role, granted_role=None) -> bool:
+    # owners and admins change the team; only an owner grants admin, and nobody grants owner
+    if role not in ("owner", "admin") or granted_role == "owner":
+        return False
+    return granted_role != "admin" or role == "owner"
+
+def _is_shared(membership: dict, user_id: str):
+    return membership.get("role") != "owner" and membership.get("ownerId") != user_id
+
+def _with_roles(memberships: list, items: list):
+    roles = {m["projectId"]: m.get("role", "member") for m in memberships}
+    return [{**p, "currentUserRole": roles[p["projectId"]]} for p in items if p]
+
+def member_projects(memberships: list, fields=None):
+    # one BatchGetItem for all projects the user was added to, tagged with their role
+    keys = [(resolve_owner_id(m), m["projectId"]) for m in memberships]
+    return _with_roles(memberships, repo.batch_get([k for k in keys if k[0]], fields))
+
+async def _resolve_owner_id_async(membership: dict):
+    # only memberships written before ownerId was stored need the projectId-index lookup
+    if membership.get("ownerId") or membership.get("role") == "owner":
+        return resolve_owner_id(membership)
+    return await aio.to_thread(resolve_owner_id, membership)
+
+async def member_projects_async(memberships: list, fields=None):
+    owners = await aio.gather(*(_resolve_owner_id_async(m) for m in memberships))
+    keys = [(o, m["projectId"]) for o, m in zip(owners, memberships) if o]
+    return _with_roles(memberships, await repo.batch_get_async(keys, fields))
+
+def _split_shared(user_id: str, owned: list, memberships: list):
+    owned_pids = {p["projectId"] for p in owned}
+    shared = [m for m in memberships if m["projectId"] not in owned_pids and _is_shared(m, user_id)]
+    return [{**p, "currentUserRole": "owner"} for p in owned], shared
+
+def list_projects(user_id: str, fields=None):
+    owned, memberships = fan_out(lambda: repo.query_owned_by(user_id, fields), lambda: teams_repo.list_by_user(user_id))
+    owned, shared = _split_shared(user_id, owned, memberships)
+    return owned + member_projects(shared, fields)
+
+async def list_projects_async(user_id: str, fields=None):
+    # the owned-projects and memberships queries are independent, so they run together
+    owned, memberships = await aio.gather(repo.query_owned_by_async(user_id, fields), teams_repo.list_by_user_async(user_id))
+    owned, shared = _split_shared(user_id, owned, memberships)
+    return owned + await member_projects_async(shared, fields)
+
+def list_projects_page(user_id: str, limit: int, cursor=None, fields=None):
+    # owned projects first, then shared ones; the cursor records which phase we are in
+    cursor = cursor or {}
+    out = []
+    if "shared" not in cursor:
+        owned, state = repo.page_owned_by(user_id, limit, cursor.get("owned"), fields)
+        out = [{**p, "currentUserRole": "owner"} for p in owned]
+        if state:
+            return out, {"owned": state}
+        limit -= len(out)
+        if limit <= 0:
+            return out, {"shared": None}
+        cursor = {"shared": None}
+    memberships, state = teams_repo.page_by_user(user_id, limit, cursor["shared"])
+    out += member_projects([m for m in memberships if _is_shared(m, user_id)], fields)
+    return out, state and {"shared": state}
+
+# written by the repository on every update, or identifying the item: never set by clients
+RESERVED_FIELDS = repo.KEY_FIELDS + (repo.VERSION_FIELD, repo.UPDATED_FIELD)
+
+# also keeps "#name"/":name" placeholders apart from the repository's "#__v"-style ones
+_FIELD_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+def _check_fields(fields):
+    # raises ValueError
+    if not fields:
+        raise ValueError("No fields to update")
+    bad = [f for f in fields if not isinstance(f, str) or not _FIELD_NAME.match(f)]
+    if bad:
+        raise ValueError(f"Invalid field name(s): {', '.join(map(str, bad))}")
+    reserved = [f for f in fields if f in RESERVED_FIELDS]
+    if reserved:
+        raise ValueError(f"Field(s) can't be updated: {', '.join(reserved)}")
+
+def update_fields(user_id: str, project_id: str, fields: dict, expected_version=None):
+    _check_fields(fields)
     update_expr = "SET " + ", ".join(f"#{k} = :{k}" for k in fields)
     names = {f"#{k}": k for k in fields}
     values = {f":{k}": v for k, v in fields.items()}
-    return repo.update_project_fields(user_id, project_id, update_expr, names, values)
+    return repo.update_project_fields(user_id, project_id, update_expr, names, values, expected_version=expected_version)
 
-def update_single_field(user_id: str, project_id: str, field: str, value):
+def update_single_field(user_id: str, project_id: str, field: str, value, expected_version=None):
+    _check_fields([field])
     return repo.update_project_fields(
-        user_id, project_id, "SET #f = :v", {"#f": field}, {":v": value}, return_values="UPDATED_NEW"
+        user_id, project_id, "SET #f = :v", {"#f": field}, {":v": value}, return_values="UPDATED_NEW",
+        expected_version=expected_version,
+    )
+
+def mutate_project(user_id: str, project_id: str, build_update, fields, return_values=None, attempts: int = 5):
+    # Optimistic read-modify-write for operations that commute with other writes: read the
+    # fields it depends on, build (expr, names, values), write conditioned on the version read,
+    # and on a conflict re-read and re-apply. build_update raises VersionConflict for a real one.
+    for _ in range(attempts):
+        item = repo.get_project(user_id, project_id, list(fields) + [repo.VERSION_FIELD])
+        if item is None:
+            return None
+        expr, names, values = build_update(item)
+        try:
+            return repo.update_project_fields(
+                user_id, project_id, expr, names, values, return_values, expected_version=int(item.get(repo.VERSION_FIELD, 0))
+            )
+        except repo.VersionConflict:
+            continue
+    raise repo.VersionConflict()
+
+MILESTONE_FIELDS = ("title", "date", "completed")
+
+def milestone_edits(edits) -> dict:
+    # [{index, field, value}] -> {(index, field): value}; a repeated (index, field) keeps the last value
+    if not isinstance(edits, list) or not edits:
+        raise ValueError("'edits' must be a non-empty list")
+    out = {}
+    for e in edits:
+        if not isinstance(e, dict) or "index" not in e or "field" not in e:
+            raise ValueError("Each edit needs 'index' and 'field'")
+        idx, field = e["index"], e["field"]
+        if not isinstance(idx, int) or isinstance(idx, bool) or idx < 0:
+            raise ValueError("'index' must be a non-negative integer")
+        if field not in MILESTONE_FIELDS:
+            raise ValueError(f"'field' must be one of {', '.join(MILESTONE_FIELDS)}")
+        out[(idx, field)] = e.get("value")
+    return out
+
+def update_milestones(user_id: str, project_id: str, edits: dict, expected_version=None):
+    # all edits in one UpdateItem. Raises IndexError for an index past the end and VersionConflict
+    # if expected_version is stale or milestones were added/removed since the first read.
+    names = {f"#m{MILESTONE_FIELDS.index(f)}": f for _, f in edits}
+    values = {f":m{n}": v for n, v in enumerate(edits.values())}
+    expr = "SET " + ", ".join(
+        f"milestones[{idx}].#m{MILESTONE_FIELDS.index(field)} = :m{n}" for n, (idx, field) in enumerate(edits)
     )
+    top = max(idx for idx, _ in edits)
+    seen_count = []
+
+    def build(item):
+        if expected_version is not None and int(item.get(repo.VERSION_FIELD, 0)) != expected_version:
+            raise repo.VersionConflict()
+        milestones = item.get("milestones") or []
+        seen_count.append(len(milestones))
+        if len(seen_count) > 1 and seen_count[-1] != seen_count[0]:
+            raise repo.VersionConflict()  # indexes are stale
+        if top >= len(milestones):
+            raise IndexError(top)
+        return expr, names, values
+
+    return mutate_project(user_id, project_id, build, ["milestones"])
@@ -0,0 +1,183 @@
+import uuid
+from . import projects as psvc
+
+TASK_ID = "taskId"
+OPS = ("add", "update", "delete", "move")
+# DynamoDB caps an UpdateExpression at 4KB; past this a diff is written as one list replacement
+MAX_EXPR_LEN = 3500
+
+class TaskNotFound(LookupError):
+    pass
+
+def _with_ids(tasks: list) -> list:
+    return [t if t.get(TASK_ID) else {**t, TASK_ID: str(uuid.uuid4())} for t in tasks]
+
+def validate_ops(ops) -> list:
+    # accepts a single op or a list; raises ValueError describing the first bad one
+    ops = ops if isinstance(ops, list) else [ops]
+    if not ops:
+        raise ValueError("No operations given")
+    for op in ops:
+        if not isinstance(op, dict) or op.get("op") not in OPS:
+            raise ValueError(f"Each operation needs 'op' in {', '.join(OPS)}")
+        if op["op"] == "add" and not isinstance(op.get("task"), dict):
+            raise ValueError("'add' needs a 'task' object")
+        if op["op"] != "add" and not op.get(TASK_ID):
+            raise ValueError(f"'{op['op']}' needs a '{TASK_ID}'")
+        if op["op"] == "update" and not isinstance(op.get("fields"), dict):
+            raise ValueError("'update' needs a 'fields' object")
+        if op["op"] == "move" and not isinstance(op.get("index"), int):
+            raise ValueError("'move' needs an integer 'index'")
+        if "index" in op and not isinstance(op["index"], int):
+            raise ValueError("'index' must be an integer")
+    return ops
+
+def _position(tasks: list, task_id: str) -> int:
+    for i, t in enumerate(tasks):
+        if t.get(TASK_ID) == task_id:
+            return i
+    raise TaskNotFound(task_id)
+
+def apply_ops(tasks: list, ops: list) -> list:
+    # ops are resolved by taskId against the current list, so they still apply after a retry
+    tasks = list(tasks)
+    for op in ops:
+        kind = op["op"]
+        if kind == "add":
+            task = {**op["task"]}
+            task.setdefault(TASK_ID, str(uuid.uuid4()))
+            idx = op.get("index", len(tasks))
+            tasks.insert(max(0, min(idx, len(tasks))), task)
+        elif kind == "delete":
+            # deleting an already-deleted task is a no-op
+            tasks = [t for t in tasks if t.get(TASK_ID) != op[TASK_ID]]
+        elif kind == "update":
+            i = _position(tasks, op[TASK_ID])
+            tasks[i] = {**tasks[i], **{k: v for k, v in op["fields"].items() if k != TASK_ID}}
+        else:
+            task = tasks.pop(_position(tasks, op[TASK_ID]))
+            tasks.insert(max(0, min(op["index"], len(tasks))), task)
+    return tasks
+
+# past this many old x new slots (after an unchanged head and tail) no alignment is searched for
+MAX_ALIGN_CELLS = 40000
+
+def _same(a: dict, b: dict) -> bool:
+    return a.get(TASK_ID) == b.get(TASK_ID)
+
+def _align(old: list, new: list, head: int, tail: int):
+    # (cost, edits, appended) for old[head:len(old)-tail] -> new[head:len(new)-tail], with the
+    # head and tail slots kept as they are; None when that window is too big to search.
+    # edits are [(old index, new index or None for a REMOVE)], then new[appended:] are appended
+    o, w = old[head:len(old) - tail], new[head:len(new) - tail]
+    p, q = len(o), len(w)
+    if p * q > MAX_ALIGN_CELLS:
+        return None
+    inf = float("inf")
+    # cost[i][j]: slot writes to turn o[i:] into w[j:]; appends only land after the tail
+    cost = [[inf] * (q + 1) for _ in range(p + 1)]
+    for j in range(q + 1):
+        cost[p][j] = (q - j) if not tail or j == q else inf
+    for i in range(p - 1, -1, -1):
+        row, below = cost[i], cost[i + 1]
+        for j in range(q, -1, -1):
+            best = 1 + below[j]
+            if j < q:
+                keep = (o[i] != w[j]) + below[j + 1]
+                if keep < best:
+                    best = keep
+            row[j] = best
+    if cost[0][0] == inf:
+        return None
+    edits, i, j = [(k, k) for k in range(head)], 0, 0
+    while i < p:
+        if j < q and cost[i][j] == (o[i] != w[j]) + cost[i + 1][j + 1]:
+            edits.append((head + i, head + j))
+            j += 1
+        else:
+            edits.append((head + i, None))
+        i += 1
+    edits += [(len(old) - tail + k, head + j + k) for k in range(tail)]
+    return cost[0][0], edits, head + j + tail
+
+def _slots(old: list, new: list):
+    # slot-by-slot: the first len(new) slots are rewritten where they differ
+    common = min(len(old), len(new))
+    cost = sum(old[i] != new[i] for i in range(common)) + abs(len(old) - len(new))
+    return cost, [(i, i) for i in range(common)] + [(i, None) for i in range(len(new), len(old))], common
+
+def _edits(old: list, new: list):
+    # DynamoDB can't insert into a list: an UpdateExpression can only rewrite slots in place,
+    # REMOVE slots and append past the end. The cheapest such edit is searched for around the
+    # changed window, once keeping the unchanged tail in place and once letting it shift.
+    head = 0
+    while head < min(len(old), len(new)) and _same(old[head], new[head]):
+        head += 1
+    tail = 0
+    while tail < min(len(old), len(new)) - head and _same(old[-1 - tail], new[-1 - tail]):
+        tail += 1
+    found = [_slots(old, new), _align(old, new, head, tail), _align(old, new, head, 0) if tail else None]
+    return min((f for f in found if f), key=lambda f: f[0])[1:]
+
+def diff_expression(old: list, new: list):
+    # (expr, names, values) that turns `tasks` from old into new: field-level SETs where a slot
+    # keeps its task, whole-slot SETs where it doesn't, REMOVEs for deleted (or moved-out)
+    # tasks and appends past the end. Indexes are only valid for `old`; the caller's version
+    # condition guarantees that is what the item holds.
+    sets, removes, names, values = [], [], {}, {}
+
+    def name(n):
+        alias = f"#t{len(names)}"
+        names[alias] = n
+        return alias
+
+    def value(v):
+        alias = f":t{len(values)}"
+        values[alias] = v
+        return alias
+
+    edits, appended = _edits(old, new)
+    for i, j in edits:
+        o = old[i]
+        if j is None:
+            # REMOVE indexes refer to the list as it was before the update
+            removes.append(f"tasks[{i}]")
+            continue
+        n = new[j]
+        if o == n:
+            continue
+        if o.get(TASK_ID) != n.get(TASK_ID):
+            sets.append(f"tasks[{i}] = {value(n)}")
+            continue
+        sets += [f"tasks[{i}].{name(f)} = {value(v)}" for f, v in n.items() if f not in o or o[f] != v]
+        removes += [f"tasks[{i}].{name(f)}" for f in o if f not in n]
+    # SET past the end of a list appends, in expression order
+    sets += [f"tasks[{len(old) + k}] = {value(t)}" for k, t in enumerate(new[appended:])]
+
+    expr = (f"SET {', '.join(sets)}" if sets else "") + (f" REMOVE {', '.join(removes)}" if removes else "")
+    if len(expr) > MAX_EXPR_LEN:
+        return "SET tasks = :tasks", None, {":tasks": new}
+    return expr.strip(), names or None, values or None
+
+def update_tasks(user_id: str, project_id: str, ops: list):
+    # returns the new task list, or None if the user does not own the project
+    result = []
+    def build(item):
+        old = item.get("tasks")
+        new = apply_ops(_with_ids(old or []), ops)
+        result[:] = [new]
+        if old is None or any(not t.get(TASK_ID) for t in old):
+            # nothing to index into yet, or legacy tasks that first need ids
+            return "SET tasks = :tasks", None, {":tasks": new}
+        return diff_expression(old, new)
+
+    if psvc.mutate_project(user_id, project_id, build, ["tasks"]) is None:
+        return None
+    return result[0]
+
+def ensure_task_ids(project: dict) -> list:
+    # project must have been read with `tasks`; gives legacy tasks the stable ids ops refer to
+    tasks = project.get("tasks") or []
+    if all(t.get(TASK_ID) for t in tasks):
+        return tasks
+    return update_tasks(project["userId"], project["projectId"], []) or tasks
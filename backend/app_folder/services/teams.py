@@ -1,12 +1,30 @@
 from datetime import datetime
+from functools import partial
+from botocore.exceptions import ClientError
+from flask import current_app
 from ..extensions import cognito_idp
 from ..repositories import teams_repo, users_repo
+from ..utils.cache import MISSING
+from ..utils.fanout import fan_out
 
 def list_team(project_id: str):
-    members = teams_repo.list_by_project(project_id)
+    return _with_profiles(project_id, teams_repo.list_by_project(project_id))
+
+async def list_team_async(project_id: str):
+    # the profile batches (100 users each) are read concurrently
+    members = await teams_repo.list_by_project_async(project_id)
+    return _profiles(project_id, members, await users_repo.batch_get_async([m["userId"] for m in members]))
+
+def list_team_page(project_id: str, limit: int, cursor=None):
+    members, next_cursor = teams_repo.page_by_project(project_id, limit, cursor)
+    return _with_profiles(project_id, members), next_cursor
+
+def _with_profiles(project_id: str, members: list):
+    return _profiles(project_id, members, users_repo.batch_get([m["userId"] for m in members]))
+
+def _profiles(project_id: str, members: list, users: list):
     out = []
-    for m in members:
-        u = users_repo.get(m["userId"])
+    for m, u in zip(members, users):
         if u:
             out.append({
                 "projectId": project_id,
@@ -19,18 +37,60 @@ def list_team(project_id: str):
             })
     return out
 
-def add_member_by_email(project_id: str, email: str, role: str, user_pool_id: str):
-    client = cognito_idp()
-    resp = client.list_users(UserPoolId=user_pool_id, Filter=f'email = "{email}"', Limit=1)
+def _cognito_sub(email: str, user_pool_id: str):
+    if '"' in email or "\\" in email:
+        return None  # can't be quoted in a ListUsers filter, and no valid address has them
+    resp = cognito_idp().list_users(UserPoolId=user_pool_id, Filter=f'email = "{email}"', Limit=1)
     users = resp.get("Users", [])
     if not users:
         return None
-    attrs = {a["Name"]: a["Value"] for a in users[0]["Attributes"]}
-    uid = attrs.get("sub")
+    return {a["Name"]: a["Value"] for a in users[0]["Attributes"]}.get("sub")
+
+def resolve_emails(emails: list, user_pool_id: str) -> dict:
+    # email -> user id (None for no such user): the email cache, then the Users table's
+    # email-index, and Cognito ListUsers only for emails without a profile
+    cache = users_repo.email_cache()
+    out, todo = {}, []
+    for email in dict.fromkeys(emails):
+        uid = cache.get(users_repo.email_key(email))
+        if uid is MISSING:
+            todo.append(email)
+        else:
+            out[email] = uid
+    found = fan_out(*(partial(users_repo.id_for_email, e) for e in todo))
+    for email, uid in zip(todo, found):
+        # one at a time: ListUsers has a low per-pool rate limit
+        uid = uid or _cognito_sub(email, user_pool_id)
+        ttl = None if uid else current_app.config["EMAIL_NOT_FOUND_TTL"]
+        cache.set(users_repo.email_key(email), uid, ttl)
+        out[email] = uid
+    return out
+
+def add_member_by_email(project_id: str, email: str, role: str, user_pool_id: str, owner_id: str = None):
+    uid = resolve_emails([email], user_pool_id)[email] if email else None
     if not uid:
         return None
-    teams_repo.put_member(project_id, uid, role, datetime.utcnow().isoformat())
+    teams_repo.put_member(project_id, uid, role, datetime.utcnow().isoformat(), owner_id)
     return uid
 
+def add_members_by_email(project_id: str, emails: list, role: str, user_pool_id: str, owner_id: str = None):
+    # {"added": [...], "existing": [...], "notFound": [...]} by email, in input order
+    ids = resolve_emails(emails, user_pool_id)
+    out = {"added": [], "existing": [], "notFound": []}
+    now = datetime.utcnow().isoformat()
+    for email, uid in ids.items():
+        if not uid:
+            out["notFound"].append(email)
+            continue
+        try:
+            teams_repo.put_member(project_id, uid, role, now, owner_id)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            out["existing"].append(email)
+            continue
+        out["added"].append(email)
+    return out
+
 def remove_member(project_id: str, user_id: str):
     teams_repo.delete_member(project_id, user_id)
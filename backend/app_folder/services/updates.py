@@ -0,0 +1,58 @@
+from flask import current_app
+from ..repositories import updates_repo
+from . import projects as psvc
+
+def _public(entry: dict) -> dict:
+    return {k: v for k, v in entry.items() if k != "projectId"}
+
+def _summary_update(project_id: str, new_entries: list):
+    # builder for mutate_project: prepends to the `latestUpdates` summary and, if the project
+    # still embeds its full `updates` list, moves that list into the feed in the same write
+    size = current_app.config["UPDATES_SUMMARY_SIZE"]
+    def build(item):
+        legacy = item.get("updates")
+        latest = item.get("latestUpdates")
+        if legacy:
+            imported = updates_repo.legacy_entries(project_id, legacy)
+            updates_repo.put_many(imported)
+            latest = [_public(e) for e in imported]
+        latest = ([_public(e) for e in new_entries] + list(latest or []))[:size]
+        return "SET latestUpdates = :l" + (" REMOVE updates" if legacy is not None else ""), None, {":l": latest}
+    return build
+
+def add_update(user_id: str, project_id: str, update: dict):
+    # returns None if the user does not own the project
+    entry = updates_repo.new_entry(project_id, update)
+    summary = _summary_update(project_id, [entry])
+    stored = []
+    def build(item):
+        # the entry goes in once ownership is known but before the version bump, so a reader
+        # that sees the new version (and caches its ETag) also sees the entry
+        if not stored:
+            updates_repo.put(entry)
+            stored.append(entry)
+        return summary(item)
+    done = None
+    try:
+        done = psvc.mutate_project(user_id, project_id, build, ["latestUpdates", "updates"])
+    finally:
+        if done is None and stored:
+            # the summary write never happened (VersionConflict, an error, or the project went
+            # away), so a client retry must not find this entry already posted
+            updates_repo.delete(entry)
+    if done is None:
+        return None
+    return _public(entry)
+
+def migrate_updates(project: dict):
+    # project must have been read with the `updates` attribute
+    if project.get("updates") is not None:
+        psvc.mutate_project(project["userId"], project["projectId"], _summary_update(project["projectId"], []),
+                            ["latestUpdates", "updates"])
+
+def list_updates(project_id: str, limit=None, before=None):
+    # (updates newest first, next `before` or None)
+    if limit is None:
+        return [_public(u) for u in updates_repo.iter_newest_first(project_id, before)], None
+    items, next_before = updates_repo.page(project_id, limit, before)
+    return [_public(u) for u in items], next_before
@@ -13,6 +13,8 @@ def sync_user(user_id: str, user_pool_id: str):
         "email": attrs.get("email", "unknown"),
         "syncedAt": datetime.utcnow().isoformat(),
     }
+    # compare against DynamoDB rather than a possibly stale cached copy
+    users_repo.invalidate(user_id)
     existing = users_repo.get(user_id)
     if not existing or any(payload[k] != existing.get(k) for k in ("given_name", "family_name", "email")):
         users_repo.put(payload)
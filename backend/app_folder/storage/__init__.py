@@ -0,0 +1,27 @@
+# Storage backends behind the repositories, chosen with STORAGE_BACKEND:
+#   "dynamodb" (default) - the real tables through boto3
+#   "memory"             - per-process dicts; for local development and benchmarks
+#   "sqlite"             - one SQLite file (SQLITE_PATH) shared by every worker on the host
+# The local backends emulate the boto3 table API, so repositories don't know which one is in use.
+from .local import LocalResource, MemoryStore, Schema, SqliteStore
+
+BACKENDS = ("dynamodb", "memory", "sqlite")
+
+def schemas(cfg) -> dict:
+    # key schema and GSIs of every table, mirroring the DynamoDB definitions
+    return {
+        cfg["DDB_PROJECTS"]: Schema("userId", "projectId", {"ownerId-index": ("ownerId", None),
+                                                             "projectId-index": ("projectId", None)}),
+        cfg["DDB_TEAMS"]: Schema("projectId", "userId", {"userId-index": ("userId", None)}),
+        cfg["DDB_USERS"]: Schema("userId", None, {"email-index": ("email", None)}),
+        cfg["DDB_FILES"]: Schema("projectId", "nodeKey"),
+        cfg["DDB_UPDATES"]: Schema("projectId", "updateKey"),
+    }
+
+def local_resource(cfg):
+    backend = cfg["STORAGE_BACKEND"]
+    if backend == "memory":
+        return LocalResource(MemoryStore(schemas(cfg)))
+    if backend == "sqlite":
+        return LocalResource(SqliteStore(schemas(cfg), cfg["SQLITE_PATH"]))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
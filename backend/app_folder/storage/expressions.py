@@ -0,0 +1,309 @@
+# Evaluates the DynamoDB expression language (the subset this app writes) against plain Python
+# items, for the local storage backends: condition / key-condition / filter expressions,
+# update expressions (SET with +, -, if_not_exists, list_append; REMOVE) and projections.
+import re
+from functools import lru_cache
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+
+MISSING = object()
+
+_TOKEN = re.compile(r"\s*(?:(<>|<=|>=|[=<>(),.+\-\[\]])|(:[A-Za-z0-9_]+)|(#[A-Za-z0-9_]+)|([A-Za-z_][A-Za-z0-9_]*)|(\d+))")
+_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IN", "SET", "REMOVE", "ADD", "DELETE"}
+
+class ExpressionError(ValueError):
+    pass
+
+@lru_cache(maxsize=512)
+def _tokens(expr: str) -> tuple:
+    # the app sends the same few expressions over and over
+    out, pos = [], 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if not m:
+            raise ExpressionError(f"Cannot parse expression at: {expr[pos:]!r}")
+        op, value, alias, word, number = m.groups()
+        if op:
+            out.append(("op", op))
+        elif value:
+            out.append(("value", value))
+        elif alias:
+            out.append(("name", alias))
+        elif number:
+            out.append(("number", int(number)))
+        elif word.upper() in _KEYWORDS:
+            out.append(("kw", word.upper()))
+        else:
+            out.append(("word", word))
+        pos = m.end()
+    return tuple(out)
+
+class _Parser:
+    def __init__(self, expr, names, values):
+        self.toks = _tokens(expr)
+        self.i = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, kind=None, text=None):
+        if self.i >= len(self.toks):
+            return None
+        tok = self.toks[self.i]
+        if (kind and tok[0] != kind) or (text is not None and tok[1] != text):
+            return None
+        return tok
+
+    def take(self, kind=None, text=None):
+        tok = self.peek(kind, text)
+        if tok is None:
+            raise ExpressionError(f"Expected {text or kind} at token {self.i}")
+        self.i += 1
+        return tok
+
+    def done(self):
+        return self.i >= len(self.toks)
+
+    # paths / operands
+
+    def _name(self, tok):
+        if tok[0] == "name":
+            if tok[1] not in self.names:
+                raise ExpressionError(f"Undefined attribute name {tok[1]}")
+            return self.names[tok[1]]
+        return tok[1]
+
+    def path(self):
+        tok = self.take()
+        if tok[0] not in ("name", "word"):
+            raise ExpressionError(f"Expected an attribute path, got {tok[1]!r}")
+        parts = [self._name(tok)]
+        while True:
+            if self.peek("op", "["):
+                self.take()
+                parts.append(self.take("number")[1])
+                self.take("op", "]")
+            elif self.peek("op", "."):
+                self.take()
+                parts.append(self._name(self.take()))
+            else:
+                return tuple(parts)
+
+    def operand(self):
+        # returns fn(item) -> value (MISSING for an absent path)
+        tok = self.peek()
+        if tok is None:
+            raise ExpressionError("Unexpected end of expression")
+        if tok[0] == "value":
+            self.take()
+            if tok[1] not in self.values:
+                raise ExpressionError(f"Undefined attribute value {tok[1]}")
+            value = self.values[tok[1]]
+            return lambda item: value
+        if tok[0] == "word" and self.i + 1 < len(self.toks) and self.toks[self.i + 1] == ("op", "("):
+            return self.function()
+        path = self.path()
+        return lambda item: get_path(item, path)
+
+    def function(self):
+        fname = self.take("word")[1]
+        self.take("op", "(")
+        if fname in ("attribute_exists", "attribute_not_exists"):
+            path = self.path()
+            self.take("op", ")")
+            exists = fname == "attribute_exists"
+            return lambda item: (get_path(item, path) is not MISSING) == exists
+        if fname == "if_not_exists":
+            path = self.path()
+            self.take("op", ",")
+            fallback = self.operand()
+            self.take("op", ")")
+            def if_not_exists(item):
+                value = get_path(item, path)
+                return fallback(item) if value is MISSING else value
+            return if_not_exists
+        if fname == "size":
+            arg = self.operand()
+            self.take("op", ")")
+            return lambda item: len(arg(item))
+        args = [self.operand()]
+        while self.peek("op", ","):
+            self.take()
+            args.append(self.operand())
+        self.take("op", ")")
+        if fname == "list_append" and len(args) == 2:
+            return lambda item: list(args[0](item)) + list(args[1](item))
+        if fname == "begins_with" and len(args) == 2:
+            def begins_with(item):
+                value, prefix = args[0](item), args[1](item)
+                return isinstance(value, str) and isinstance(prefix, str) and value.startswith(prefix)
+            return begins_with
+        if fname == "contains" and len(args) == 2:
+            def contains(item):
+                value, needle = args[0](item), args[1](item)
+                return value is not MISSING and not isinstance(value, (int, float)) and needle in value
+            return contains
+        raise ExpressionError(f"Unsupported function {fname}")
+
+    def value_expr(self):
+        left = self.operand()
+        if self.peek("op", "+") or self.peek("op", "-"):
+            op = self.take()[1]
+            right = self.operand()
+            return (lambda item: left(item) + right(item)) if op == "+" else (lambda item: left(item) - right(item))
+        return left
+
+    # conditions
+
+    def condition(self):
+        left = self.and_condition()
+        while self.peek("kw", "OR"):
+            self.take()
+            right, prev = self.and_condition(), left
+            left = lambda item, a=prev, b=right: a(item) or b(item)
+        return left
+
+    def and_condition(self):
+        left = self.not_condition()
+        while self.peek("kw", "AND"):
+            self.take()
+            right, prev = self.not_condition(), left
+            left = lambda item, a=prev, b=right: a(item) and b(item)
+        return left
+
+    def not_condition(self):
+        if self.peek("kw", "NOT"):
+            self.take()
+            inner = self.not_condition()
+            return lambda item: not inner(item)
+        if self.peek("op", "("):
+            self.take()
+            inner = self.condition()
+            self.take("op", ")")
+            return inner
+        left = self.operand()
+        tok = self.peek()
+        if tok is None or tok[0] == "kw" and tok[1] in ("AND", "OR") or tok == ("op", ")"):
+            return left  # a boolean function such as attribute_exists(...)
+        if tok == ("kw", "BETWEEN"):
+            self.take()
+            low = self.operand()
+            self.take("kw", "AND")
+            high = self.operand()
+            return lambda item: _compare(left(item), low(item), ">=") and _compare(left(item), high(item), "<=")
+        if tok == ("kw", "IN"):
+            self.take()
+            self.take("op", "(")
+            options = [self.operand()]
+            while self.peek("op", ","):
+                self.take()
+                options.append(self.operand())
+            self.take("op", ")")
+            return lambda item: any(_compare(left(item), o(item), "=") for o in options)
+        op = self.take("op")[1]
+        right = self.operand()
+        return lambda item: _compare(left(item), right(item), op)
+
+def _compare(a, b, op) -> bool:
+    if a is MISSING or b is MISSING:
+        return op == "<>" and not (a is MISSING and b is MISSING)
+    if op == "=":
+        return a == b
+    if op == "<>":
+        return a != b
+    try:
+        return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+    except TypeError:
+        return False
+
+def get_path(item, path):
+    value = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(value, list) or part >= len(value):
+                return MISSING
+        elif not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+def _parent(item, path):
+    parent = get_path(item, path[:-1])
+    if parent is MISSING or not isinstance(parent, (dict, list)):
+        raise ExpressionError("The document path provided in the update expression is invalid for update")
+    if isinstance(path[-1], int) != isinstance(parent, list):
+        raise ExpressionError("The document path provided in the update expression is invalid for update")
+    return parent
+
+def condition(expr, names=None, values=None):
+    # compiled condition: fn(item) -> bool. expr may also be a boto3 Key()/Attr() condition.
+    if isinstance(expr, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(expr)
+        expr = built.condition_expression
+        names = {**(names or {}), **built.attribute_name_placeholders}
+        values = {**(values or {}), **built.attribute_value_placeholders}
+    parser = _Parser(expr, names, values)
+    fn = parser.condition()
+    if not parser.done():
+        raise ExpressionError(f"Unexpected trailing tokens in {expr!r}")
+    return fn
+
+def apply_update(item: dict, expr: str, names=None, values=None) -> set:
+    # applies the update to `item` in place; returns the top-level attributes it touched
+    parser = _Parser(expr, names, values)
+    sets, removes = [], []
+    while not parser.done():
+        clause = parser.take("kw")[1]
+        if clause not in ("SET", "REMOVE"):
+            raise ExpressionError(f"Unsupported update clause {clause}")
+        while True:
+            path = parser.path()
+            if clause == "SET":
+                parser.take("op", "=")
+                sets.append((path, parser.value_expr()))
+            else:
+                removes.append(path)
+            if not parser.peek("op", ","):
+                break
+            parser.take()
+    # every operand reads the item as it was before the update
+    original = _snapshot(item)
+    resolved = [(path, fn(original)) for path, fn in sets]
+    for path, value in resolved:
+        if value is MISSING:
+            raise ExpressionError("The provided expression refers to an attribute that does not exist in the item")
+        parent = _parent(item, path)
+        if isinstance(parent, list) and path[-1] >= len(parent):
+            parent.append(value)
+        else:
+            parent[path[-1]] = value
+    # list REMOVEs refer to original positions, so delete from the highest index down
+    targets = []
+    for path in removes:
+        parent = get_path(item, path[:-1])
+        if parent is not MISSING and get_path(parent, path[-1:]) is not MISSING:
+            targets.append((parent, path[-1]))
+    for parent, key in sorted(targets, key=lambda t: -t[1] if isinstance(t[1], int) else 0):
+        del parent[key]
+    return {path[0] for path, _ in sets} | {path[0] for path in removes}
+
+def _snapshot(value):
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_snapshot(v) for v in value]
+    return value
+
+def project(item: dict, expr, names=None) -> dict:
+    # ProjectionExpression of top-level attributes ("a, #b")
+    if not expr:
+        return item
+    return {a: item[a] for a in _projected(expr, tuple(sorted((names or {}).items()))) if a in item}
+
+@lru_cache(maxsize=256)
+def _projected(expr: str, names: tuple) -> tuple:
+    parser = _Parser(expr, dict(names), None)
+    paths = [parser.path()]
+    while parser.peek("op", ","):
+        parser.take()
+        paths.append(parser.path())
+    return tuple(p[0] for p in paths)
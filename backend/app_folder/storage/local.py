@@ -0,0 +1,487 @@
+# DynamoDB-compatible tables backed by process memory or SQLite. They implement the slice of the
+# boto3 Table / resource / client API the repositories use (get/put/update/delete_item with
+# conditions, query on the table or a GSI, segmented scan, batch reads and writes, transactions),
+# so repository code is the same whichever backend STORAGE_BACKEND selects.
+import base64
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from functools import wraps
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+from .. import metrics
+from . import expressions as ex
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+_calls = threading.local()
+
+def _counted(operation: str):
+    # records the call in the AWS call metrics, once per API call: batch and transaction
+    # operations run their item operations without counting them again
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_calls, "active", False):
+                return fn(*args, **kwargs)
+            _calls.active, started, outcome = True, time.perf_counter(), "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _calls.active = False
+                metrics.record_call("dynamodb", operation, outcome, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def _error(code: str, message: str, operation: str, **extra):
+    return ClientError({"Error": {"Code": code, "Message": message}, **extra}, operation)
+
+def _encode(item: dict) -> dict:
+    # through boto3's serializer, so the same values are rejected (floats, empty sets) as on AWS
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+def _decode(av: dict) -> dict:
+    return {k: _deserializer.deserialize(v) for k, v in av.items()}
+
+def _copy(value):
+    # stored items are never changed in place; callers get their own copies
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+class Schema:
+    def __init__(self, hash_key, range_key=None, indexes=None):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = dict(indexes or {})  # index name -> (hash attr, range attr or None)
+
+    def key_names(self):
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def key_of(self, item: dict) -> tuple:
+        try:
+            return tuple(str(item[k]) for k in self.key_names())
+        except KeyError as e:
+            raise _error("ValidationException", f"Missing the key {e.args[0]} in the item", "PutItem")
+
+# ---- stores: items keyed by (hash, range); what get/items return must not be modified ----
+
+class MemoryStore:
+    # plain Python items, plus the keys per value of the hash key and of every GSI hash attribute
+    def __init__(self, schemas: dict):
+        self.schemas = schemas
+        self._data = {name: {} for name in schemas}
+        self._index = {
+            name: {attr: {} for attr in {schema.hash_key} | {h for h, _ in schema.indexes.values()}}
+            for name, schema in schemas.items()
+        }
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield
+
+    def get(self, table, key):
+        return self._data[table].get(key)
+
+    def put(self, table, key, item):
+        with self._lock:
+            self.delete(table, key)
+            self._data[table][key] = item
+            for attr, index in self._index[table].items():
+                if attr in item:
+                    index.setdefault(str(item[attr]), set()).add(key)
+
+    def delete(self, table, key):
+        with self._lock:
+            old = self._data[table].pop(key, None)
+            for attr, index in self._index[table].items() if old else ():
+                keys = index.get(str(old.get(attr)))
+                if attr in old and keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[str(old[attr])]
+
+    def items(self, table, attr=None, value=None):
+        # all items, in key order; with attr/value only those where that attribute equals value
+        with self._lock:
+            data = self._data[table]
+            if attr is None:
+                keys = sorted(data)
+            elif attr in self._index[table]:
+                keys = sorted(self._index[table][attr].get(str(value), ()))
+            else:
+                keys = sorted(k for k, item in data.items() if attr in item and str(item[attr]) == str(value))
+            return [data[k] for k in keys]
+
+def _to_json(av):
+    if isinstance(av, dict):
+        return {k: _to_json(v) for k, v in av.items()}
+    if isinstance(av, list):
+        return [_to_json(v) for v in av]
+    if isinstance(av, (bytes, bytearray)):
+        return {"__b64": base64.b64encode(bytes(av)).decode()}
+    return av
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if set(value) == {"__b64"}:
+            return base64.b64decode(value["__b64"])
+        return {k: _from_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    return value
+
+class SqliteStore:
+    # One SQLite table per DynamoDB table: the key as (pk, sk), a column per GSI hash attribute
+    # (ownerId, userId, projectId, email, ...) with an index on each, and the item as JSON.
+    def __init__(self, schemas: dict, path: str):
+        self.schemas = schemas
+        self.path = path
+        self._local = threading.local()
+        # a private in-memory database must be shared by every thread's connection
+        self._uri = path.startswith("file:") or path == ":memory:"
+        if path == ":memory:":
+            self.path = f"file:buildmngr-{id(self)}?mode=memory&cache=shared"
+        self._keeper = self._connect()  # keeps a shared in-memory database alive
+        with self._keeper:
+            for name, schema in schemas.items():
+                self._create(self._keeper, name, schema)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, uri=self._uri, check_same_thread=False, isolation_level=None, timeout=30)
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.depth = 0
+        return conn
+
+    @staticmethod
+    def _table(name):
+        return '"t_' + name.replace('"', '""') + '"'
+
+    def _columns(self, name):
+        schema = self.schemas[name]
+        return sorted({h for h, _ in schema.indexes.values()} - {schema.hash_key})
+
+    def _create(self, conn, name, schema):
+        cols = self._columns(name)
+        extra = "".join(f', "{c}" TEXT' for c in cols)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self._table(name)} "
+                     f"(pk TEXT NOT NULL, sk TEXT NOT NULL, item TEXT NOT NULL{extra}, PRIMARY KEY (pk, sk))")
+        for c in cols:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_{c}" ON {self._table(name)} ("{c}")')
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE serializes writers across threads and processes; nested calls join it
+        conn = self._conn()
+        if self._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _sk(key):
+        return key[1] if len(key) > 1 else ""
+
+    def get(self, table, key):
+        row = self._conn().execute(
+            f"SELECT item FROM {self._table(table)} WHERE pk = ? AND sk = ?", (key[0], self._sk(key))
+        ).fetchone()
+        return _decode(_from_json(json.loads(row[0]))) if row else None
+
+    def put(self, table, key, item):
+        av = _encode(item)
+        cols = self._columns(table)
+        values = [str(item[c]) if c in item else None for c in cols]
+        names = "".join(f', "{c}"' for c in cols)
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO {self._table(table)} (pk, sk, item{names}) VALUES (?, ?, ?{', ?' * len(cols)})",
+            (key[0], self._sk(key), json.dumps(_to_json(av)), *values),
+        )
+
+    def delete(self, table, key):
+        self._conn().execute(f"DELETE FROM {self._table(table)} WHERE pk = ? AND sk = ?", (key[0], self._sk(key)))
+
+    def items(self, table, attr=None, value=None):
+        schema = self.schemas[table]
+        sql, args = f"SELECT item FROM {self._table(table)}", ()
+        if attr is not None and attr == schema.hash_key:
+            sql, args = sql + " WHERE pk = ?", (str(value),)
+        elif attr is not None and attr in self._columns(table):
+            sql, args = sql + f' WHERE "{attr}" = ?', (str(value),)
+        rows = self._conn().execute(sql + " ORDER BY pk, sk", args).fetchall()
+        for (raw,) in rows:
+            item = _decode(_from_json(json.loads(raw)))
+            if attr is None or (attr in item and str(item[attr]) == str(value)):
+                yield item
+
+# ---- boto3-shaped API ----
+
+def _return_values(mode, old, new, touched):
+    if mode in (None, "NONE"):
+        return {}
+    if mode == "ALL_OLD":
+        return {"Attributes": _copy(old)} if old else {}
+    if mode == "ALL_NEW":
+        return {"Attributes": _copy(new)}
+    source = new if mode == "UPDATED_NEW" else (old or {})
+    return {"Attributes": {k: _copy(source[k]) for k in touched if k in source}}
+
+class LocalTable:
+    def __init__(self, resource, name):
+        self.resource = resource
+        self.store = resource.store
+        self.name = name
+        self.schema = self.store.schemas[name]
+
+    def _key(self, key: dict):
+        names = self.schema.key_names()
+        if set(key) != set(names):
+            raise _error("ValidationException", "The provided key element does not match the schema", "GetItem")
+        return self.schema.key_of(key)
+
+    def _current(self, key):
+        return self.store.get(self.name, key)
+
+    @staticmethod
+    def _check(condition, item, names, values, operation):
+        if condition and not ex.condition(condition, names, values)(item or {}):
+            raise _error("ConditionalCheckFailedException", "The conditional request failed", operation)
+
+    @_counted("GetItem")
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **_):
+        item = self._current(self._key(Key))
+        return {"Item": _copy(ex.project(item, ProjectionExpression, ExpressionAttributeNames))} if item is not None else {}
+
+    @_counted("PutItem")
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues=None, **_):
+        key = self.schema.key_of(Item)
+        item = _decode(_encode(Item))  # numbers become Decimal, as read back from DynamoDB
+        with self.store.transaction():
+            old = self._current(key)
+            self._check(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues, "PutItem")
+            self.store.put(self.name, key, item)
+        return _return_values(ReturnValues, old, None, ())
+
+    @_counted("DeleteItem")
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, **_):
+        key = self._key(Key)
+        with self.store.transaction():
+            old = self._current(key)
+            self._check(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues, "DeleteItem")
+            self.store.delete(self.name, key)
+        return _return_values(ReturnValues, old, None, ())
+
+    @_counted("UpdateItem")
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, **_):
+        key = self._key(Key)
+        with self.store.transaction():
+            old = self._current(key)
+            self._check(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues, "UpdateItem")
+            new = _copy(old) if old else dict(Key)
+            try:
+                touched = ex.apply_update(new, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            except ex.ExpressionError as e:
+                raise _error("ValidationException", str(e), "UpdateItem")
+            new = _decode(_encode(new))
+            self.store.put(self.name, key, new)
+        return _return_values(ReturnValues, old, new, touched)
+
+    def _read(self, matches, Limit=None, ExclusiveStartKey=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, key_names=None):
+        # Limit counts items evaluated before the filter, as DynamoDB does
+        if ExclusiveStartKey:
+            start = self.schema.key_of(ExclusiveStartKey)
+            keyed = list(matches)
+            positions = [i for i, it in enumerate(keyed) if self.schema.key_of(it) == start]
+            matches = keyed[positions[0] + 1:] if positions else keyed
+        keep = ex.condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues) if FilterExpression else None
+        items, evaluated, last = [], 0, None
+        matches = list(matches)
+        for n, item in enumerate(matches):
+            if Limit is not None and evaluated >= Limit:
+                break
+            evaluated += 1
+            if keep is None or keep(item):
+                items.append(_copy(ex.project(item, ProjectionExpression, ExpressionAttributeNames)))
+            if Limit is not None and evaluated >= Limit and n + 1 < len(matches):
+                last = {k: item[k] for k in key_names if k in item}
+        resp = {"Items": items, "Count": len(items), "ScannedCount": evaluated}
+        if last:
+            resp["LastEvaluatedKey"] = last
+        return resp
+
+    @_counted("Query")
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, **kwargs):
+        if IndexName is not None and IndexName not in self.schema.indexes:
+            raise _error("ValidationException", f"The table does not have the specified index: {IndexName}", "Query")
+        hash_key, range_key = self.schema.indexes[IndexName] if IndexName else (self.schema.hash_key, self.schema.range_key)
+        matches_key = ex.condition(KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        hash_value = _hash_value(KeyConditionExpression, hash_key, ExpressionAttributeNames, ExpressionAttributeValues)
+        found = [i for i in self.store.items(self.name, hash_key, hash_value) if matches_key(i)]
+        if range_key:
+            found.sort(key=lambda i: (str(i.get(range_key, "")), self.schema.key_of(i)))
+        if not ScanIndexForward:
+            found.reverse()
+        key_names = self.schema.key_names() + [k for k in (hash_key, range_key) if k and k not in self.schema.key_names()]
+        return self._read(found, ExpressionAttributeNames=ExpressionAttributeNames,
+                          ExpressionAttributeValues=ExpressionAttributeValues, key_names=key_names, **kwargs)
+
+    @_counted("Scan")
+    def scan(self, Segment=None, TotalSegments=None, **kwargs):
+        found = self.store.items(self.name)
+        if TotalSegments:
+            found = (i for i in found
+                     if zlib.crc32("\x00".join(self.schema.key_of(i)).encode()) % TotalSegments == Segment)
+        return self._read(found, key_names=self.schema.key_names(), **kwargs)
+
+    @contextmanager
+    def batch_writer(self, overwrite_by_pkeys=None):
+        # like boto3's: requests go out as BatchWriteItem calls of 25
+        writer = _BatchWriter(self)
+        yield writer
+        writer.flush()
+
+class _BatchWriter:
+    def __init__(self, table):
+        self._table = table
+        self._requests = []
+
+    def put_item(self, Item):
+        self._add({"PutRequest": {"Item": Item}})
+
+    def delete_item(self, Key):
+        self._add({"DeleteRequest": {"Key": Key}})
+
+    def _add(self, request):
+        self._requests.append(request)
+        if len(self._requests) >= 25:
+            self.flush()
+
+    def flush(self):
+        if self._requests:
+            self._table.resource.batch_write_item(RequestItems={self._table.name: self._requests})
+            self._requests = []
+
+def _hash_value(cond, hash_key, names, values):
+    # the value the key condition pins the partition key to (needed to use the SQLite index)
+    if not isinstance(cond, str):
+        built = ConditionExpressionBuilder().build_expression(cond, is_key_condition=True)
+        cond = built.condition_expression
+        names = {**(names or {}), **built.attribute_name_placeholders}
+        values = {**(values or {}), **built.attribute_value_placeholders}
+    aliases = [a for a, n in (names or {}).items() if n == hash_key] + [hash_key]
+    for alias in aliases:
+        m = re.search(rf"(?:^|[\s(]){re.escape(alias)}\s*=\s*(:[A-Za-z0-9_]+)", cond)
+        if m and m.group(1) in (values or {}):
+            return values[m.group(1)]
+    raise _error("ValidationException", f"Query condition missed key schema element: {hash_key}", "Query")
+
+class _Client:
+    def __init__(self, resource):
+        self._resource = resource
+
+    @_counted("TransactWriteItems")
+    def transact_write_items(self, TransactItems):
+        # all-or-nothing: every condition is checked before anything is written
+        store = self._resource.store
+        with store.transaction():
+            reasons, failed = [], False
+            for action in TransactItems:
+                (kind, spec), = action.items()
+                table = self._resource.Table(spec["TableName"])
+                key = table.schema.key_of(spec["Item"]) if kind == "Put" else table._key(spec["Key"])
+                current = table._current(key)
+                cond = spec.get("ConditionExpression")
+                ok = not cond or ex.condition(cond, spec.get("ExpressionAttributeNames"),
+                                              spec.get("ExpressionAttributeValues"))(current or {})
+                reasons.append({"Code": "None"} if ok else {"Code": "ConditionalCheckFailed",
+                                                             "Message": "The conditional request failed"})
+                failed = failed or not ok
+            if failed:
+                raise _error("TransactionCanceledException", "Transaction cancelled", "TransactWriteItems",
+                             CancellationReasons=reasons)
+            for action in TransactItems:
+                (kind, spec), = action.items()
+                table = self._resource.Table(spec["TableName"])
+                args = {k: v for k, v in spec.items() if k not in ("TableName", "ConditionExpression")}
+                if kind == "Put":
+                    table.put_item(**args)
+                elif kind == "Delete":
+                    table.delete_item(**args)
+                elif kind == "Update":
+                    table.update_item(**args)
+        return {}
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+class LocalResource:
+    def __init__(self, store):
+        self.store = store
+        self.meta = _Meta(_Client(self))
+
+    def Table(self, name):
+        if name not in self.store.schemas:
+            raise _error("ResourceNotFoundException", f"Requested resource not found: Table: {name}", "DescribeTable")
+        return LocalTable(self, name)
+
+    @_counted("BatchGetItem")
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            responses[name] = [
+                r["Item"] for r in (
+                    table.get_item(Key=k, ProjectionExpression=request.get("ProjectionExpression"),
+                                   ExpressionAttributeNames=request.get("ExpressionAttributeNames"))
+                    for k in request["Keys"]
+                ) if "Item" in r
+            ]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    @_counted("BatchWriteItem")
+    def batch_write_item(self, RequestItems):
+        with self.store.transaction():
+            for name, requests in RequestItems.items():
+                table = self.Table(name)
+                for r in requests:
+                    if "PutRequest" in r:
+                        table.put_item(Item=r["PutRequest"]["Item"])
+                    else:
+                        table.delete_item(Key=r["DeleteRequest"]["Key"])
+        return {"UnprocessedItems": {}}
@@ -0,0 +1,130 @@
+# Async mode (ASYNC_MODE=1). Each worker process runs one asyncio event loop in a background
+# thread: a handler passes a coroutine to run() and waits for it, and the coroutine fans out
+# independent AWS calls with gather(). At most ASYNC_MAX_CONCURRENCY calls are in flight per
+# process. DynamoDB calls go through aioboto3 when it is installed and the tables are in DynamoDB;
+# otherwise the synchronous client runs on a bounded thread pool. Coroutines run in the calling
+# request's context, so current_app, g (unit of work, metrics) and the session work as in sync code.
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import weakref
+from flask import current_app
+from ..extensions import aws_config, dynamo_resource, dynamo_table, event_loop, thread_pool
+from ..metrics import instrument_client
+from .dynamo import batch_get_chunks
+
+try:
+    import aioboto3
+except ImportError:  # the sync client on the "aio" pool is used instead
+    aioboto3 = None
+
+_limits = weakref.WeakKeyDictionary()     # loop -> Semaphore
+_resources = weakref.WeakKeyDictionary()  # loop -> Task opening the aioboto3 resource
+
+def enabled() -> bool:
+    return current_app.config["ASYNC_MODE"]
+
+def _settle(done: concurrent.futures.Future, task: asyncio.Task):
+    if task.cancelled():
+        done.cancel()
+    elif task.exception() is not None:
+        done.set_exception(task.exception())
+    else:
+        done.set_result(task.result())
+
+def run(coro):
+    # runs coro on the process loop in the caller's context and returns its result
+    loop = event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("aio.run() called on the event loop; await the coroutine instead")
+    done = concurrent.futures.Future()
+
+    def start():
+        # create_task copies the context start() runs in, which is the caller's
+        loop.create_task(coro).add_done_callback(functools.partial(_settle, done))
+    loop.call_soon_threadsafe(contextvars.copy_context().run, start)
+    return done.result()
+
+def _limiter() -> asyncio.Semaphore:
+    # only calls that do I/O take a slot, so nested gathers can't starve each other
+    loop = asyncio.get_running_loop()
+    sem = _limits.get(loop)
+    if sem is None:
+        sem = _limits[loop] = asyncio.Semaphore(current_app.config["ASYNC_MAX_CONCURRENCY"])
+    return sem
+
+async def gather(*aws):
+    # results in argument order; the first exception propagates
+    return await asyncio.gather(*aws)
+
+async def to_thread(fn, *args, **kwargs):
+    # blocking I/O on the bounded "aio" pool, in the task's context
+    async with _limiter():
+        pool = thread_pool("aio", current_app.config["ASYNC_MAX_CONCURRENCY"])
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+def _native() -> bool:
+    return aioboto3 is not None and current_app.config["STORAGE_BACKEND"] == "dynamodb"
+
+async def _open_resource(config, region):
+    # entered once per loop and kept open for the life of the process
+    resource = await aioboto3.Session(region_name=region).resource("dynamodb", config=config).__aenter__()
+    instrument_client(resource.meta.client)
+    return resource
+
+async def _resource():
+    loop = asyncio.get_running_loop()
+    task = _resources.get(loop)
+    if task is None:
+        task = _resources[loop] = loop.create_task(_open_resource(aws_config(), current_app.config["AWS_REGION"]))
+    return await task
+
+async def dynamo(table_name: str, operation: str, **kwargs):
+    # one table call ("get_item", "query", ...) with boto3 resource semantics
+    if not _native():
+        return await to_thread(lambda: getattr(dynamo_table(table_name), operation)(**kwargs))
+    async with _limiter():
+        table = await (await _resource()).Table(table_name)
+        return await getattr(table, operation)(**kwargs)
+
+async def batch_get_item(request_items: dict):
+    if not _native():
+        return await to_thread(lambda: dynamo_resource().batch_get_item(RequestItems=request_items))
+    async with _limiter():
+        return await (await _resource()).batch_get_item(RequestItems=request_items)
+
+async def query_all(table_name: str, **kwargs) -> list:
+    # every item of a Query, following LastEvaluatedKey
+    items = []
+    while True:
+        resp = await dynamo(table_name, "query", **kwargs)
+        items.extend(resp.get("Items", []))
+        if not resp.get("LastEvaluatedKey"):
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+async def _drive(steps):
+    # dynamo._drive with awaited calls and sleeps
+    reply = None
+    while True:
+        try:
+            step = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+        if isinstance(step, dict):
+            reply = await batch_get_item(step)
+        else:
+            await asyncio.sleep(step)
+            reply = None
+
+async def batch_get(table_name: str, keys: list, fields=None, max_retries: int = 8) -> list:
+    # dynamo.batch_get with the chunks of 100 read concurrently
+    chunks = await gather(*(_drive(c) for c in batch_get_chunks(table_name, keys, fields, max_retries)))
+    return [item for c in chunks for item in c]
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from .. import metrics
+
+MISSING = object()
+
+class LocalSharedCache:
+    # In-process stand-in for a Redis-style shared cache: string keys, per-key TTL, at most
+    # maxsize keys. Keys are kept in write order; each set drops expired keys from the old end,
+    # then the oldest keys while over maxsize. It lives in one process, so workers don't see
+    # each other's writes.
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            return value
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, now + ttl)
+            while self._data and (len(self._data) > self.maxsize or next(iter(self._data.values()))[1] <= now):
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+class TTLCache:
+    # Bounded LRU with per-entry TTL, optionally backed by a shared cache (L2). Hits, misses,
+    # evictions and size are exported to /metrics under the namespace.
+    def __init__(self, maxsize: int, ttl: float, backend=None, namespace: str = ""):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.namespace = namespace
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._labels = {"cache": namespace or "default"}
+
+    def _resized(self, before: int):
+        if len(self._data) != before:
+            metrics.gauge_add("cache_entries", self._labels, len(self._data) - before)
+
+    def _shared_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    metrics.inc("cache_requests_total", {**self._labels, "result": "hit"})
+                    return value
+                del self._data[key]
+                metrics.gauge_add("cache_entries", self._labels, -1)
+        if self.backend is not None:
+            entry = self.backend.get(self._shared_key(key))
+            # L2 holds (value, wall-clock expiry), so a promoted entry keeps only the time it had left
+            if entry is not MISSING and entry[1] > time.time():
+                self._store(key, entry[0], entry[1] - time.time())
+                metrics.inc("cache_requests_total", {**self._labels, "result": "hit"})
+                return entry[0]
+        metrics.inc("cache_requests_total", {**self._labels, "result": "miss"})
+        return MISSING
+
+    def _store(self, key, value, ttl):
+        with self._lock:
+            before = len(self._data)
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            self._resized(before)
+        if evicted:
+            metrics.inc("cache_evictions_total", self._labels, evicted)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(self._shared_key(key), (value, time.time() + ttl), ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            before = len(self._data)
+            for key in keys:
+                self._data.pop(key, None)
+            self._resized(before)
+        if self.backend is not None:
+            self.backend.delete(*(self._shared_key(k) for k in keys))
+
+    def get_or_load(self, key, loader, cache_none: bool = True):
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            if value is not None or cache_none:
+                self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            before = len(self._data)
+            self._data.clear()
+            self._resized(before)
@@ -0,0 +1,86 @@
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "image/svg+xml")
+
+class _GzipStream:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def chunk(self, data):
+        # sync-flush each chunk so a streamed response still arrives incrementally
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+class _BrotliStream:
+    def __init__(self, level):
+        self._c = brotli.Compressor(quality=level)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+def _encodings(app):
+    cfg = app.config
+    found = {"gzip": (lambda b: gzip.compress(b, cfg["COMPRESS_GZIP_LEVEL"], mtime=0),
+                      lambda: _GzipStream(cfg["COMPRESS_GZIP_LEVEL"]))}
+    if brotli is not None:
+        found["br"] = (lambda b: brotli.compress(b, quality=cfg["COMPRESS_BR_LEVEL"]),
+                       lambda: _BrotliStream(cfg["COMPRESS_BR_LEVEL"]))
+    return found
+
+def _compressible(resp) -> bool:
+    mimetype = resp.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+def _stream(chunks, compressor):
+    for chunk in chunks:
+        out = compressor.chunk(chunk.encode() if isinstance(chunk, str) else chunk)
+        if out:
+            yield out
+    yield compressor.finish()
+
+def init_compression(app):
+    # gzip/brotli negotiated from Accept-Encoding; brotli is preferred on equal quality
+    if not app.config["COMPRESS_ENABLED"]:
+        return
+    encodings = _encodings(app)
+    offered = [e for e in ("br", "gzip") if e in encodings]
+
+    @app.after_request
+    def compress(resp):
+        if not _compressible(resp) or resp.status_code < 200 or resp.status_code in (204, 206, 304):
+            return resp
+        resp.vary.add("Accept-Encoding")
+        if ("Content-Encoding" in resp.headers or resp.direct_passthrough
+                or "no-transform" in (resp.headers.get("Cache-Control") or "")):
+            return resp
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is None:
+            return resp
+        one_shot, streaming = encodings[encoding]
+
+        if resp.is_streamed:
+            resp.response = _stream(resp.response, streaming())
+            resp.headers.pop("Content-Length", None)
+        else:
+            body = resp.get_data()
+            if len(body) < app.config["COMPRESS_MIN_SIZE"]:
+                return resp
+            resp.set_data(one_shot(body))
+        resp.headers["Content-Encoding"] = encoding
+        # the compressed bytes differ from the identity ones; a weak tag still revalidates (If-None-Match)
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+from flask import current_app
+from .. import metrics
+from ..extensions import dynamo_resource, thread_pool
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+TRANSACT_LIMIT = 100
+
+def transact_write(actions: list):
+    # the resource's client (de)serializes attribute values, so actions use plain Python values
+    return dynamo_resource().meta.client.transact_write_items(TransactItems=actions)
+
+def cancellation_codes(e: Exception) -> list:
+    # per-action failure codes of a cancelled transaction ("None" for actions that were fine)
+    return [r.get("Code", "None") for r in getattr(e, "response", {}).get("CancellationReasons", [])]
+
+def projection(fields) -> dict:
+    # ProjectionExpression kwargs; attribute names are aliased so reserved words are safe
+    if not fields:
+        return {}
+    names = {f"#p{i}": f for i, f in enumerate(fields)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+def backoff(attempt: int) -> float:
+    # jittered exponential delay before retry number `attempt` (from 0)
+    return random.uniform(0, min(0.05 * 2 ** attempt, 2.0))
+
+def batch_get_chunks(table_name: str, keys: list, fields=None, max_retries: int = 8) -> list:
+    # BatchGetItem in chunks of 100 with UnprocessedKeys retried, as one generator per chunk that
+    # does no I/O itself: it yields RequestItems (send it the response) or a delay in seconds
+    # (send None) and returns the chunk's items. batch_get and aio.batch_get drive them.
+    def chunk(chunk_keys):
+        items, attempt = [], 0
+        pending = {table_name: {"Keys": chunk_keys, **projection(fields)}}
+        while pending:
+            resp = yield pending
+            items.extend(resp.get("Responses", {}).get(table_name, []))
+            pending = resp.get("UnprocessedKeys") or {}
+            if pending:
+                if attempt >= max_retries:
+                    raise RuntimeError(f"BatchGetItem on {table_name} left keys unprocessed after {attempt} retries")
+                yield backoff(attempt)
+                attempt += 1
+        return items
+    return [chunk(keys[i:i + BATCH_GET_LIMIT]) for i in range(0, len(keys), BATCH_GET_LIMIT)]
+
+def _drive(steps):
+    reply = None
+    while True:
+        try:
+            step = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+        if isinstance(step, dict):
+            reply = dynamo_resource().batch_get_item(RequestItems=step)
+        else:
+            time.sleep(step)
+            reply = None
+
+def batch_get(table_name: str, keys: list, fields=None, max_retries: int = 8):
+    # chunk after chunk; see batch_get_chunks
+    return [item for chunk in batch_get_chunks(table_name, keys, fields, max_retries) for item in _drive(chunk)]
+
+def batch_write(requests: list, max_retries: int = 8):
+    # requests are (table_name, WriteRequest) pairs; BatchWriteItem in chunks of 25 with
+    # UnprocessedItems retried like batch_get
+    for start in range(0, len(requests), BATCH_WRITE_LIMIT):
+        pending, attempt = {}, 0
+        for table_name, req in requests[start:start + BATCH_WRITE_LIMIT]:
+            pending.setdefault(table_name, []).append(req)
+        while pending:
+            pending = dynamo_resource().batch_write_item(RequestItems=pending).get("UnprocessedItems") or {}
+            if pending:
+                if attempt >= max_retries:
+                    raise RuntimeError(f"BatchWriteItem left items unprocessed after {attempt} retries")
+                time.sleep(backoff(attempt))
+                attempt += 1
+
+def is_backfilling(e: Exception) -> bool:
+    msg = str(getattr(getattr(e, "response", {}), "get", lambda *_: {})("Error", {}).get("Message", ""))
+    return "backfilling" in msg.lower()
+
+def iter_pages(operation, **kwargs):
+    # follows LastEvaluatedKey until the Query/Scan is exhausted
+    while True:
+        resp = operation(**kwargs)
+        yield resp
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        kwargs["ExclusiveStartKey"] = last_key
+
+def iter_items(operation, **kwargs):
+    for page in iter_pages(operation, **kwargs):
+        yield from page.get("Items", [])
+
+def iter_with_fallback(primary, fallback, should_fall_back=is_backfilling):
+    # only falls back if the primary failed before producing anything
+    started = False
+    try:
+        for item in primary():
+            started = True
+            yield item
+    except Exception as e:
+        if started or not should_fall_back(e):
+            raise
+        yield from fallback()
+
+def read_page(operation, limit: int, start_key=None, **kwargs):
+    # Limit caps items *evaluated* per call, so a filtered read may take several
+    # calls to fill the page but never overshoots it.
+    items = []
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    while True:
+        resp = operation(Limit=limit - len(items), **kwargs)
+        items.extend(resp.get("Items", []))
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key or len(items) >= limit:
+            return items, last_key
+        kwargs["ExclusiveStartKey"] = last_key
+
+def _scan_segment(table, segment, total, start_key, page_limit, stop, on_items, scan_kwargs):
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total)
+    if page_limit:
+        kwargs["Limit"] = page_limit
+    items, key, done = [], start_key, False
+    while not stop.is_set():
+        if key:
+            kwargs["ExclusiveStartKey"] = key
+        resp = table.scan(**kwargs)
+        got = resp.get("Items", [])
+        items.extend(got)
+        on_items(len(got))
+        key = resp.get("LastEvaluatedKey")
+        if not key:
+            done = True
+            break
+    return items, key, done
+
+def parallel_scan(table, limit=None, state=None, **scan_kwargs):
+    # Segmented Scan on the shared scan pool. With a limit, every segment stops after the
+    # page on which the total reached it, so a page may hold up to SCAN_TOTAL_SEGMENTS * limit
+    # items. `state` resumes unfinished segments; the returned state is None once all are done.
+    cfg = current_app.config
+    if state:
+        total, keys = state["total"], {int(seg): key for seg, key in state["keys"].items()}
+    else:
+        total = cfg["SCAN_TOTAL_SEGMENTS"]
+        keys = {seg: None for seg in range(total)}
+
+    stop, lock, found = threading.Event(), threading.Lock(), [0]
+    def on_items(n):
+        with lock:
+            found[0] += n
+            if limit and found[0] >= limit:
+                stop.set()
+
+    started = time.perf_counter()
+    pool = thread_pool("scan", cfg["SCAN_MAX_WORKERS"])
+    futures = {
+        seg: pool.submit(_scan_segment, table, seg, total, key, limit, stop, on_items, scan_kwargs)
+        for seg, key in sorted(keys.items())
+    }
+    items, remaining = [], {}
+    for seg, fut in futures.items():
+        seg_items, key, done = fut.result()
+        items.extend(seg_items)
+        if not done:
+            remaining[str(seg)] = key
+    elapsed = time.perf_counter() - started
+
+    metrics.inc("dynamo_scan_fallback_total", {"table": table.name})
+    metrics.inc("dynamo_scan_fallback_seconds_total", {"table": table.name}, elapsed)
+    current_app.logger.warning(
+        "parallel scan fallback on %s: %d items in %.3fs (%d segments)", table.name, len(items), elapsed, total
+    )
+    return items, ({"total": total, "keys": remaining} if remaining else None)
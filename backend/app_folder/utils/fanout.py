@@ -0,0 +1,39 @@
+# Independent blocking reads (repository calls) run side by side in the sync app, so a handler
+# waits for the slowest of them instead of their sum. Calls run on the shared, bounded "fanout"
+# pool in a copy of the caller's context: current_app, g (unit of work, metrics) and the session
+# are the request's.
+import contextvars
+import threading
+from flask import current_app
+from ..extensions import thread_pool
+
+_worker = threading.local()
+
+def _in_worker(fn):
+    _worker.active = True
+    try:
+        return fn()
+    finally:
+        _worker.active = False
+
+def fan_out(*calls) -> list:
+    # calls are zero-argument callables; returns their results in argument order. Every call
+    # finishes before this returns, and if any failed the first one's exception (in argument
+    # order) is raised, whichever finished first.
+    workers = current_app.config["FANOUT_MAX_WORKERS"]
+    if len(calls) < 2 or not workers or getattr(_worker, "active", False):
+        # a call that fans out again runs inline, so the bounded pool can't deadlock on itself
+        return [call() for call in calls]
+    pool = thread_pool("fanout", workers)
+    futures = [pool.submit(contextvars.copy_context().run, _in_worker, call) for call in calls[1:]]
+    results, errors = [], []
+    for run in [calls[0]] + [f.result for f in futures]:
+        # the caller's thread takes the first call, so a busy pool delays the rest, never all
+        try:
+            results.append(run())
+        except Exception as e:
+            results.append(None)
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    return results
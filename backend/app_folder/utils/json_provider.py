@@ -0,0 +1,55 @@
+import json
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used without it
+    orjson = None
+
+def _number(d: Decimal):
+    # DynamoDB hands every number back as Decimal: integral values stay exact ints
+    return int(d) if d == d.to_integral_value() else float(d)
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return _number(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+class FastJSONProvider(DefaultJSONProvider):
+    # orjson when installed, else stdlib json; either way Decimal -> int/float, dates -> ISO 8601
+    # and sets -> lists (the default provider turns Decimal into a string and dates into HTTP dates)
+
+    def _orjson(self, obj, pretty=False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            try:
+                return self._orjson(obj).decode()
+            except orjson.JSONEncodeError:
+                pass  # e.g. an int wider than 64 bits; stdlib json handles it
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson(obj, self.compact is False or (self.compact is None and self._app.debug))
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
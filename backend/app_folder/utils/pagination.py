@@ -0,0 +1,43 @@
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt="page-cursor")
+
+def encode_cursor(state):
+    return _serializer().dumps(state) if state else None
+
+def decode_cursor(token: str):
+    try:
+        return _serializer().loads(token)
+    except BadSignature:
+        raise ValueError("Invalid cursor")
+
+def limit_arg():
+    # ?limit= as an int between 1 and MAX_PAGE_SIZE, or None when absent; raises ValueError
+    raw_limit = request.args.get("limit")
+    if raw_limit is None:
+        return None
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise ValueError("'limit' must be an integer")
+    if not 1 <= limit <= current_app.config["MAX_PAGE_SIZE"]:
+        raise ValueError(f"'limit' must be between 1 and {current_app.config['MAX_PAGE_SIZE']}")
+    return limit
+
+def page_args():
+    # (limit, cursor_state) from ?limit=&cursor=; limit is None when the client wants everything
+    limit, token = limit_arg(), request.args.get("cursor")
+    if limit is None and token is None:
+        return None, None
+    return limit or current_app.config["MAX_PAGE_SIZE"], decode_cursor(token) if token else None
+
+def paged_response(body, next_state):
+    resp = current_app.json.response(body)
+    token = encode_cursor(next_state)
+    if token:
+        resp.headers[CURSOR_HEADER] = token
+    return resp
@@ -0,0 +1,239 @@
+# Request-scoped unit of work for the repositories:
+#  - an identity map, so an item read once in a request (whole or with a covering projection)
+#    is not fetched again, and repeated keys in batch reads are fetched once;
+#  - a write queue for blind Put/Delete/Update calls, flushed when the request ends as one
+#    BatchWriteItem (or TransactWriteItems when updates are queued; one call per 25/100 ops).
+# Writes that need an answer (conditions, ReturnValues) stay immediate but flush the queue first,
+# and queries flush it too, so a request always reads its own writes. Outside a request
+# (CLI, background threads) everything goes straight to DynamoDB. Caches kept outside the request
+# are invalidated with after_flush(), once the queued write is actually in the table.
+import threading
+from contextlib import nullcontext
+from flask import current_app, g, has_request_context
+from ..extensions import dynamo_table
+from . import aio
+from .dynamo import TRANSACT_LIMIT, batch_write, transact_write
+
+def _ident(table_name: str, key: dict):
+    return table_name, tuple(sorted(key.items()))
+
+def _project(item: dict, fields):
+    # copies, so callers that decorate or pop from an item don't change the cached one
+    if not fields:
+        return dict(item)
+    return {f: item[f] for f in fields if f in item}
+
+class UnitOfWork:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.items = {}    # ident -> (item or None, frozenset of fields read, None meaning all)
+        self.pending = {}  # ident -> (table_name, key, kind, payload), in the order queued
+        self.callbacks = []  # run after the next flush, written or not
+
+    def lookup(self, ident, fields):
+        # (True, item) when the request already knows the answer, else (False, None)
+        op = self.pending.get(ident)
+        if op is not None:
+            kind, payload = op[2], op[3]
+            if kind == "Put":
+                return True, _project(payload, fields)
+            if kind == "Delete":
+                return True, None
+            self.flush()  # the outcome of a queued Update is only known to DynamoDB
+        entry = self.items.get(ident)
+        if entry is None:
+            return False, None
+        item, have = entry
+        if item is None:
+            return True, None
+        if have is None or (fields and set(fields) <= have):
+            return True, _project(item, fields)
+        return False, None
+
+    def remember(self, ident, item, fields):
+        have = None if not fields else frozenset(fields)
+        old = self.items.get(ident)
+        if item is not None and old is not None and old[0] is not None and have is not None:
+            # two projections of the same snapshot: keep their union
+            item, have = {**old[0], **item}, (None if old[1] is None else old[1] | have)
+        self.items[ident] = (None if item is None else dict(item), have)
+
+    def queue(self, table_name, key, kind, payload):
+        ident = _ident(table_name, key)
+        with self.lock:
+            prev = self.pending.get(ident)
+            if prev is not None and "Update" in (prev[2], kind):
+                self.flush()  # an Update can't be merged with another op on the same item
+            self.pending.pop(ident, None)
+            self.pending[ident] = (table_name, key, kind, payload)
+            self.items.pop(ident, None)
+
+    def forget(self, table_name, key):
+        with self.lock:
+            self.items.pop(_ident(table_name, key), None)
+
+    def flush(self):
+        with self.lock:
+            ops = list(self.pending.values())
+            self.pending.clear()
+            callbacks, self.callbacks = self.callbacks, []
+        try:
+            self._write(ops)
+        finally:
+            for fn in callbacks:
+                fn()
+
+    def _write(self, ops):
+        if not ops:
+            return
+        if len(ops) == 1:
+            _run_one(*ops[0])
+        elif all(kind != "Update" for _, _, kind, _ in ops):
+            batch_write([
+                (t, {"PutRequest": {"Item": payload}} if kind == "Put" else {"DeleteRequest": {"Key": key}})
+                for t, key, kind, payload in ops
+            ])
+        else:
+            actions = [_transact_action(*op) for op in ops]
+            for start in range(0, len(actions), TRANSACT_LIMIT):
+                transact_write(actions[start:start + TRANSACT_LIMIT])
+
+def _run_one(table_name, key, kind, payload):
+    table = dynamo_table(table_name)
+    if kind == "Put":
+        table.put_item(Item=payload)
+    elif kind == "Delete":
+        table.delete_item(Key=key)
+    else:
+        table.update_item(Key=key, **payload)
+
+def _transact_action(table_name, key, kind, payload):
+    if kind == "Put":
+        return {"Put": {"TableName": table_name, "Item": payload}}
+    if kind == "Delete":
+        return {"Delete": {"TableName": table_name, "Key": key}}
+    return {"Update": {"TableName": table_name, "Key": key, **payload}}
+
+def current():
+    return g.get("unit_of_work") if has_request_context() else None
+
+def _known(uow, table_name: str, key: dict, fields):
+    with uow.lock:
+        return uow.lookup(_ident(table_name, key), fields)
+
+def _remember(uow, table_name: str, key: dict, fields, item):
+    with uow.lock:
+        uow.remember(_ident(table_name, key), item, fields)
+    return item
+
+def get(table_name: str, key: dict, fields, load):
+    # load() performs the GetItem; its result is remembered for the rest of the request
+    uow = current()
+    if uow is None:
+        return load()
+    hit, item = _known(uow, table_name, key, fields)
+    return item if hit else _remember(uow, table_name, key, fields, load())
+
+def _split(uow, table_name: str, keys: list, fields):
+    # (idents in key order, {ident: known item}, {ident: key still to read})
+    idents = [_ident(table_name, k) for k in keys]
+    known, missing = {}, {}
+    with uow.lock if uow else nullcontext():
+        for ident, key in zip(idents, keys):
+            if ident in known or ident in missing:
+                continue
+            hit, item = uow.lookup(ident, fields) if uow else (False, None)
+            if hit:
+                known[ident] = item
+            else:
+                missing[ident] = key
+    return idents, known, missing
+
+def _merge(uow, table_name: str, keys: list, fields, idents, known, missing, items):
+    attrs = list(keys[0]) if keys else []
+    loaded = {_ident(table_name, {a: i[a] for a in attrs}): i for i in items}
+    for ident in missing:
+        known[ident] = loaded.get(ident)
+        if uow:
+            with uow.lock:
+                uow.remember(ident, known[ident], fields)
+    return [known[ident] for ident in idents]
+
+def get_many(table_name: str, keys: list, fields, load):
+    # load(keys) batch-reads the keys the request doesn't know yet; returns items in key order
+    uow = current()
+    idents, known, missing = _split(uow, table_name, keys, fields)
+    items = load(list(missing.values())) if missing else []
+    return _merge(uow, table_name, keys, fields, idents, known, missing, items)
+
+async def aget_many(table_name: str, keys: list, fields, load):
+    # get_many() for async mode: load is a coroutine function
+    uow = current()
+    idents, known, missing = _split(uow, table_name, keys, fields)
+    items = await load(list(missing.values())) if missing else []
+    return _merge(uow, table_name, keys, fields, idents, known, missing, items)
+
+def write(table_name: str, key: dict, kind: str, payload=None):
+    # kind is "Put" (payload = item), "Delete", or "Update" (payload = update_item kwargs
+    # without Key; no conditions or ReturnValues)
+    uow = current()
+    if uow is None:
+        return _run_one(table_name, key, kind, payload)
+    uow.queue(table_name, key, kind, payload)
+
+def after_flush(fn):
+    # fn() once the writes queued so far are in the table (now, when nothing is queued)
+    uow = current()
+    if uow is not None:
+        with uow.lock:
+            if uow.pending:
+                uow.callbacks.append(fn)
+                return
+    fn()
+
+def immediate(table_name: str, key: dict, run):
+    # for writes whose result matters now: queued writes go first, and the item is re-read after
+    uow = current()
+    if uow is None:
+        return run()
+    uow.flush()
+    try:
+        return run()
+    finally:
+        uow.forget(table_name, key)
+
+def flush_pending():
+    uow = current()
+    if uow is not None:
+        uow.flush()
+
+async def aflush_pending():
+    uow = current()
+    if uow is not None and uow.pending:
+        await aio.to_thread(uow.flush)
+
+def init_unit_of_work(app):
+    if not app.config["UNIT_OF_WORK_ENABLED"]:
+        return
+
+    @app.before_request
+    def begin():
+        g.unit_of_work = UnitOfWork()
+
+    @app.after_request
+    def commit(resp):
+        # a failed flush becomes the request's 500
+        uow = g.get("unit_of_work")
+        if uow is not None:
+            uow.flush()
+        return resp
+
+    @app.teardown_request
+    def end(exc):
+        # the handler raised: still apply the writes it made, as direct calls would have been
+        uow = g.pop("unit_of_work", None)
+        if uow is not None and (uow.pending or uow.callbacks):
+            try:
+                uow.flush()
+            except Exception:
+                current_app.logger.exception("unit of work: flushing queued writes failed")
@@ -0,0 +1,52 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from flask import current_app, request
+
+# project_etag()'s format; the version is all If-Match needs from it
+_ETAG = re.compile(r'^"(\d+)-[0-9a-f]{12}"$')
+
+class PreconditionFailed(Exception):
+    pass
+
+def if_match_version():
+    # project version the client last saw, from an ETag this app issued; None without If-Match
+    # (or "*"). Anything else can't be checked against a version: raises PreconditionFailed (412)
+    header = request.headers.get("If-Match")
+    if header is None or header.strip() == "*":
+        return None
+    m = _ETAG.match(header.strip())
+    if not m:
+        raise PreconditionFailed()
+    return int(m.group(1))
+
+def project_etag(version, *vary) -> str:
+    # strong ETag with the version first (so If-Match reads it back), then a hash of what else
+    # shapes the body: path + query and e.g. the caller's role
+    digest = hashlib.sha1("|".join([request.full_path, *map(str, vary)]).encode()).hexdigest()[:12]
+    return f'"{int(version)}-{digest}"'
+
+def _parse_modified(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc, microsecond=0)
+
+def is_not_modified(etag: str, modified=None) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent
+    header = request.headers.get("If-None-Match")
+    if header is not None:
+        tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+        return "*" in tags or etag in tags
+    since, modified = request.if_modified_since, _parse_modified(modified)
+    return bool(since and modified and modified <= since)
+
+def with_validators(resp, etag: str, modified=None):
+    resp.headers["ETag"] = etag
+    # clients must revalidate, which is what turns repeat views into 304s
+    resp.headers["Cache-Control"] = "private, no-cache"
+    if modified:
+        resp.last_modified = _parse_modified(modified)
+    return resp
+
+def not_modified(etag: str, modified=None):
+    return with_validators(current_app.response_class(status=304), etag, modified)
@@ -0,0 +1,123 @@
+# Throughput of the sync app with reads one by one (FANOUT_MAX_WORKERS=0), with independent reads
+# fanned out on the thread pool, and in async mode (ASYNC_MODE), at the same worker count, on the
+# fan-out routes: the project list (owned + shared queries, then a project BatchGetItem) and the
+# team list (team query, then profile BatchGetItems of 100). Tables are in the memory backend
+# with --latency-ms added to every DynamoDB call, as a stand-in for the network round trip;
+# profiles are not cached, so every team request reads them.
+# Client, app and tables share one process here, so with many workers the GIL, not the waiting,
+# becomes the limit and the modes converge; compare at low worker counts (p50) too.
+# Run from backend/:  python -m benchmarks.bench_async [--workers 8] [--seconds 5] [--latency-ms 8]
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["USER_CACHE_TTL"] = "0"
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["METRICS_DIR"] = ""
+
+from app_folder import create_app
+from app_folder.storage import local
+from app_folder.utils.dynamo import batch_write
+from benchmarks import datasets
+
+OWNER = "bench-owner"
+
+def _slow(fn, seconds):
+    # once per API call: item operations run inside a batch call don't wait again
+    def call(*args, **kwargs):
+        if not getattr(local._calls, "active", False):
+            time.sleep(seconds)
+        return fn(*args, **kwargs)
+    return call
+
+def seed(app, projects, shared, members):
+    cfg = app.config
+    owned = list(datasets.portfolio(OWNER, projects, seed=1))
+    others = list(datasets.portfolio("someone-else", shared, seed=2))
+    profiles = datasets.members(members)
+    now = datetime.utcnow().isoformat()
+    writes = [(cfg["DDB_PROJECTS"], {"PutRequest": {"Item": p}}) for p in owned + others]
+    writes += [(cfg["DDB_TEAMS"], {"PutRequest": {"Item": {
+        "projectId": p["projectId"], "userId": OWNER, "role": "member", "addedAt": now, "ownerId": p["ownerId"]}}})
+        for p in others]
+    writes += [(cfg["DDB_TEAMS"], {"PutRequest": {"Item": {
+        "projectId": owned[0]["projectId"], "userId": u["userId"], "role": "member", "addedAt": now, "ownerId": OWNER}}})
+        for u in profiles]
+    writes += [(cfg["DDB_USERS"], {"PutRequest": {"Item": u}}) for u in profiles]
+    with app.app_context():
+        batch_write(writes)
+    return owned[0]["projectId"]
+
+def load(app, path, workers, seconds):
+    # `workers` threads, each issuing requests back to back, like a threaded server's workers
+    latencies, lock = [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["user"] = {"sub": OWNER, "email": "owner@bench.example"}
+        mine = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            resp = client.get(path)
+            assert resp.status_code == 200, resp.status_code
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--latency-ms", type=float, default=8.0)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--shared", type=int, default=20)
+    parser.add_argument("--members", type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app()
+    project_id = seed(app, args.projects, args.shared, args.members)
+    delay = args.latency_ms / 1000
+    patches = [mock.patch.object(local.LocalTable, name, _slow(getattr(local.LocalTable, name), delay))
+               for name in ("get_item", "put_item", "update_item", "delete_item", "query", "scan")]
+    patches += [mock.patch.object(local.LocalResource, name, _slow(getattr(local.LocalResource, name), delay))
+                for name in ("batch_get_item", "batch_write_item")]
+    for p in patches:
+        p.start()
+
+    routes = {"projects list": "/api/projects?view=summary", "team list": f"/api/project/{project_id}/team"}
+    print(f"{args.workers} workers, {args.latency_ms:g} ms per DynamoDB call, {args.seconds:g}s per case")
+    print(f"{'route':<14} {'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+    try:
+        for name, path in routes.items():
+            base = None
+            for mode, fanout in (("serial", 0), ("fanout", 16), ("async", 0)):
+                app.config["ASYNC_MODE"] = mode == "async"
+                app.config["FANOUT_MAX_WORKERS"] = fanout
+                load(app, path, 1, 0.2)  # warm-up (event loop, pools)
+                rate, p50, p99 = load(app, path, args.workers, args.seconds)
+                base = base or rate
+                print(f"{name:<14} {mode:<6} {rate:>8.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {rate / base:>7.2f}x")
+    finally:
+        for p in patches:
+            p.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Micro-benchmark: cost of obtaining a DynamoDB Table / S3 client per repository call,
+# building fresh boto3 objects (old behaviour) vs. the pooled registry in extensions.
+# Run from backend/:  python -m benchmarks.bench_aws_clients [--seconds 2]
+import argparse
+import os
+import time
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+import boto3
+from app_folder import create_app
+from app_folder.extensions import dynamo_table, s3_client, reset_aws_clients
+
+def _rate(fn, seconds):
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    app = create_app()
+    region = app.config["AWS_REGION"]
+    table_name = app.config["DDB_PROJECTS"]
+    cases = {
+        "dynamo_table (fresh)": lambda: boto3.resource("dynamodb", region_name=region).Table(table_name),
+        "dynamo_table (pooled)": lambda: dynamo_table(table_name),
+        "s3_client (fresh)": lambda: boto3.client("s3", region_name=region),
+        "s3_client (pooled)": s3_client,
+    }
+    with app.app_context():
+        reset_aws_clients()
+        for name, fn in cases.items():
+            print(f"{name:<24} {_rate(fn, args.seconds):>12,.0f} calls/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Bytes on the wire and time per response for GET-project-sized JSON bodies, identity vs gzip vs
+# brotli, through the app's compression layer. "est. total" adds the transfer time at --mbps.
+# Run from backend/:  python -m benchmarks.bench_compression [--mbps 20] [--repeat 20]
+import argparse
+import os
+import time
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+from flask import jsonify
+from app_folder import create_app
+from app_folder.utils import compression
+from benchmarks import datasets
+
+def _measure(client, path, encoding, repeat):
+    headers = {"Accept-Encoding": encoding}
+    client.get(path, headers=headers)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        resp = client.get(path, headers=headers)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(resp.data), elapsed, resp.headers.get("Content-Encoding", "identity")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mbps", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    docs = {size: datasets.project(size) for size in datasets.SIZES}
+
+    @app.get("/__bench/<size>")
+    def bench_project(size):
+        return jsonify(docs[size])
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    if compression.brotli is None:
+        print("brotli not installed: skipping br")
+    client = app.test_client()
+    print(f"{'size':<8} {'encoding':<9} {'bytes':>11} {'ratio':>7} {'server ms':>10} {'est. total ms':>14}")
+    for size in docs:
+        base = None
+        for enc in encodings:
+            nbytes, elapsed, used = _measure(client, f"/__bench/{size}", enc, args.repeat)
+            base = base or nbytes
+            transfer = nbytes * 8 / (args.mbps * 1_000_000)
+            print(f"{size:<8} {used:<9} {nbytes:>11,} {nbytes / base:>7.2f} {elapsed * 1000:>10.2f} "
+                  f"{(elapsed + transfer) * 1000:>14.2f}")
+
+if __name__ == "__main__":
+    main()
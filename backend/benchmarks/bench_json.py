@@ -0,0 +1,52 @@
+# jsonify cost for synthetic project documents: Flask's default provider vs FastJSONProvider
+# (orjson, and its stdlib fallback). Note the default provider emits Decimals as strings.
+# Run from backend/:  python -m benchmarks.bench_json [--repeat 50]
+import argparse
+import os
+import time
+from unittest import mock
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+from flask.json.provider import DefaultJSONProvider
+from app_folder import create_app
+from app_folder.utils import json_provider
+from benchmarks import datasets
+
+def _time(provider, doc, repeat):
+    provider.response(doc).get_data()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        provider.response(doc).get_data()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    providers = {"default": DefaultJSONProvider(app), "fast (stdlib)": json_provider.FastJSONProvider(app)}
+    if json_provider.orjson is not None:
+        providers["fast (orjson)"] = json_provider.FastJSONProvider(app)
+    else:
+        print("orjson not installed: skipping the orjson case")
+    for provider in providers.values():
+        provider.compact = True  # what production (DEBUG off) sends
+
+    print(f"{'size':<8} {'provider':<15} {'bytes':>11} {'ms/response':>12} {'speedup':>8}")
+    with app.app_context():
+        for size in datasets.SIZES:
+            doc = datasets.project(size)
+            base = None
+            for name, provider in providers.items():
+                orjson = json_provider.orjson if name == "fast (orjson)" else None
+                with mock.patch.object(json_provider, "orjson", orjson):
+                    nbytes = len(provider.response(doc).get_data())
+                    elapsed = _time(provider, doc, args.repeat)
+                base = base or elapsed
+                print(f"{size:<8} {name:<15} {nbytes:>11,} {elapsed * 1000:>12.3f} {base / elapsed:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
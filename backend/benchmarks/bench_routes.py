@@ -0,0 +1,359 @@
+# End-to-end benchmark of every API route: create_app() driven through the Flask test client,
+# DynamoDB served by a local storage backend (memory or sqlite), S3 and Cognito by moto.
+# Seeds one owner with --projects projects; the first also gets a --members team, a --files
+# file tree and an --updates feed. Reports latency percentiles, AWS calls per request and
+# response size per route; --save writes them as JSON and --baseline compares against a saved
+# run, exiting 1 when a route regressed. Endpoints of app.url_map that no route below exercises
+# are reported (and recorded under "skipped"), so new routes don't silently go unmeasured.
+# Run from backend/:  python -m benchmarks.bench_routes [--scale full] [--save results.json] [--baseline base.json]
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("S3_BUCKET_NAME", "bench-bucket")
+
+try:
+    from moto import mock_aws
+except ImportError:  # routes that call S3 or Cognito are skipped
+    mock_aws = None
+
+from benchmarks import datasets
+
+OWNER = "bench-owner"
+# endpoints that aren't API routes, or can't run without the identity provider
+NOT_BENCHMARKED = {"static", "home", "metrics", "api.auth.login", "api.auth.auth_authorize"}
+
+def _route(name, method, path, body=None, headers=None, setup=None, who="owner", needs=(), heavy=False):
+    # path/body/headers may be callables of the iteration number; setup(i) runs untimed first
+    return {"name": name, "method": method, "path": path, "body": body, "headers": headers,
+            "setup": setup, "who": who, "needs": needs, "heavy": heavy}
+
+def _arg(value, i):
+    return value(i) if callable(value) else value
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def _aws_calls():
+    from app_folder import metrics
+    return dict(metrics.snapshot()["counters"].get("aws_calls_total", {}))
+
+def _calls_between(before, after):
+    # {operation: calls} made between two snapshots of aws_calls_total
+    out = {}
+    for key, value in after.items():
+        delta = value - before.get(key, 0)
+        if delta:
+            labels = dict(part.split("=", 1) for part in key.split(","))
+            op = f'{labels["service"].strip(chr(34))}.{labels["operation"].strip(chr(34))}'
+            out[op] = out.get(op, 0) + delta
+    return out
+
+def _files(folder, path=()):
+    # (path, file) for every file in a nested directory
+    for f in folder["files"]:
+        yield list(path), f
+    for sub in folder["folders"]:
+        yield from _files(sub, path + (sub["name"],))
+
+def seed(app, args):
+    from app_folder.repositories import files_repo, updates_repo
+    from app_folder.utils.dynamo import batch_write
+    cfg = app.config
+    projects = list(datasets.portfolio(OWNER, args.projects, args.seed))
+    big = projects[0]
+    profiles = datasets.members(args.members, args.seed)
+    directory = datasets.directory(random.Random(args.seed), args.files, datetime(2025, 1, 1), project_id=big["projectId"])
+    now = datetime.utcnow().isoformat()
+    writes = [(cfg["DDB_PROJECTS"], {"PutRequest": {"Item": p}}) for p in projects]
+    writes += [(cfg["DDB_TEAMS"], {"PutRequest": {"Item": {
+        "projectId": p["projectId"], "userId": OWNER, "role": "owner", "addedAt": now, "ownerId": OWNER}}})
+        for p in projects]
+    writes += [(cfg["DDB_TEAMS"], {"PutRequest": {"Item": {
+        "projectId": big["projectId"], "userId": u["userId"], "role": "member", "addedAt": now, "ownerId": OWNER}}})
+        for u in profiles]
+    writes += [(cfg["DDB_USERS"], {"PutRequest": {"Item": u}}) for u in profiles]
+    writes += [(cfg["DDB_USERS"], {"PutRequest": {"Item": {
+        "userId": OWNER, "given_name": "Bench", "family_name": "Owner", "email": "owner@bench.example"}}})]
+    with app.app_context():
+        batch_write(writes)
+        for p in projects[1:]:
+            files_repo.put_root(p["projectId"], now)
+        files_repo.import_tree(big["projectId"], directory)
+        updates_repo.put_many(datasets.feed(big["projectId"], args.updates, args.seed))
+    return {"projects": projects, "big": big, "members": profiles, "directory": directory,
+            "files": list(_files(directory))}
+
+def seed_aws(app, args):
+    # S3 bucket and Cognito users behind moto: the owner (for /users/sync), one user per
+    # iteration for add-user and ten per iteration for add-users
+    import boto3
+    region = app.config["AWS_REGION"]
+    boto3.client("s3", region_name=region).create_bucket(Bucket=app.config["S3_BUCKET"])
+    idp = boto3.client("cognito-idp", region_name=region)
+    pool = idp.create_user_pool(PoolName="bench")["UserPool"]["Id"]
+    app.config["COGNITO_USER_POOL_ID"] = pool
+    users = [(OWNER, "owner@bench.example")] + [(f"new{i}", f"new{i}@bench.example") for i in range(args.repeat + 1)]
+    users += [(f"bulk{i}-{j}", f"bulk{i}-{j}@bench.example") for i in range(args.repeat + 1) for j in range(10)]
+    for name, email in users:
+        idp.admin_create_user(UserPoolId=pool, Username=name, UserAttributes=[
+            {"Name": "email", "Value": email}, {"Name": "given_name", "Value": "New"}, {"Name": "family_name", "Value": name}])
+
+def routes(app, data, clients):
+    big = data["big"]
+    pid = big["projectId"]
+    P = f"/api/projects/{pid}"
+    F = f"/api/project/{pid}"
+    folder_path, _ = next(((p, f) for p, f in data["files"] if p), data["files"][0])
+    task_id = big["tasks"][0]["taskId"]
+    etags, uploads = {}, {}
+
+    def remember_etag(who):
+        def setup(i):
+            etags[who] = clients[who].get(P).headers.get("ETag")
+        return setup
+
+    def start_upload(complete):
+        def setup(i):
+            import boto3
+            s3 = boto3.client("s3", region_name=app.config["AWS_REGION"])
+            key = f"projects/{pid}/multipart-{complete}-{i}.bin"
+            upload_id = s3.create_multipart_upload(Bucket=app.config["S3_BUCKET"], Key=key)["UploadId"]
+            etag = s3.upload_part(Bucket=app.config["S3_BUCKET"], Key=key, UploadId=upload_id, PartNumber=1,
+                                  Body=b"x" * 1024)["ETag"]
+            uploads[i] = {"key": key, "uploadId": upload_id, "parts": [{"partNumber": 1, "etag": etag}]}
+        return setup
+
+    return [
+        _route("auth.me", "GET", "/api/me"),
+        _route("projects.list (summary)", "GET", "/api/projects?view=summary"),
+        _route("projects.list (page of 50)", "GET", "/api/projects?limit=50"),
+        _route("projects.list (full)", "GET", "/api/projects", heavy=True),
+        _route("projects.get (owner)", "GET", P),
+        _route("projects.get (member)", "GET", P, who="member"),
+        _route("projects.get (304)", "GET", P, headers=lambda i: {"If-None-Match": etags["owner"]},
+               setup=remember_etag("owner")),
+        _route("projects.get (member 304)", "GET", P, who="member",
+               headers=lambda i: {"If-None-Match": etags["member"]}, setup=remember_etag("member")),
+        _route("projects.tasks.get", "GET", f"{P}/tasks"),
+        _route("projects.updates.get (page of 20)", "GET", f"{P}/updates?limit=20"),
+        _route("projects.updates.get (all)", "GET", f"{P}/updates", heavy=True),
+        _route("team.get (all)", "GET", f"{F}/team"),
+        _route("team.get (page of 50)", "GET", f"{F}/team?limit=50"),
+        _route("projects.update-field", "PATCH", f"{P}/update-field",
+               body=lambda i: {"field": "status", "value": f"Phase {i}"}),
+        _route("projects.update", "POST", f"{P}/update", body=lambda i: {"status": f"Phase {i}", "progress": i % 100}),
+        _route("projects.update-milestone", "POST", f"{P}/update-milestone",
+               body=lambda i: {"index": 0, "field": "completed", "value": i % 2 == 0}),
+        _route("projects.milestones", "PATCH", f"{P}/milestones", body=lambda i: {"edits": [
+            {"index": 0, "field": "title", "value": f"Pour {i}"}, {"index": 1, "field": "completed", "value": i % 2 == 1}]}),
+        _route("projects.timeline", "POST", f"{P}/timeline",
+               body=lambda i: {"timeline": [{"phase": f"Phase {n}", "weeks": n + i % 3} for n in range(10)]}),
+        _route("projects.tasks.patch", "PATCH", f"{P}/tasks",
+               body=lambda i: {"op": "update", "taskId": task_id, "fields": {"status": ("todo", "done")[i % 2]}}),
+        _route("projects.tasks.replace", "POST", f"{P}/tasks", body=big["tasks"]),
+        _route("projects.inspections", "PATCH", f"{P}/inspections",
+               body=lambda i: [{**x, "status": ("Pending", "Passed")[i % 2]} for x in big["inspections"]]),
+        _route("projects.updates.add", "POST", f"{P}/updates",
+               body=lambda i: {"title": f"Daily log {i}", "author": "Bench Owner", "summary": "Framing inspection passed"}),
+        _route("projects.create", "POST", "/api/projects", body=lambda i: {"name": f"Bench new {i}", "client": "Bench"}),
+        _route("files.presign", "POST", f"{F}/files/presign",
+               body=lambda i: {"fileName": f"plan-{i}.pdf", "fileType": "application/pdf"}),
+        _route("files.presign-get", "POST", f"{F}/files/presign-get", body=lambda i: {"key": data["files"][i][1]["key"]}),
+        _route("files.presign-batch (100)", "POST", f"{F}/files/presign-batch",
+               body={"items": [{"operation": "get", "key": f["key"]} for _, f in data["files"][:100]]}),
+        _route("files.metadata", "POST", f"{F}/files/metadata", body=lambda i: {
+            "key": f"projects/{pid}/upload-{i}.pdf", "name": f"upload-{i}.pdf", "size": 1024, "path": folder_path}),
+        _route("files.folder.create", "POST", f"{F}/files/folder", body=lambda i: {"folderName": f"bench-{i}", "path": folder_path}),
+        _route("files.folder.delete", "DELETE", f"{F}/files/folder", body=lambda i: {"folderName": f"bench-{i}", "path": folder_path},
+               needs=("s3",)),
+        _route("files.delete", "DELETE", f"{F}/files", body=lambda i: {"key": data["files"][i][1]["key"], "path": data["files"][i][0]},
+               needs=("s3",)),
+        _route("files.multipart.create", "POST", f"{F}/files/multipart",
+               body=lambda i: {"fileName": f"video-{i}.mp4", "fileType": "video/mp4"}, needs=("s3",)),
+        _route("files.multipart.presign-parts", "POST", f"{F}/files/multipart/parts", setup=start_upload("parts"),
+               body=lambda i: {**uploads[i], "partNumbers": list(range(1, 21))}, needs=("s3",)),
+        _route("files.multipart.list-parts", "GET", lambda i: f"{F}/files/multipart/parts?key={uploads[i]['key']}&uploadId={uploads[i]['uploadId']}",
+               setup=start_upload("list"), needs=("s3",)),
+        _route("files.multipart.complete", "POST", f"{F}/files/multipart/complete", setup=start_upload("complete"),
+               body=lambda i: {**uploads[i], "path": folder_path, "size": 1024}, needs=("s3",)),
+        _route("files.multipart.abort", "DELETE", f"{F}/files/multipart", setup=start_upload("abort"),
+               body=lambda i: uploads[i], needs=("s3",)),
+        _route("team.add-user", "POST", f"{F}/add-user", body=lambda i: {"email": f"new{i}@bench.example"}, needs=("cognito",)),
+        # ten new (Cognito only), ten already on the team and one unknown
+        _route("team.add-users (21)", "POST", f"{F}/add-users", body=lambda i: {"emails": [
+            *(f"bulk{i}-{j}@bench.example" for j in range(10)), *(u["email"] for u in data["members"][:10]),
+            f"nobody{i}@bench.example"]}, needs=("cognito",)),
+        _route("team.remove-user", "DELETE", f"{F}/remove-user", body=lambda i: {"userId": data["members"][-1 - i]["userId"]}),
+        _route("users.sync", "GET", "/api/users/sync", needs=("cognito",)),
+        _route("projects.directory.replace", "PATCH", f"{P}/directory", body=data["directory"], heavy=True),
+        _route("projects.delete", "DELETE", lambda i: f"/api/projects/{data['projects'][-1 - i]['projectId']}", needs=("s3",)),
+        _route("auth.logout", "GET", "/api/logout", who="fresh"),
+    ]
+
+def _endpoint(app, path, method):
+    return app.url_map.bind("localhost").match(path.split("?", 1)[0], method=method)[0]
+
+def run_route(app, route, clients, repeat):
+    samples, calls, sizes, statuses = [], [], [], set()
+    for i in range(repeat):
+        if route["setup"]:
+            with app.app_context():
+                route["setup"](i)
+        client = clients[route["who"]]
+        kwargs = {"headers": _arg(route["headers"], i) or {}}
+        body = _arg(route["body"], i)
+        if body is not None:
+            kwargs["json"] = body
+        path = _arg(route["path"], i)
+        before = _aws_calls()
+        start = time.perf_counter()
+        resp = client.open(path, method=route["method"], **kwargs)
+        samples.append(time.perf_counter() - start)
+        calls.append(_calls_between(before, _aws_calls()))
+        sizes.append(len(resp.get_data()))
+        statuses.add(resp.status_code)
+    by_operation = {}
+    for c in calls:
+        for op, n in c.items():
+            by_operation[op] = by_operation.get(op, 0) + n / len(calls)
+    return {
+        "method": route["method"], "endpoint": _endpoint(app, path, route["method"]), "status": sorted(statuses), "n": len(samples),
+        "p50_ms": _percentile(samples, 50) * 1000, "p90_ms": _percentile(samples, 90) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000, "mean_ms": sum(samples) / len(samples) * 1000,
+        "aws_calls": sum(sum(c.values()) for c in calls) / len(calls),
+        "aws_calls_by_operation": {k: round(v, 2) for k, v in sorted(by_operation.items())},
+        "bytes": max(sizes),
+    }
+
+def compare(results, baseline, threshold, min_delta_ms):
+    # regressions: slower p50 (relatively and absolutely), more AWS calls, or bigger payloads
+    flagged = []
+    for name, cur in results["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if base is None:
+            continue
+        reasons = []
+        if cur["p50_ms"] > base["p50_ms"] * (1 + threshold) and cur["p50_ms"] - base["p50_ms"] >= min_delta_ms:
+            reasons.append(f"p50 {base['p50_ms']:.2f} -> {cur['p50_ms']:.2f} ms")
+        if cur["aws_calls"] > base["aws_calls"] + 0.01:
+            reasons.append(f"AWS calls {base['aws_calls']:g} -> {cur['aws_calls']:g}")
+        if cur["bytes"] > base["bytes"] * (1 + threshold):
+            reasons.append(f"bytes {base['bytes']:,} -> {cur['bytes']:,}")
+        if reasons:
+            flagged.append((name, reasons))
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=datasets.SCALES, default="small")
+    parser.add_argument("--projects", type=int)
+    parser.add_argument("--members", type=int)
+    parser.add_argument("--files", type=int)
+    parser.add_argument("--updates", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--heavy-repeat", type=int, default=3, help="iterations for whole-tree/whole-account routes")
+    parser.add_argument("--only", help="comma-separated substrings of route names to run")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown/growth that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p50 slowdowns smaller than this")
+    args = parser.parse_args()
+    for field, default in zip(("projects", "members", "files", "updates"), datasets.SCALES[args.scale]):
+        if getattr(args, field) is None:
+            setattr(args, field, default)
+    args.repeat = min(args.repeat, args.members - 1, args.projects - 1)
+
+    # config is read when app_folder is imported, so the backend is chosen before that
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["SQLITE_PATH"] = db = f"bench-{os.getpid()}.sqlite3"
+    os.environ["METRICS_DIR"] = ""
+    if mock_aws is None:
+        print("moto not installed: skipping routes that call S3 or Cognito")
+    try:
+        with mock_aws() if mock_aws else nullcontext():
+            results = _run(args)
+    finally:
+        for path in (db, f"{db}-wal", f"{db}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"saved {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("dataset", "backend"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"warning: baseline was recorded with a different {key}")
+        flagged = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, reasons in flagged:
+            print(f"REGRESSION {name}: {'; '.join(reasons)}")
+        if flagged:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+def _run(args):
+    from app_folder import create_app
+    app = create_app()
+    app.config["TESTING"] = True
+    started = time.perf_counter()
+    data = seed(app, args)
+    if mock_aws:
+        seed_aws(app, args)
+    print(f"seeded {args.projects} projects, {args.members} members, {args.files} files, "
+          f"{args.updates} updates in {time.perf_counter() - started:.1f}s ({args.backend})")
+
+    clients = {"owner": app.test_client(), "member": app.test_client(), "fresh": app.test_client()}
+    for who, user in (("owner", {"sub": OWNER, "email": "owner@bench.example"}),
+                      ("member", {"sub": data["members"][0]["userId"], "email": data["members"][0]["email"]}),
+                      ("fresh", {"sub": OWNER, "email": "owner@bench.example"})):
+        with clients[who].session_transaction() as s:
+            s["user"] = user
+
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    results = {"meta": {
+        "dataset": {"projects": args.projects, "members": args.members, "files": args.files,
+                    "updates": args.updates, "seed": args.seed},
+        "backend": args.backend, "repeat": args.repeat, "python": platform.python_version(),
+        "recorded": datetime.utcnow().isoformat(timespec="seconds"),
+    }, "routes": {}, "skipped": {}}
+    print(f"{'route':<36} {'status':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'AWS calls':>10} {'bytes':>12}")
+    for route in routes(app, data, clients):
+        if only and not any(s in route["name"] for s in only):
+            continue
+        if route["needs"] and not mock_aws:
+            results["skipped"][route["name"]] = f"needs moto ({', '.join(route['needs'])})"
+            continue
+        r = run_route(app, route, clients, args.heavy_repeat if route["heavy"] else args.repeat)
+        results["routes"][route["name"]] = r
+        print(f"{route['name']:<36} {'/'.join(map(str, r['status'])):>7} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['aws_calls']:>10.1f} {r['bytes']:>12,}")
+    results["skipped"]["auth.login / auth.authorize"] = "redirect to / callback from the identity provider"
+    if not only:
+        covered = {(r["endpoint"], r["method"]) for r in results["routes"].values()}
+        covered |= {(_endpoint(app, _arg(route["path"], 0), route["method"]), route["method"])
+                    for route in routes(app, data, clients) if route["name"] in results["skipped"] and not callable(route["path"])}
+        for rule in app.url_map.iter_rules():
+            for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+                if rule.endpoint not in NOT_BENCHMARKED and (rule.endpoint, method) not in covered:
+                    print(f"warning: {method} {rule.rule} ({rule.endpoint}) is not benchmarked")
+                    results["skipped"][f"{method} {rule.rule}"] = "not in bench_routes.routes()"
+    return results
+
+if __name__ == "__main__":
+    main()
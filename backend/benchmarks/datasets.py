@@ -0,0 +1,137 @@
+# Synthetic project documents shaped like what DynamoDB hands back for BuildManagerProjects
+# (numbers as Decimal), for the benchmarks. Deterministic for a given seed.
+import random
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# (files, expenses, updates, inspections, tasks, milestones)
+SIZES = {
+    "small": (10, 10, 5, 3, 10, 4),
+    "medium": (200, 150, 50, 40, 120, 12),
+    "large": (2000, 1500, 300, 400, 1000, 40),
+}
+
+_WORDS = ("concrete pour framing inspection drywall electrical rough-in plumbing permit roofing "
+          "foundation survey excavation HVAC delivery punch list walkthrough change order").split()
+
+def _text(rnd, n):
+    return " ".join(rnd.choice(_WORDS) for _ in range(n))
+
+def _date(rnd, start):
+    return (start + timedelta(days=rnd.randint(0, 365))).date().isoformat()
+
+def _stamp(rnd, start):
+    return (start + timedelta(seconds=rnd.randint(0, 365 * 86400))).isoformat()
+
+def _uuid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+def _key_prefix(rnd, project_id):
+    random_id = _uuid(rnd)  # drawn either way, so the rest of the dataset doesn't depend on project_id
+    return project_id or random_id
+
+def directory(rnd, files, start, depth=3, fanout=4, project_id=None):
+    # nested {name, createdAt, folders, files} tree holding `files` files, keyed under the
+    # project's upload prefix as the app writes them
+    def folder(name, level):
+        return {"name": name, "createdAt": _stamp(rnd, start), "folders": [], "files": [], "_level": level}
+    root = folder("root", 0)
+    folders = [root]
+    while len(folders) < max(1, files // 10):
+        parent = rnd.choice([f for f in folders if f["_level"] < depth] or [root])
+        child = folder(f"{rnd.choice(_WORDS)}-{len(folders)}", parent["_level"] + 1)
+        if len(parent["folders"]) < fanout or parent is root:
+            parent["folders"].append(child)
+            folders.append(child)
+    for i in range(files):
+        name = f"{rnd.choice(_WORDS).replace(' ', '-')}-{i}.pdf"
+        rnd.choice(folders)["files"].append({
+            "name": name, "size": Decimal(rnd.randint(10_000, 50_000_000)),
+            "uploadedAt": _stamp(rnd, start), "key": f"projects/{_key_prefix(rnd, project_id)}/{name}",
+        })
+    for f in folders:
+        del f["_level"]
+    return root
+
+def project(size="medium", seed=0, owner_id="bench-owner"):
+    files, expenses, updates, inspections, tasks, milestones = SIZES[size]
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    project_id = _uuid(rnd)
+    return {
+        "userId": owner_id, "ownerId": owner_id, "projectId": project_id,
+        "name": f"Bench project {seed}", "description": _text(rnd, 30), "client": "Bench Client",
+        "location": "123 Main St", "status": "In Progress", "progress": Decimal(rnd.randint(0, 100)),
+        "startDate": "2025-01-01", "endDate": "2026-01-01", "createdAt": start.isoformat(),
+        "updatedAt": _stamp(rnd, start), "s3Folder": f"{owner_id}/{project_id}/",
+        "version": Decimal(rnd.randint(1, 500)),
+        "budget": Decimal(rnd.randint(100_000, 5_000_000)),
+        "expenses": [
+            {"category": rnd.choice(("Labor", "Materials", "Permits", "Equipment")), "description": _text(rnd, 6),
+             "date": _date(rnd, start), "amount": Decimal(f"{rnd.randint(10, 50_000)}.{rnd.randint(0, 99):02d}")}
+            for _ in range(expenses)
+        ],
+        "milestones": [
+            {"title": _text(rnd, 3), "date": _date(rnd, start), "completed": rnd.random() < 0.5} for _ in range(milestones)
+        ],
+        "latestUpdates": [
+            {"title": _text(rnd, 4), "author": "Bench Author", "date": _date(rnd, start), "summary": _text(rnd, 25),
+             "updateKey": f"{_stamp(rnd, start)}#{rnd.getrandbits(32):08x}"}
+            for _ in range(min(updates, 5))
+        ],
+        "updates": [
+            {"title": _text(rnd, 4), "author": "Bench Author", "date": _date(rnd, start), "summary": _text(rnd, 25)}
+            for _ in range(updates)
+        ],
+        "inspections": [
+            {"id": _uuid(rnd), "title": _text(rnd, 3), "date": _date(rnd, start), "inspector": "Bench Inspector",
+             "status": rnd.choice(("Pending", "Passed", "Failed")), "notes": _text(rnd, 15)}
+            for _ in range(inspections)
+        ],
+        "tasks": [
+            {"taskId": _uuid(rnd), "title": _text(rnd, 4), "description": _text(rnd, 12),
+             "status": rnd.choice(("todo", "in-progress", "done")), "dueDate": _date(rnd, start),
+             "createdAt": _stamp(rnd, start)}
+            for _ in range(tasks)
+        ],
+        "directory": directory(rnd, files, start, project_id=project_id),
+    }
+
+# Whole-account datasets for the route benchmark: (projects per owner, team members of the
+# busiest project, files in its tree, updates in its feed)
+SCALES = {
+    "small": (50, 25, 500, 250),
+    "medium": (250, 100, 2500, 1000),
+    "full": (1000, 500, 10000, 5000),
+}
+
+def portfolio(owner_id, count, seed=0):
+    # `count` projects in the current layout: file tree and update feed live in their own tables
+    for i in range(count):
+        item = project("small", seed * 100_000 + i, owner_id)
+        del item["directory"], item["updates"]
+        yield item
+
+def members(count, seed=0):
+    # user profiles as the Users table stores them
+    rnd = random.Random(seed)
+    first = ("Ana", "Ben", "Carla", "Dev", "Eli", "Fay", "Gus", "Hana", "Ivan", "Jo")
+    last = ("Alvarez", "Brooks", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Hughes", "Ito", "Jones")
+    return [{
+        "userId": _uuid(rnd), "given_name": rnd.choice(first), "family_name": rnd.choice(last),
+        "email": f"member{i}@bench.example", "syncedAt": _stamp(rnd, datetime(2025, 1, 1)),
+    } for i in range(count)]
+
+def feed(project_id, count, seed=0):
+    # update feed items, oldest first, with the updateKey layout of updates_repo
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    out = []
+    for i in range(count):
+        posted = (start + timedelta(minutes=37 * i)).isoformat()
+        out.append({
+            "projectId": project_id, "updateKey": f"{posted}#{rnd.getrandbits(32):08x}", "postedAt": posted,
+            "title": _text(rnd, 4), "author": "Bench Author", "date": posted[:10], "summary": _text(rnd, 25),
+        })
+    return out
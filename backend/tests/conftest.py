@@ -0,0 +1,46 @@
+import pytest
+from app_folder import create_app
+from app_folder.extensions import dynamo_resource, reset_aws_clients
+from app_folder.storage import schemas
+
+BACKENDS = ["moto", "memory", "sqlite"]
+
+def create_tables(cfg):
+    # the DynamoDB tables as storage.schemas() describes them, so moto and the local backends agree
+    resource = dynamo_resource()
+    for name, schema in schemas(cfg).items():
+        keys = [(schema.hash_key, "HASH"), (schema.range_key, "RANGE")]
+        attrs = {schema.hash_key, schema.range_key} | {a for index in schema.indexes.values() for a in index}
+        params = {
+            "TableName": name,
+            "KeySchema": [{"AttributeName": a, "KeyType": t} for a, t in keys if a],
+            "AttributeDefinitions": [{"AttributeName": a, "AttributeType": "S"} for a in sorted(attrs - {None})],
+            "BillingMode": "PAY_PER_REQUEST",
+        }
+        if schema.indexes:
+            params["GlobalSecondaryIndexes"] = [{
+                "IndexName": index,
+                "KeySchema": [{"AttributeName": a, "KeyType": t} for a, t in ((h, "HASH"), (r, "RANGE")) if a],
+                "Projection": {"ProjectionType": "ALL"},
+            } for index, (h, r) in schema.indexes.items()]
+        resource.create_table(**params)
+
+@pytest.fixture(params=BACKENDS)
+def app(request, tmp_path, monkeypatch):
+    # an app context on empty tables in each storage backend
+    for var, value in (("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"), ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(var, value)
+    reset_aws_clients()
+    app = create_app()
+    app.config.update(METRICS_ENABLED=False, SQLITE_PATH=str(tmp_path / "tables.db"))
+    if request.param == "moto":
+        moto = pytest.importorskip("moto")
+        app.config["STORAGE_BACKEND"] = "dynamodb"
+        with moto.mock_aws(), app.app_context():
+            create_tables(app.config)
+            yield app
+    else:
+        app.config["STORAGE_BACKEND"] = request.param
+        with app.app_context():
+            yield app
+    reset_aws_clients()
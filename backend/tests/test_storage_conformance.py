@@ -0,0 +1,175 @@
+# The same table operations against moto and the local storage backends (memory, sqlite); every
+# backend must give DynamoDB's answers.
+from decimal import Decimal
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from app_folder.extensions import dynamo_resource, dynamo_table
+
+def _tables(app):
+    cfg = app.config
+    return dynamo_table(cfg["DDB_PROJECTS"]), dynamo_table(cfg["DDB_TEAMS"]), dynamo_table(cfg["DDB_USERS"])
+
+def _seed(projects, n=7):
+    for i in range(n):
+        projects.put_item(Item={
+            "userId": "o", "projectId": f"p{i}", "ownerId": "o", "name": f"n{i}", "version": 1,
+            "tasks": [{"taskId": "a", "t": Decimal("1.5")}, {"taskId": "b"}], "tags": {"x", "y"},
+        })
+
+def _error(fn):
+    with pytest.raises(ClientError) as e:
+        fn()
+    return e.value.response
+
+def test_put_get_and_projection(app):
+    projects, _, _ = _tables(app)
+    _seed(projects, 2)
+    item = projects.get_item(Key={"userId": "o", "projectId": "p1"})["Item"]
+    assert item["version"] == Decimal(1) and isinstance(item["version"], Decimal)
+    assert item["tasks"][0]["t"] == Decimal("1.5") and item["tags"] == {"x", "y"}
+    projected = projects.get_item(Key={"userId": "o", "projectId": "p1"}, ProjectionExpression="#n, version",
+                                  ExpressionAttributeNames={"#n": "name"})["Item"]
+    assert projected == {"name": "n1", "version": 1}
+    assert "Item" not in projects.get_item(Key={"userId": "o", "projectId": "missing"})
+
+def test_conditions(app):
+    projects, _, _ = _tables(app)
+    _seed(projects, 2)
+    err = _error(lambda: projects.put_item(Item={"userId": "o", "projectId": "p1"},
+                                           ConditionExpression="attribute_not_exists(projectId)"))
+    assert err["Error"]["Code"] == "ConditionalCheckFailedException"
+    update = dict(Key={"userId": "o", "projectId": "p1"}, UpdateExpression="SET #v = #v + :one",
+                  ConditionExpression="#v = :seen", ExpressionAttributeNames={"#v": "version"})
+    projects.update_item(**update, ExpressionAttributeValues={":one": 1, ":seen": 1})
+    err = _error(lambda: projects.update_item(**update, ExpressionAttributeValues={":one": 1, ":seen": 1}))
+    assert err["Error"]["Code"] == "ConditionalCheckFailedException"
+    err = _error(lambda: projects.delete_item(Key={"userId": "o", "projectId": "gone"},
+                                              ConditionExpression="attribute_exists(projectId)"))
+    assert err["Error"]["Code"] == "ConditionalCheckFailedException"
+    assert projects.get_item(Key={"userId": "o", "projectId": "p1"})["Item"]["version"] == 2
+
+def test_update_expressions_and_return_values(app):
+    projects, _, _ = _tables(app)
+    _seed(projects, 3)
+    new = projects.update_item(
+        Key={"userId": "o", "projectId": "p1"},
+        UpdateExpression="SET #v = if_not_exists(#v, :z) + :one, tasks[0].t = :t, tasks[5] = :nt, "
+                         "members = list_append(if_not_exists(members, :e), :m) REMOVE tags",
+        ExpressionAttributeNames={"#v": "version"},
+        ExpressionAttributeValues={":z": 0, ":one": 1, ":t": 3, ":nt": {"taskId": "c"}, ":e": [], ":m": ["d"]},
+        ReturnValues="ALL_NEW",
+    )["Attributes"]
+    assert new["version"] == 2 and "tags" not in new and new["members"] == ["d"]
+    assert new["tasks"] == [{"taskId": "a", "t": 3}, {"taskId": "b"}, {"taskId": "c"}]
+    old = projects.update_item(Key={"userId": "o", "projectId": "p2"}, UpdateExpression="SET #n = :n REMOVE tasks[0]",
+                               ExpressionAttributeNames={"#n": "name"}, ExpressionAttributeValues={":n": "zz"},
+                               ReturnValues="UPDATED_OLD")["Attributes"]
+    assert old == {"name": "n2", "tasks": [{"taskId": "a", "t": Decimal("1.5")}, {"taskId": "b"}]}
+    assert projects.get_item(Key={"userId": "o", "projectId": "p2"})["Item"]["tasks"] == [{"taskId": "b"}]
+    created = projects.update_item(Key={"userId": "o", "projectId": "new"}, UpdateExpression="SET a = :a",
+                                   ExpressionAttributeValues={":a": 1}, ReturnValues="ALL_NEW")["Attributes"]
+    assert created == {"userId": "o", "projectId": "new", "a": 1}
+    assert projects.delete_item(Key={"userId": "o", "projectId": "p0"}, ReturnValues="ALL_OLD")["Attributes"]["name"] == "n0"
+    assert "Attributes" not in projects.put_item(Item={"userId": "o", "projectId": "p0"}, ReturnValues="ALL_OLD")
+
+def test_queries(app):
+    projects, teams, users = _tables(app)
+    _seed(projects)
+    projects.put_item(Item={"userId": "other", "projectId": "q", "ownerId": "other"})
+    owned = projects.query(IndexName="ownerId-index", KeyConditionExpression=Key("ownerId").eq("o"))["Items"]
+    assert sorted(i["projectId"] for i in owned) == [f"p{i}" for i in range(7)]
+    between = projects.query(KeyConditionExpression=Key("userId").eq("o") & Key("projectId").between("p2", "p4"))
+    assert [i["projectId"] for i in between["Items"]] == ["p2", "p3", "p4"]
+    desc = projects.query(KeyConditionExpression=Key("userId").eq("o") & Key("projectId").begins_with("p"),
+                          ScanIndexForward=False, ProjectionExpression="projectId")
+    assert [i["projectId"] for i in desc["Items"]] == [f"p{i}" for i in reversed(range(7))]
+    users.put_item(Item={"userId": "s1", "email": "a@x.com"})
+    users.put_item(Item={"userId": "s2"})
+    by_email = users.query(IndexName="email-index", KeyConditionExpression=Key("email").eq("a@x.com"))["Items"]
+    assert [i["userId"] for i in by_email] == ["s1"]
+    teams.put_item(Item={"projectId": "p1", "userId": "b", "role": "member"})
+    teams.put_item(Item={"projectId": "p2", "userId": "b", "role": "owner"})
+    memberships = teams.query(IndexName="userId-index", KeyConditionExpression=Key("userId").eq("b"),
+                              FilterExpression=Attr("role").eq("member"))["Items"]
+    assert [i["projectId"] for i in memberships] == ["p1"]
+
+def test_limit_and_exclusive_start_key(app):
+    projects, _, _ = _tables(app)
+    _seed(projects)
+    seen, start, pages = [], None, 0
+    while True:
+        kwargs = {"ExclusiveStartKey": start} if start else {}
+        resp = projects.query(KeyConditionExpression=Key("userId").eq("o"), Limit=3, **kwargs)
+        seen += [i["projectId"] for i in resp["Items"]]
+        pages += 1
+        start = resp.get("LastEvaluatedKey")
+        if not start:
+            break
+        assert start == {"userId": "o", "projectId": resp["Items"][-1]["projectId"]}
+    assert seen == [f"p{i}" for i in range(7)] and pages == 3
+    # Limit counts the items evaluated, before the filter
+    resp = projects.query(KeyConditionExpression=Key("userId").eq("o"), FilterExpression=Attr("name").eq("n1"), Limit=2)
+    assert [i["projectId"] for i in resp["Items"]] == ["p1"] and resp["Count"] == 1 and resp["ScannedCount"] == 2
+    assert resp["LastEvaluatedKey"] == {"userId": "o", "projectId": "p1"}
+
+def test_segmented_scan(app):
+    projects, _, _ = _tables(app)
+    _seed(projects)
+    projects.put_item(Item={"userId": "other", "projectId": "q", "ownerId": "other"})
+    segments = []
+    for segment in range(4):
+        items, kwargs = [], {}
+        while True:
+            resp = projects.scan(Segment=segment, TotalSegments=4, FilterExpression=Attr("ownerId").eq("o"),
+                                 ProjectionExpression="projectId", Limit=2, **kwargs)
+            items += [i["projectId"] for i in resp["Items"]]
+            if not resp.get("LastEvaluatedKey"):
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        segments.append(items)
+    found = [p for s in segments for p in s]
+    assert sorted(found) == [f"p{i}" for i in range(7)] and len(found) == len(set(found))
+
+def test_batch_operations(app):
+    projects, teams, _ = _tables(app)
+    _seed(projects, 3)
+    cfg, resource = app.config, dynamo_resource()
+    resource.batch_write_item(RequestItems={
+        cfg["DDB_TEAMS"]: [{"PutRequest": {"Item": {"projectId": "p1", "userId": u, "role": "member"}}} for u in "abc"],
+        cfg["DDB_PROJECTS"]: [{"DeleteRequest": {"Key": {"userId": "o", "projectId": "p2"}}}],
+    })
+    with teams.batch_writer() as batch:
+        batch.put_item(Item={"projectId": "p1", "userId": "d"})
+        batch.delete_item(Key={"projectId": "p1", "userId": "a"})
+    resp = resource.batch_get_item(RequestItems={
+        cfg["DDB_PROJECTS"]: {"Keys": [{"userId": "o", "projectId": p} for p in ("p0", "p2", "zz")],
+                              "ProjectionExpression": "projectId"},
+        cfg["DDB_TEAMS"]: {"Keys": [{"projectId": "p1", "userId": u} for u in "abcd"]},
+    })
+    assert resp["Responses"][cfg["DDB_PROJECTS"]] == [{"projectId": "p0"}]
+    assert sorted(i["userId"] for i in resp["Responses"][cfg["DDB_TEAMS"]]) == ["b", "c", "d"]
+    assert not resp.get("UnprocessedKeys")
+
+def test_transactions(app):
+    projects, teams, _ = _tables(app)
+    _seed(projects, 2)
+    cfg, client = app.config, dynamo_resource().meta.client
+    err = _error(lambda: client.transact_write_items(TransactItems=[
+        {"Put": {"TableName": cfg["DDB_TEAMS"], "Item": {"projectId": "p1", "userId": "d"}}},
+        {"ConditionCheck": {"TableName": cfg["DDB_PROJECTS"], "Key": {"userId": "o", "projectId": "p1"},
+                            "ConditionExpression": "version = :v", "ExpressionAttributeValues": {":v": 99}}},
+    ]))
+    assert err["Error"]["Code"] == "TransactionCanceledException"
+    assert [r["Code"] for r in err["CancellationReasons"]] == ["None", "ConditionalCheckFailed"]
+    assert "Item" not in teams.get_item(Key={"projectId": "p1", "userId": "d"})
+    client.transact_write_items(TransactItems=[
+        {"Put": {"TableName": cfg["DDB_TEAMS"], "Item": {"projectId": "p1", "userId": "d"},
+                 "ConditionExpression": "attribute_not_exists(userId)"}},
+        {"Update": {"TableName": cfg["DDB_PROJECTS"], "Key": {"userId": "o", "projectId": "p1"},
+                    "UpdateExpression": "SET version = version + :one", "ExpressionAttributeValues": {":one": 1}}},
+        {"Delete": {"TableName": cfg["DDB_PROJECTS"], "Key": {"userId": "o", "projectId": "p0"}}},
+    ])
+    assert "Item" in teams.get_item(Key={"projectId": "p1", "userId": "d"})
+    assert projects.get_item(Key={"userId": "o", "projectId": "p1"})["Item"]["version"] == 2
+    assert "Item" not in projects.get_item(Key={"userId": "o", "projectId": "p0"})
@@ -0,0 +1,71 @@
+# diff_expression must turn the stored task list into the new one on every backend, with work
+# proportional to the change rather than to the list.
+import random
+import pytest
+from app_folder.extensions import dynamo_table
+from app_folder.services import tasks as tsvc
+
+KEY = {"userId": "o", "projectId": "p"}
+
+def _tasks(n):
+    return [{"taskId": f"t{i}", "title": f"task {i}", "done": False} for i in range(n)]
+
+def _apply(app, old, new):
+    table = dynamo_table(app.config["DDB_PROJECTS"])
+    table.put_item(Item={**KEY, "tasks": old})
+    expr, names, values = tsvc.diff_expression(old, new)
+    if not expr:
+        assert old == new  # real writes always carry the version bump
+        return expr
+    kwargs = {"ExpressionAttributeNames": names} if names else {}
+    if values:
+        kwargs["ExpressionAttributeValues"] = values
+    table.update_item(Key=KEY, UpdateExpression=expr, **kwargs)
+    assert table.get_item(Key=KEY)["Item"]["tasks"] == new
+    return expr
+
+def _op_count(expr):
+    return expr.count("tasks[")
+
+@pytest.mark.parametrize("ops, max_ops", [
+    ([{"op": "delete", "taskId": "t0"}], 1),
+    ([{"op": "delete", "taskId": "t50"}, {"op": "delete", "taskId": "t7"}], 2),
+    ([{"op": "move", "taskId": "t10", "index": 99}], 2),
+    ([{"op": "move", "taskId": "t40", "index": 43}], 4),
+    ([{"op": "update", "taskId": "t3", "fields": {"done": True}}], 1),
+    ([{"op": "add", "task": {"taskId": "n", "title": "new"}}], 1),
+    ([{"op": "add", "task": {"taskId": "n"}, "index": 98}, {"op": "delete", "taskId": "t20"}], 4),
+])
+def test_small_changes_stay_small(app, ops, max_ops):
+    old = _tasks(100)
+    expr = _apply(app, old, tsvc.apply_ops(old, ops))
+    assert _op_count(expr) <= max_ops, expr
+
+def test_move_to_front_rewrites_only_what_a_list_must(app):
+    # no insert in DynamoDB lists: every slot before the old position shifts, but nothing after it
+    old = _tasks(100)
+    expr = _apply(app, old, tsvc.apply_ops(old, [{"op": "move", "taskId": "t30", "index": 0}]))
+    assert _op_count(expr) <= 31, expr
+
+def test_random_edits(app):
+    rng = random.Random(7)
+    old = _tasks(30)
+    for _ in range(25):
+        ops = []
+        for _ in range(rng.randint(1, 4)):
+            ids = [t["taskId"] for t in old] or ["none"]
+            kind = rng.choice(["add", "delete", "update", "move"] if len(old) > 1 else ["add"])
+            if kind == "add":
+                ops.append({"op": "add", "task": {"title": "x"}, "index": rng.randint(0, len(old))})
+            elif kind == "delete":
+                ops.append({"op": "delete", "taskId": rng.choice(ids)})
+            elif kind == "update":
+                ops.append({"op": "update", "taskId": rng.choice(ids), "fields": {"done": rng.random() < 0.5}})
+            else:
+                ops.append({"op": "move", "taskId": rng.choice(ids), "index": rng.randint(0, len(old) - 1)})
+        try:
+            new = tsvc.apply_ops(old, ops)
+        except tsvc.TaskNotFound:
+            continue  # moved/updated a task an earlier op deleted
+        _apply(app, old, new)
+        old = new
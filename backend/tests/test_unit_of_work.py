@@ -0,0 +1,74 @@
+# Queued writes: the request reads its own, they land when the request ends (even when the handler
+# raises), and caches outside the request forget the old value only once the write is in the table.
+import threading
+from flask import request
+from app_folder.extensions import dynamo_table
+from app_folder.repositories import users_repo
+from app_folder.utils import unit_of_work as uow
+
+def _users(app):
+    return dynamo_table(app.config["DDB_USERS"])
+
+def _stored(app, user_id="u"):
+    return _users(app).get_item(Key={"userId": user_id}).get("Item")
+
+def _in_thread(app, fn):
+    # fn() as another request would see the tables: own app context, no unit of work
+    out = []
+    def run():
+        with app.app_context():
+            out.append(fn())
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    return out[0]
+
+def test_reads_its_own_queued_writes(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        users_repo.put({"userId": "u", "name": "New"})
+        assert users_repo.get("u")["name"] == "New"
+        assert users_repo.batch_get(["u"], None) == [{"userId": "u", "name": "New"}]
+        assert _stored(app) is None  # still queued
+        uow.flush_pending()
+        assert _stored(app)["name"] == "New"
+
+def test_cache_is_invalidated_after_the_flush(app):
+    _users(app).put_item(Item={"userId": "u", "name": "Old"})
+    with app.test_request_context():
+        app.preprocess_request()
+        users_repo.put({"userId": "u", "name": "New"})
+        # another request reads (and caches) the profile before this one flushes
+        assert _in_thread(app, lambda: users_repo.get("u"))["name"] == "Old"
+        uow.flush_pending()
+    assert _in_thread(app, lambda: users_repo.get("u"))["name"] == "New"
+
+def test_after_flush_runs_now_without_queued_writes(app):
+    ran = []
+    uow.after_flush(lambda: ran.append("no request"))
+    with app.test_request_context():
+        app.preprocess_request()
+        uow.after_flush(lambda: ran.append("nothing queued"))
+        assert ran == ["no request", "nothing queued"]
+
+def test_flushed_after_the_request(app):
+    @app.post("/t/put/<name>")
+    def put(name):
+        users_repo.put({"userId": "u", "name": name})
+        if request.args.get("fail"):
+            raise RuntimeError("handler failed")
+        return "", 204
+
+    client = app.test_client()
+    assert client.post("/t/put/first").status_code == 204
+    assert _stored(app)["name"] == "first"
+    assert client.post("/t/put/second?fail=1").status_code == 500
+    assert _stored(app)["name"] == "second"
+
+def test_flushed_in_teardown_when_the_request_fails(app):
+    ctx = app.test_request_context()
+    ctx.push()
+    app.preprocess_request()
+    users_repo.put({"userId": "u", "name": "New"})
+    ctx.pop(RuntimeError("no response"))  # teardown without after_request
+    assert _stored(app)["name"] == "New"
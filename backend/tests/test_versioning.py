@@ -0,0 +1,85 @@
+# Optimistic locking over HTTP: every write bumps the version, If-Match must carry an ETag the app
+# issued, and the attributes the repository maintains can't be written by clients. Reads carry
+# ETag/Last-Modified and answer 304 while nothing changed.
+import pytest
+from app_folder.extensions import dynamo_table
+
+def _login(client, sub="o"):
+    with client.session_transaction() as s:
+        s["user"] = {"sub": sub, "email": f"{sub}@x.com"}
+
+@pytest.fixture
+def project(app):
+    client = app.test_client()
+    _login(client)
+    pid = client.post("/api/projects", json={"name": "p"}).get_json()["projectId"]
+    return client, pid
+
+def _etag(client, pid):
+    return client.get(f"/api/projects/{pid}").headers["ETag"]
+
+def test_if_match_guards_writes(project):
+    client, pid = project
+    etag = _etag(client, pid)
+    assert client.post(f"/api/projects/{pid}/update", json={"name": "a"}, headers={"If-Match": etag}).status_code == 200
+    # the write bumped the version, so the same ETag is stale now
+    assert client.post(f"/api/projects/{pid}/update", json={"name": "b"}, headers={"If-Match": etag}).status_code == 409
+    assert client.patch(f"/api/projects/{pid}/update-field", json={"field": "name", "value": "c"},
+                        headers={"If-Match": _etag(client, pid)}).status_code == 200
+    assert client.get(f"/api/projects/{pid}").get_json()["name"] == "c"
+
+@pytest.mark.parametrize("header", ['"abc"', "7", '"7"', 'W/"1-0123456789ab"', '"1-0123456789ab", "2-0123456789ab"', ""])
+def test_unrecognized_if_match_is_412(project, header):
+    client, pid = project
+    resp = client.post(f"/api/projects/{pid}/update", json={"name": "x"}, headers={"If-Match": header})
+    assert resp.status_code == 412
+    assert client.get(f"/api/projects/{pid}").get_json()["name"] == "p"
+
+def test_if_match_star_is_unconditional(project):
+    client, pid = project
+    assert client.post(f"/api/projects/{pid}/update", json={"name": "x"}, headers={"If-Match": "*"}).status_code == 200
+
+@pytest.mark.parametrize("fields", [{"version": 99}, {"updatedAt": "2000-01-01"}, {"userId": "x"}, {"projectId": "x"},
+                                    {"ownerId": "x"}, {"__v": 1}, {"a-b": 1}, {}])
+def test_reserved_and_invalid_fields_are_400(project, fields):
+    client, pid = project
+    before = client.get(f"/api/projects/{pid}").get_json()
+    assert client.post(f"/api/projects/{pid}/update", json=fields).status_code == 400
+    for field in fields or ["version"]:
+        resp = client.patch(f"/api/projects/{pid}/update-field", json={"field": field, "value": 1})
+        assert resp.status_code == 400
+    assert client.get(f"/api/projects/{pid}").get_json()["version"] == before["version"]
+
+def test_conditional_get_answers_304_until_a_write(project):
+    client, pid = project
+    first = client.get(f"/api/projects/{pid}")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache" and first.last_modified
+    same = client.get(f"/api/projects/{pid}", headers={"If-None-Match": etag})
+    assert same.status_code == 304 and same.data == b"" and same.headers["ETag"] == etag
+    assert client.get(f"/api/projects/{pid}", headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+    assert client.get(f"/api/projects/{pid}", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+    client.patch(f"/api/projects/{pid}/update-field", json={"field": "name", "value": "new"})
+    changed = client.get(f"/api/projects/{pid}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag and changed.get_json()["name"] == "new"
+
+def test_etag_depends_on_the_path_and_the_role(app, project):
+    client, pid = project
+    dynamo_table(app.config["DDB_USERS"]).put_item(Item={"userId": "m", "email": "m@x.com"})
+    assert client.post(f"/api/project/{pid}/add-user", json={"email": "m@x.com"}).status_code == 200
+    owner_tag = _etag(client, pid)
+    assert client.get(f"/api/projects/{pid}?view=full").headers["ETag"] != owner_tag
+    member = app.test_client()
+    _login(member, "m")
+    resp = member.get(f"/api/projects/{pid}", headers={"If-None-Match": owner_tag})
+    assert resp.status_code == 200 and resp.get_json()["currentUserRole"] == "member"
+    assert member.get(f"/api/projects/{pid}", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+@pytest.mark.parametrize("path", ["tasks", "updates"])
+def test_tasks_and_updates_are_conditional(project, path):
+    client, pid = project
+    etag = client.get(f"/api/projects/{pid}/{path}").headers["ETag"]
+    assert client.get(f"/api/projects/{pid}/{path}", headers={"If-None-Match": etag}).status_code == 304
+    client.post(f"/api/projects/{pid}/updates", json={"text": "hello"})
+    resp = client.get(f"/api/projects/{pid}/{path}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
@@ -35,7 +35,7 @@ export function ProjectsProvider({ children }: { children: React.ReactNode }) {
 
   const fetchProjects = useCallback(async () => {
     try {
-      const res = await fetch('http://localhost:5000/api/projects', { credentials: 'include' });
+      const res = await fetch('http://localhost:5000/api/projects?view=summary', { credentials: 'include' });
       if (!res.ok) throw new Error('Failed to fetch');
       const data: Project[] = await res.json();
       setProjects(data);